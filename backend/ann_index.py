@@ -0,0 +1,137 @@
+"""Choosing and building the FAISS index that sits over a vector store.
+
+Index kinds (``ANN_INDEX``):
+
+    flat   exact inner-product scan; the default for small stores
+    hnsw   graph index, no training, vectors can be added at any time
+    ivf    inverted lists over k-means centroids trained on the vectors;
+           a query visits ``ANN_NPROBE`` of them
+    auto   flat up to ANN_FLAT_MAX vectors, hnsw up to ANN_HNSW_MAX, ivf above
+
+and the codes stored per vector (``ANN_QUANTIZATION``):
+
+    none   float32
+    sq8    one byte per dimension (4x smaller)
+    pq     ANN_PQ_M bytes per vector (product quantization; needs at least
+           PQ_MIN_TRAIN vectors to train, below that sq8 is used)
+    auto   none up to ANN_HNSW_MAX vectors, sq8 above
+
+A choice is written down as a FAISS factory string ("Flat", "HNSW32_SQ8",
+"IVF1024,PQ96", ...), which is what the store header records.
+"""
+import os
+import re
+import math
+import logging
+import numpy as np
+from capabilities import capabilities
+
+# imported on first use; check faiss_available() before touching it
+faiss = capabilities.lazy('faiss')
+
+logger = logging.getLogger("call-agent-api")
+
+def faiss_available():
+    return capabilities.available('faiss')
+
+
+INDEX_KINDS = ('auto', 'flat', 'hnsw', 'ivf')
+QUANTIZATIONS = ('auto', 'none', 'sq8', 'pq')
+ANN_INDEX = os.getenv('ANN_INDEX', 'auto')
+ANN_QUANTIZATION = os.getenv('ANN_QUANTIZATION', 'auto')
+ANN_FLAT_MAX = int(os.getenv('ANN_FLAT_MAX', '20000'))
+ANN_HNSW_MAX = int(os.getenv('ANN_HNSW_MAX', '500000'))
+# HNSW: links per node, and candidate list sizes while building and searching
+ANN_HNSW_M = int(os.getenv('ANN_HNSW_M', '32'))
+ANN_EF_CONSTRUCTION = int(os.getenv('ANN_EF_CONSTRUCTION', '80'))
+ANN_EF_SEARCH = int(os.getenv('ANN_EF_SEARCH', '64'))
+# IVF: lists probed per query; 0 picks about 4 * sqrt(n) lists at build time
+ANN_NPROBE = int(os.getenv('ANN_NPROBE', '16'))
+ANN_NLIST = int(os.getenv('ANN_NLIST', '0'))
+# PQ: sub-quantizers (bytes per vector); 0 picks dim / 16
+ANN_PQ_M = int(os.getenv('ANN_PQ_M', '0'))
+# IVF centroids and PQ codebooks are trained on at most this many vectors
+ANN_TRAIN_SAMPLE = int(os.getenv('ANN_TRAIN_SAMPLE', '100000'))
+# k-means wants ~39 points per centroid; PQ codebooks have 256 centroids each
+MIN_POINTS_PER_CENTROID = 39
+PQ_MIN_TRAIN = MIN_POINTS_PER_CENTROID * 256
+
+_NLIST = re.compile(r'IVF(\d+)')
+
+
+def _pq_m(dim, m=None):
+    """Largest divisor of ``dim`` not above the requested sub-quantizer count."""
+    target = max(1, min(dim, m or ANN_PQ_M or dim // 16))
+    return next(d for d in range(target, 0, -1) if dim % d == 0)
+
+
+def choose_spec(n, dim, kind=None, quantization=None):
+    """FAISS factory string for ``n`` vectors of ``dim`` dimensions."""
+    kind = kind or ANN_INDEX
+    quantization = quantization or ANN_QUANTIZATION
+    if kind not in INDEX_KINDS:
+        raise ValueError(f'Unknown ANN index {kind!r}; expected one of {", ".join(INDEX_KINDS)}')
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f'Unknown ANN quantization {quantization!r}; expected one of {", ".join(QUANTIZATIONS)}')
+    if kind == 'auto':
+        kind = 'flat' if n <= ANN_FLAT_MAX else 'hnsw' if n <= ANN_HNSW_MAX else 'ivf'
+    if quantization == 'auto':
+        quantization = 'sq8' if n > ANN_HNSW_MAX else 'none'
+    if quantization == 'pq' and n < PQ_MIN_TRAIN:
+        quantization = 'sq8'
+    codes = {'none': 'Flat', 'sq8': 'SQ8', 'pq': f'PQ{_pq_m(dim)}'}[quantization]
+    if kind == 'flat':
+        return codes
+    if kind == 'hnsw':
+        return f'HNSW{ANN_HNSW_M}' if codes == 'Flat' else f'HNSW{ANN_HNSW_M}_{codes}'
+    nlist = ANN_NLIST or int(4 * math.sqrt(n))
+    nlist = max(1, min(nlist, n // MIN_POINTS_PER_CENTROID))
+    return f'IVF{nlist},{codes}'
+
+
+def configure(index):
+    """Apply the search-time settings (efSearch, nprobe) to a built or loaded index."""
+    params = faiss.ParameterSpace()
+    if isinstance(index, faiss.IndexHNSW):
+        params.set_index_parameter(index, 'efSearch', ANN_EF_SEARCH)
+    elif faiss.try_extract_index_ivf(index) is not None:
+        params.set_index_parameter(index, 'nprobe', ANN_NPROBE)
+    return index
+
+
+def build_index(vectors, spec=None):
+    """Build, train and fill an inner-product index over row-normalized float32 ``vectors``.
+
+    Returns ``(index, spec)``.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dim = vectors.shape
+    spec = spec or choose_spec(n, dim)
+    index = faiss.index_factory(dim, spec, faiss.METRIC_INNER_PRODUCT)
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efConstruction = ANN_EF_CONSTRUCTION
+    if not index.is_trained:
+        sample = vectors
+        if n > ANN_TRAIN_SAMPLE:
+            rows = np.random.default_rng(0).choice(n, ANN_TRAIN_SAMPLE, replace=False)
+            sample = vectors[np.sort(rows)]
+        index.train(sample)
+    index.add(vectors)
+    return configure(index), spec
+
+
+def needs_rebuild(spec, n, dim):
+    """Whether an index built as ``spec`` should be rebuilt rather than grown to ``n`` vectors.
+
+    True when auto-selection now picks another kind or quantization, or an
+    IVF index has outgrown its centroids (the list count it would get now is
+    at least double).
+    """
+    if not spec:
+        return True
+    wanted = choose_spec(n, dim)
+    old_ivf, new_ivf = _NLIST.match(spec), _NLIST.match(wanted)
+    if old_ivf and new_ivf:
+        return (spec.split(',', 1)[1] != wanted.split(',', 1)[1]
+                or int(new_ivf.group(1)) >= 2 * int(old_ivf.group(1)))
+    return spec != wanted
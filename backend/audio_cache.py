@@ -0,0 +1,156 @@
+"""Disk-backed LRU cache of synthesized audio, keyed by SSML and voice settings."""
+import os
+import json
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger("call-agent-api")
+
+AUDIO_CACHE_MAX_BYTES = int(os.getenv('AUDIO_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+# eviction trims down to this fraction of the bound, so it does not run on every put
+_EVICT_TO = 0.9
+_STALE_TEMP_SECONDS = 3600
+
+
+def audio_key(ssml, settings):
+    """sha256 of the SSML and the voice settings (order-independent)."""
+    h = hashlib.sha256()
+    h.update(ssml.encode('utf-8'))
+    h.update(b'\0')
+    h.update(json.dumps(settings or {}, sort_keys=True).encode('utf-8'))
+    return h.hexdigest()
+
+
+class AudioCache:
+    """``<root>/<key>.wav`` files, bounded to ``max_bytes``.
+
+    A hit refreshes the file's mtime, which is the recency every worker sees;
+    eviction removes the oldest files first. Files are only ever created by
+    renaming a finished temp file into place, so readers never see partial
+    audio, and an open handle keeps streaming even if the file is evicted.
+    """
+
+    def __init__(self, root, max_bytes=AUDIO_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        # key -> size, oldest first; other workers' puts are picked up by rescans
+        self._entries = self._scan()
+
+    def _path(self, key):
+        return os.path.join(self.root, f'{key}.wav')
+
+    def _scan(self):
+        found = []
+        now = time.time()
+        for entry in os.scandir(self.root):
+            if not entry.name.endswith('.wav'):
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            if entry.name.startswith('.'):
+                # temp file of a synthesis that never finished
+                if now - st.st_mtime > _STALE_TEMP_SECONDS:
+                    try:
+                        os.remove(entry.path)
+                    except FileNotFoundError:
+                        pass
+                continue
+            found.append((st.st_mtime, entry.name[:-4], st.st_size))
+        found.sort()
+        return OrderedDict((key, size) for _, key, size in found)
+
+    def open(self, key, record=True):
+        """``(file, size)`` for cached audio, or None on a miss.
+
+        ``record=False`` leaves the hit/miss counters alone, for reading back
+        audio that was just synthesized.
+        """
+        path = self._path(key)
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            with self._lock:
+                self._entries.pop(key, None)
+                if record:
+                    self.misses += 1
+            return None
+        size = os.fstat(f.fileno()).st_size
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self._entries[key] = size
+            self._entries.move_to_end(key)
+            if record:
+                self.hits += 1
+        return f, size
+
+    def temp_path(self):
+        """A fresh path inside the cache directory to synthesize into."""
+        return os.path.join(self.root, f'.{uuid.uuid4().hex}.tmp.wav')
+
+    def commit(self, tmp_path, key):
+        """Move a finished temp file into place as ``key``."""
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, self._path(key))
+        with self._lock:
+            self._entries[key] = size
+            self._entries.move_to_end(key)
+            total = sum(self._entries.values())
+            if total > self.max_bytes:
+                self._evict(keep=key)
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def _evict(self, keep):
+        # rescan first: other workers add files too, and their hits move mtimes
+        self._entries = self._scan()
+        total = sum(self._entries.values())
+        while self._entries and total > self.max_bytes * _EVICT_TO:
+            key, size = self._entries.popitem(last=False)
+            if key == keep:
+                self._entries[key] = size
+                if len(self._entries) == 1:
+                    break
+                continue
+            try:
+                os.remove(self._path(key))
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                try:
+                    os.remove(self._path(key))
+                except FileNotFoundError:
+                    pass
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': sum(self._entries.values()),
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': (self.hits / lookups) if lookups else 0.0,
+            }
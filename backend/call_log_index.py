@@ -0,0 +1,173 @@
+"""SQLite index of call session summaries, for listing without opening log files."""
+import json
+import base64
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger("call-agent-api")
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+_COLUMNS = ('session_id', 'start_time', 'message_count', 'last_message', 'status', 'order_status')
+
+
+def listing_fields(summary):
+    """The fields /call-logs returns for a session, from its summary."""
+    return {
+        "session_id": summary["session_id"],
+        "start_time": summary["start_time"],
+        "message_count": summary.get("message_count", 0),
+        "last_message": summary.get("last_message") or summary["start_time"],
+        "status": summary.get("status", "active"),
+        "order_status": summary.get("order_status", "none"),
+    }
+
+
+def encode_page_token(start_time, session_id):
+    raw = json.dumps([start_time, session_id], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_page_token(token):
+    try:
+        start_time, session_id = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except Exception:
+        raise ValueError('Invalid page token')
+    return start_time, session_id
+
+
+class CallLogIndex:
+    """One row per session with the fields the dashboard lists and filters on.
+
+    CallLogStore upserts the row on every append, so reads never touch the
+    log files. Every upsert stamps the row with the next value of a global
+    sequence; a client that remembers the highest ``seq`` it has seen can ask
+    for only the sessions that changed since.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS sessions ('
+            ' session_id TEXT PRIMARY KEY, start_time TEXT NOT NULL, message_count INTEGER NOT NULL,'
+            ' last_message TEXT, status TEXT NOT NULL, order_status TEXT NOT NULL, seq INTEGER NOT NULL)'
+        )
+        self._conn.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS sessions_start ON sessions(start_time, session_id)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS sessions_status ON sessions(status, start_time, session_id)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS sessions_order_status ON sessions(order_status, start_time, session_id)')
+        self._conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS sessions_seq ON sessions(seq)')
+        self._conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('seq', 0), ('cleared_seq', 0)")
+        self._conn.commit()
+
+    def _next_seq(self):
+        self._conn.execute("UPDATE meta SET value = value + 1 WHERE name = 'seq'")
+        return self._conn.execute("SELECT value FROM meta WHERE name = 'seq'").fetchone()[0]
+
+    @staticmethod
+    def _row(summary):
+        fields = listing_fields(summary)
+        return tuple(fields[c] for c in _COLUMNS)
+
+    def upsert_many(self, summaries):
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock up front, so sequence
+            # numbers are handed out in commit order across workers
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                for summary in summaries:
+                    self._conn.execute(
+                        'INSERT OR REPLACE INTO sessions'
+                        ' (session_id, start_time, message_count, last_message, status, order_status, seq)'
+                        ' VALUES (?, ?, ?, ?, ?, ?, ?)', self._row(summary) + (self._next_seq(),))
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def upsert(self, summary):
+        self.upsert_many([summary])
+
+    def is_empty(self):
+        with self._lock:
+            return self._conn.execute('SELECT 1 FROM sessions LIMIT 1').fetchone() is None
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            self._conn.execute('DELETE FROM sessions')
+            # the clear takes a sequence number of its own, so every earlier cursor sees it
+            self._conn.execute("UPDATE meta SET value = ? WHERE name = 'cleared_seq'", (self._next_seq(),))
+            self._conn.commit()
+
+    @staticmethod
+    def _filters(status, order_status, start_from, start_to):
+        clauses, params = [], []
+        if status:
+            clauses.append('status = ?')
+            params.append(status)
+        if order_status:
+            clauses.append('order_status = ?')
+            params.append(order_status)
+        if start_from:
+            clauses.append('start_time >= ?')
+            params.append(start_from)
+        if start_to:
+            if 'T' not in start_to:
+                # a bare date covers the whole day: 'T~' sorts after any time on it
+                start_to += 'T~'
+            clauses.append('start_time <= ?')
+            params.append(start_to)
+        return clauses, params
+
+    def query(self, status=None, order_status=None, start_from=None, start_to=None,
+              limit=DEFAULT_PAGE_SIZE, page_token=None, since=None):
+        """List session summaries.
+
+        Without ``since``, sessions come newest ``start_time`` first, one page
+        at a time; pass the returned ``next_page_token`` to get the next page.
+        With ``since`` (a ``cursor`` from an earlier response), only sessions
+        written after that cursor are returned, oldest change first. Every
+        response carries the ``cursor`` to use for the next incremental
+        refresh; ``reset`` is true when the logs were cleared after ``since``.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        clauses, params = self._filters(status, order_status, start_from, start_to)
+        with self._lock:
+            meta = dict(self._conn.execute('SELECT name, value FROM meta').fetchall())
+            if since is not None:
+                clauses.append('seq > ?')
+                params.append(int(since))
+                where = f"WHERE {' AND '.join(clauses)}"
+                rows = self._conn.execute(
+                    f"SELECT {', '.join(_COLUMNS)}, seq FROM sessions {where} ORDER BY seq LIMIT ?",
+                    params + [limit + 1]).fetchall()
+            else:
+                if page_token:
+                    start_time, session_id = decode_page_token(page_token)
+                    clauses.append('(start_time < ? OR (start_time = ? AND session_id < ?))')
+                    params.extend([start_time, start_time, session_id])
+                where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+                rows = self._conn.execute(
+                    f"SELECT {', '.join(_COLUMNS)}, seq FROM sessions {where}"
+                    f" ORDER BY start_time DESC, session_id DESC LIMIT ?", params + [limit + 1]).fetchall()
+
+        more = len(rows) > limit
+        rows = rows[:limit]
+        logs = [dict(zip(_COLUMNS, row[:-1])) for row in rows]
+        result = {"logs": logs, "cursor": meta['seq'], "next_page_token": None}
+        if since is not None:
+            # cleared since then, or a cursor from a different index file
+            result["reset"] = int(since) < meta['cleared_seq'] or int(since) > meta['seq']
+            if more:
+                # not every change fit in this page; resume from the last one returned
+                result["cursor"] = rows[-1][-1]
+        elif more:
+            result["next_page_token"] = encode_page_token(logs[-1]["start_time"], logs[-1]["session_id"])
+        return result
@@ -0,0 +1,233 @@
+"""Append-only per-session call logs with an incrementally maintained summary.
+
+Each session has two files in the log directory:
+
+    <session_id>.jsonl          one JSON event per line, only ever appended
+    <session_id>.summary.json   every field except the message list, rewritten
+                                atomically after each event (constant size)
+
+A write costs one append plus one small summary rewrite, however long the
+call is. Writers for the same session are serialized by an in-process lock
+and, where ``fcntl`` exists, an exclusive ``flock`` on the event file, so
+concurrent gunicorn workers cannot drop each other's messages.
+"""
+import os
+import json
+import zlib
+import logging
+import threading
+from datetime import datetime
+
+try:
+    import fcntl
+    _FCNTL_AVAILABLE = True
+except Exception:
+    fcntl = None
+    _FCNTL_AVAILABLE = False
+
+logger = logging.getLogger("call-agent-api")
+
+EVENTS_SUFFIX = '.jsonl'
+SUMMARY_SUFFIX = '.summary.json'
+LEGACY_SUFFIX = '.json'
+_LOCK_STRIPES = 64
+
+
+def new_session(session_id, start_time):
+    return {
+        "session_id": session_id,
+        "start_time": start_time,
+        "messages": [],
+        "order_status": "none",
+        "session_stats": {
+            "total_messages": 0,
+            "keywords_detected": []
+        },
+        "status": "active",
+    }
+
+
+def apply_event(state, event, keep_messages=True):
+    """Fold one event into a session dict (the full log, or a summary without messages)."""
+    message = event.get("message")
+    if message is not None:
+        if keep_messages:
+            state.setdefault("messages", []).append(message)
+        state["message_count"] = state.get("message_count", 0) + 1
+        state["last_message"] = message.get("timestamp")
+    if event.get("count_message"):
+        stats = state.setdefault("session_stats", {"total_messages": 0, "keywords_detected": []})
+        stats["total_messages"] = stats.get("total_messages", 0) + 1
+    for keyword in event.get("keywords", []):
+        state.setdefault("session_stats", {"total_messages": 0, "keywords_detected": []})["keywords_detected"].append(keyword)
+    state.update(event.get("set", {}))
+    return state
+
+
+def summarize(log_data):
+    """Summary dict (no messages) for a full session log."""
+    summary = {k: v for k, v in log_data.items() if k != "messages"}
+    messages = log_data.get("messages", [])
+    summary["message_count"] = len(messages)
+    summary["last_message"] = messages[-1]["timestamp"] if messages else log_data.get("start_time")
+    return summary
+
+
+class CallLogStore:
+    """Reads and writes session logs; ``index`` (a CallLogIndex), when given,
+    receives each session's summary after every append.
+    """
+
+    def __init__(self, root, index=None):
+        self.root = root
+        self.index = index
+        self._locks = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, session_id, suffix):
+        if not session_id or os.path.basename(session_id) != session_id or session_id in ('.', '..'):
+            raise ValueError(f'Invalid session id: {session_id!r}')
+        return os.path.join(self.root, f"{session_id}{suffix}")
+
+    def _lock(self, session_id):
+        return self._locks[zlib.crc32(session_id.encode('utf-8')) % _LOCK_STRIPES]
+
+    def exists(self, session_id):
+        return (os.path.exists(self._path(session_id, EVENTS_SUFFIX))
+                or os.path.exists(self._path(session_id, LEGACY_SUFFIX)))
+
+    def _read_summary(self, session_id):
+        path = self._path(session_id, SUMMARY_SUFFIX)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_summary(self, session_id, summary):
+        path = self._path(session_id, SUMMARY_SUFFIX)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _import_legacy(self, session_id, events_file):
+        """Turn a pre-existing <session>.json into the first event of the log."""
+        legacy_path = self._path(session_id, LEGACY_SUFFIX)
+        if not os.path.exists(legacy_path):
+            return None
+        with open(legacy_path, "r", encoding="utf-8") as f:
+            log_data = json.load(f)
+        events_file.write(json.dumps({"snapshot": log_data}, ensure_ascii=False) + "\n")
+        events_file.flush()
+        os.remove(legacy_path)
+        return summarize(log_data)
+
+    def append(self, session_id, message=None, set_fields=None, keywords=(), count_message=False, start_time=None):
+        """Append one event, creating the session if needed. Returns the updated summary."""
+        event = {}
+        if message is not None:
+            event["message"] = message
+        if count_message:
+            event["count_message"] = True
+        if keywords:
+            event["keywords"] = list(keywords)
+        if set_fields:
+            event["set"] = set_fields
+        line = json.dumps(event, ensure_ascii=False) + "\n"
+
+        events_path = self._path(session_id, EVENTS_SUFFIX)
+        with self._lock(session_id):
+            with open(events_path, "a", encoding="utf-8") as f:
+                if _FCNTL_AVAILABLE:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    summary = self._read_summary(session_id)
+                    if summary is None and os.fstat(f.fileno()).st_size > 0:
+                        # the summary write was interrupted; rebuild it from the events
+                        log_data = self.get(session_id)
+                        summary = summarize(log_data) if log_data is not None else None
+                    if summary is None:
+                        summary = self._import_legacy(session_id, f)
+                    if summary is None:
+                        summary = summarize(new_session(session_id, start_time or datetime.now().isoformat()))
+                        f.write(json.dumps({"snapshot": new_session(session_id, summary["start_time"])}, ensure_ascii=False) + "\n")
+                    f.write(line)
+                    f.flush()
+                    apply_event(summary, event, keep_messages=False)
+                    self._write_summary(session_id, summary)
+                    if self.index is not None:
+                        self.index.upsert(summary)
+                finally:
+                    if _FCNTL_AVAILABLE:
+                        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        return summary
+
+    def get(self, session_id):
+        """Full session log (including messages) rebuilt from the event log, or None."""
+        events_path = self._path(session_id, EVENTS_SUFFIX)
+        if not os.path.exists(events_path):
+            legacy_path = self._path(session_id, LEGACY_SUFFIX)
+            if os.path.exists(legacy_path):
+                with open(legacy_path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            return None
+        state = None
+        with open(events_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # a write in progress; everything before it is complete
+                    break
+                if "snapshot" in event:
+                    state = event["snapshot"]
+                    state.setdefault("messages", [])
+                else:
+                    apply_event(state, event)
+        if state is not None:
+            state.pop("message_count", None)
+            state.pop("last_message", None)
+        return state
+
+    def summary(self, session_id):
+        summary = self._read_summary(session_id)
+        if summary is None and os.path.exists(self._path(session_id, LEGACY_SUFFIX)):
+            summary = summarize(self.get(session_id))
+        return summary
+
+    def session_ids(self):
+        ids = set()
+        for filename in os.listdir(self.root):
+            if filename.endswith('.tmp'):
+                continue
+            if filename.endswith(SUMMARY_SUFFIX):
+                ids.add(filename[:-len(SUMMARY_SUFFIX)])
+            elif filename.endswith(LEGACY_SUFFIX):
+                # a <session>.json from before the event log existed
+                ids.add(filename[:-len(LEGACY_SUFFIX)])
+        return ids
+
+    def summaries(self):
+        for session_id in self.session_ids():
+            try:
+                summary = self.summary(session_id)
+                if summary is not None:
+                    yield summary
+            except Exception as e:
+                logger.error(f"Error reading log summary {session_id}: {e}")
+
+    def reindex(self):
+        """Rebuild the summary index from the files on disk."""
+        if self.index is None:
+            return 0
+        summaries = list(self.summaries())
+        self.index.clear()
+        self.index.upsert_many(summaries)
+        return len(summaries)
+
+    def clear(self):
+        for filename in os.listdir(self.root):
+            if filename.endswith((EVENTS_SUFFIX, LEGACY_SUFFIX)):
+                os.remove(os.path.join(self.root, filename))
+        if self.index is not None:
+            self.index.clear()
@@ -0,0 +1,142 @@
+"""Optional integrations imported on first use, so a worker starts without paying for them.
+
+Each capability is a module (faiss, openai, PyPDF2, pyttsx3, pinecone)
+imported the first time code asks for it, once per process; a failed
+import is remembered and the capability reported unavailable. Code that
+used to do ``try: import x`` at module load holds a ``lazy('x')`` proxy
+instead and checks ``available('x')`` where it used the ``_X_AVAILABLE``
+flag. ``warm_up`` imports a set of capabilities on a background thread once
+the server is serving, so the first request that needs one rarely waits.
+"""
+import os
+import time
+import logging
+import importlib
+import threading
+
+logger = logging.getLogger("call-agent-api")
+
+# 'auto' warms up what the configuration will use, 'none' nothing, or a
+# comma-separated list of capability names
+CAPABILITY_WARMUP = os.getenv('CAPABILITY_WARMUP', 'auto')
+# seconds between startup and the warm-up, so it does not compete with the first requests
+CAPABILITY_WARMUP_DELAY = float(os.getenv('CAPABILITY_WARMUP_DELAY', '2'))
+
+
+class Capability:
+    """One optional module, imported at most once."""
+
+    def __init__(self, name, module):
+        self.name = name
+        self.module_name = module
+        self.module = None
+        self.error = None
+        self.seconds = None
+        self.loaded_by = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self.module is not None or self.error is not None
+
+    def load(self, by='use'):
+        """The imported module, or None if it cannot be imported."""
+        if self.loaded:
+            return self.module
+        with self._lock:
+            if not self.loaded:
+                started = time.perf_counter()
+                try:
+                    self.module = importlib.import_module(self.module_name)
+                except Exception as e:
+                    self.error = f'{type(e).__name__}: {e}'
+                    logger.info(f"Optional dependency {self.name} unavailable: {self.error}")
+                self.seconds = time.perf_counter() - started
+                self.loaded_by = by
+        return self.module
+
+    def stats(self):
+        return {
+            'module': self.module_name,
+            'loaded': self.loaded,
+            'available': self.module is not None if self.loaded else None,
+            'import_ms': self.seconds * 1000 if self.seconds is not None else None,
+            'loaded_by': self.loaded_by,
+            'error': self.error,
+        }
+
+
+class LazyModule:
+    """Stands in for a capability's module; the first attribute access imports it."""
+
+    def __init__(self, capability):
+        self._capability = capability
+
+    def __getattr__(self, attr):
+        module = self._capability.load()
+        if module is None:
+            raise ImportError(f'{self._capability.name} is not available: {self._capability.error}')
+        return getattr(module, attr)
+
+
+class Capabilities:
+    """Registry of the optional capabilities by name."""
+
+    def __init__(self):
+        self._capabilities = {}
+        self._warmup = None
+
+    def register(self, name, module=None):
+        self._capabilities[name] = Capability(name, module or name)
+
+    def get(self, name):
+        """The module behind ``name``, imported now if needed; None if it cannot be imported."""
+        return self._capabilities[name].load()
+
+    def available(self, name):
+        return self._capabilities[name].load() is not None
+
+    def lazy(self, name):
+        return LazyModule(self._capabilities[name])
+
+    def warm_up(self, names, delay=0.0):
+        """Import ``names`` one after another on a daemon thread, after ``delay`` seconds; returns the thread."""
+        names = [n for n in names if n in self._capabilities and not self._capabilities[n].loaded]
+        if not names or (self._warmup is not None and self._warmup.is_alive()):
+            return self._warmup
+
+        def run():
+            time.sleep(delay)
+            started = time.perf_counter()
+            for name in names:
+                self._capabilities[name].load(by='warm-up')
+            logger.info(f"Warmed up {', '.join(names)} in {time.perf_counter() - started:.2f}s")
+        self._warmup = threading.Thread(target=run, name='capability-warmup', daemon=True)
+        self._warmup.start()
+        return self._warmup
+
+    def stats(self):
+        return {name: capability.stats() for name, capability in self._capabilities.items()}
+
+
+capabilities = Capabilities()
+capabilities.register('faiss')
+capabilities.register('openai')
+capabilities.register('pypdf', 'PyPDF2')
+capabilities.register('pyttsx3')
+capabilities.register('pinecone')
+
+
+def warmup_names(setting=CAPABILITY_WARMUP, openai_configured=False, pinecone_configured=False):
+    """Capabilities ``CAPABILITY_WARMUP`` asks for; 'auto' skips integrations that are not configured."""
+    setting = setting.strip().lower()
+    if setting == 'none':
+        return []
+    if setting != 'auto':
+        return [n.strip() for n in setting.split(',') if n.strip()]
+    names = ['faiss', 'pypdf', 'pyttsx3']
+    if openai_configured:
+        names.insert(0, 'openai')
+    if pinecone_configured:
+        names.append('pinecone')
+    return names
@@ -0,0 +1,249 @@
+"""Pluggable text chunking for PDF ingestion.
+
+Strategies:
+
+    fixed      the original 800-char windows with 200-char overlap
+    sentence   whole sentences packed up to ``max_size`` characters
+    paragraph  paragraphs (then lines, sentences, words when too big) packed
+               up to ``max_size`` characters
+    heading    lines packed up to ``max_size`` characters; a heading line
+               starts a new chunk, and later chunks of the same section are
+               prefixed with it
+    token      like paragraph, but ``max_size`` counts tokens of the embedding
+               model's encoding (tiktoken if installed, else an estimate)
+
+``Chunker.chunks(pieces)`` takes the text as an iterable of pieces (one per
+PDF page) and yields chunks as soon as they are complete, so a long PDF is
+never held in memory twice. Every chunk records its character offsets in the
+concatenated text and the 1-based pages it spans.
+"""
+import os
+import re
+import bisect
+import logging
+
+logger = logging.getLogger("call-agent-api")
+
+STRATEGIES = ('fixed', 'sentence', 'paragraph', 'heading', 'token')
+# fixed keeps the original windows; the other strategies are opt-in
+CHUNK_STRATEGY = os.getenv('CHUNK_STRATEGY', 'fixed')
+CHUNK_MAX_CHARS = int(os.getenv('CHUNK_MAX_CHARS', '800'))
+CHUNK_MAX_TOKENS = int(os.getenv('CHUNK_MAX_TOKENS', '200'))
+# units (sentences/lines) repeated at the start of the next chunk; fixed uses chars
+CHUNK_OVERLAP = int(os.getenv('CHUNK_OVERLAP', '0'))
+FIXED_CHUNK_SIZE = 800
+FIXED_OVERLAP = 200
+
+# the encoding of the OpenAI embedding models
+TOKEN_ENCODING = 'cl100k_base'
+_encoding = None
+_encoding_failed = False
+
+_SENTENCE_END = re.compile(r'(?<=[.!?…])["\')\]]*\s+')
+_SEPARATORS = {
+    'sentence': [_SENTENCE_END, re.compile(r'\n'), re.compile(r'\s+')],
+    'paragraph': [re.compile(r'\n\s*\n'), re.compile(r'\n'), _SENTENCE_END, re.compile(r'\s+')],
+    'heading': [re.compile(r'\n'), _SENTENCE_END, re.compile(r'\s+')],
+    'token': [re.compile(r'\n\s*\n'), re.compile(r'\n'), _SENTENCE_END, re.compile(r'\s+')],
+}
+_BULLET = '•-*·–—▪►○●'
+_NUMBER = re.compile(r'\d[\d.,]{2,}')
+
+
+def count_tokens(text):
+    """Tokens in ``text`` under the embedding encoding; ~4 UTF-8 bytes per token without tiktoken."""
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+        except Exception as e:
+            _encoding_failed = True
+            logger.info(f"tiktoken unavailable, estimating token counts: {e}")
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text.encode('utf-8')) + 3) // 4
+
+
+def is_heading(line):
+    """A short title-like line: '# Title', or a capitalized line of a few words without
+    sentence punctuation, bullets or prices."""
+    s = line.strip()
+    if not s or len(s) > 60:
+        return False
+    if s.startswith('#'):
+        return True
+    if s[0] in _BULLET or s[0].isdigit() or s[-1] in '.:;,!?' or _NUMBER.search(s):
+        return False
+    return len(s.split()) <= 6 and s[0].isupper()
+
+
+class Chunker:
+    """Splits text with one of ``STRATEGIES``; see the module docstring."""
+
+    def __init__(self, strategy=CHUNK_STRATEGY, max_size=None, overlap=None):
+        if strategy not in STRATEGIES:
+            raise ValueError(f'Unknown chunk strategy {strategy!r}; expected one of {", ".join(STRATEGIES)}')
+        self.strategy = strategy
+        self.unit = 'tokens' if strategy == 'token' else 'chars'
+        if max_size is None:
+            max_size = {'fixed': FIXED_CHUNK_SIZE, 'token': CHUNK_MAX_TOKENS}.get(strategy, CHUNK_MAX_CHARS)
+        if overlap is None:
+            overlap = FIXED_OVERLAP if strategy == 'fixed' else CHUNK_OVERLAP
+        if strategy == 'fixed' and overlap >= max_size:
+            raise ValueError('Chunk overlap must be smaller than the chunk size')
+        self.max_size = max_size
+        self.overlap = overlap
+
+    def describe(self):
+        return f'{self.strategy}:{self.max_size}{"t" if self.unit == "tokens" else "c"}:{self.overlap}'
+
+    def measure(self, text):
+        return count_tokens(text) if self.unit == 'tokens' else len(text)
+
+    def chunk_text(self, text):
+        """Chunk texts of a single string."""
+        return [c['text'] for c in self.chunks([text])]
+
+    def chunks(self, pieces):
+        """Yield ``{'text', 'start', 'end', 'page_start', 'page_end'[, 'heading']}`` per chunk.
+
+        ``start``/``end`` are offsets into ``''.join(pieces)``; pages are the
+        1-based indexes of the pieces the chunk spans. With the heading
+        strategy, ``text`` may be prefixed with its section heading, which
+        then also appears as ``heading``.
+        """
+        page_starts = []
+
+        def pages(pieces):
+            offset = 0
+            for piece in pieces:
+                page_starts.append(offset)
+                offset += len(piece)
+                yield piece
+
+        spans = self._fixed(pages(pieces)) if self.strategy == 'fixed' else self._packed(pages(pieces))
+        for chunk in spans:
+            chunk['page_start'] = bisect.bisect_right(page_starts, chunk['start'])
+            chunk['page_end'] = bisect.bisect_right(page_starts, max(chunk['start'], chunk['end'] - 1))
+            yield chunk
+
+    def _fixed(self, pieces):
+        step = self.max_size - self.overlap
+        buf = ''
+        buf_start = 0
+
+        def window():
+            text = buf[:self.max_size]
+            return {'text': text, 'start': buf_start, 'end': buf_start + len(text)}
+
+        for piece in pieces:
+            buf += piece
+            while len(buf) >= self.max_size:
+                yield window()
+                buf = buf[step:]
+                buf_start += step
+        while buf:
+            yield window()
+            buf = buf[step:]
+            buf_start += step
+
+    def _split(self, text, lo, hi, level):
+        """Spans covering text[lo:hi] contiguously, each within max_size where separators allow."""
+        seps = _SEPARATORS[self.strategy]
+        if level >= len(seps) or self.measure(text[lo:hi]) <= self.max_size:
+            return [(lo, hi)]
+        cuts = [m.end() for m in seps[level].finditer(text, lo, hi) if lo < m.end() < hi]
+        if not cuts:
+            return self._split(text, lo, hi, level + 1)
+        spans = []
+        for a, b in zip([lo] + cuts, cuts + [hi]):
+            spans.extend(self._split(text, a, b, level + 1))
+        return spans
+
+    def _units(self, text, base):
+        """(start, end, text) units of a complete segment; whitespace-only spans join their neighbour."""
+        seps = _SEPARATORS[self.strategy]
+        # first level always applies (a heading must be its own line, a sentence its own unit)
+        cuts = [m.end() for m in seps[0].finditer(text) if 0 < m.end() < len(text)]
+        spans = []
+        for a, b in zip([0] + cuts, cuts + [len(text)]):
+            spans.extend(self._split(text, a, b, 1))
+        units = []
+        for a, b in spans:
+            if units and not text[a:b].strip():
+                start, _, unit = units[-1]
+                units[-1] = (start, base + b, unit + text[a:b])
+            elif units and not units[-1][2].strip():
+                start, _, unit = units[-1]
+                units[-1] = (start, base + b, unit + text[a:b])
+            else:
+                units.append((base + a, base + b, text[a:b]))
+        return units
+
+    def _segments(self, pieces):
+        """Yield (offset, text) runs that end at a line break, so no unit spans two runs."""
+        buf = ''
+        buf_start = 0
+        for piece in pieces:
+            buf += piece
+            cut = buf.rfind('\n') + 1
+            if not cut and len(buf) > 8 * CHUNK_MAX_CHARS:
+                # a page without line breaks: cut at the last space instead
+                cut = buf.rfind(' ') + 1
+            if cut:
+                yield buf_start, buf[:cut]
+                buf = buf[cut:]
+                buf_start += cut
+        if buf:
+            yield buf_start, buf
+
+    def _packed(self, pieces):
+        current = []       # (start, end, text) units of the chunk being built
+        size = 0
+        heading = None     # heading of the section the current chunk belongs to
+        headed = False     # whether the current chunk starts with its heading line
+
+        def emit():
+            body = ''.join(u[2] for u in current)
+            lead = len(body) - len(body.lstrip())
+            text = body.strip()
+            if not text:
+                return None
+            chunk = {'text': text, 'start': current[0][0] + lead, 'end': current[0][0] + lead + len(text)}
+            if heading is not None and not headed:
+                chunk['text'] = f'{heading}\n{text}'
+                chunk['heading'] = heading
+            elif heading is not None:
+                chunk['heading'] = heading
+            return chunk
+
+        for offset, segment in self._segments(pieces):
+            for unit in self._units(segment, offset):
+                unit_size = self.measure(unit[2])
+                if self.strategy == 'heading' and is_heading(unit[2]):
+                    if headed and all(is_heading(u[2]) for u in current):
+                        # consecutive headings ("Menu" / "Special Menu") stay together
+                        current.append(unit)
+                        size += unit_size
+                    else:
+                        if current:
+                            chunk = emit()
+                            if chunk:
+                                yield chunk
+                        current, size, headed = [unit], unit_size, True
+                    heading = unit[2].strip().lstrip('#').strip()
+                    continue
+                if current and size + unit_size > self.max_size:
+                    chunk = emit()
+                    if chunk:
+                        yield chunk
+                    current = current[-self.overlap:] if self.overlap else []
+                    size = sum(self.measure(u[2]) for u in current)
+                    headed = bool(current) and self.strategy == 'heading' and is_heading(current[0][2])
+                current.append(unit)
+                size += unit_size
+        if current:
+            chunk = emit()
+            if chunk:
+                yield chunk
@@ -0,0 +1,105 @@
+"""Persistent, content-addressed cache of chunk embeddings (SQLite, LRU-bounded)."""
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import numpy as np
+
+logger = logging.getLogger("call-agent-api")
+
+DEFAULT_MAX_ENTRIES = int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', '20000'))
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_BATCH = 500
+
+
+def cache_key(text, model):
+    """Key a chunk by model name and the sha256 of its text."""
+    h = hashlib.sha256()
+    h.update(model.encode('utf-8'))
+    h.update(b'\0')
+    h.update(text.encode('utf-8'))
+    return h.hexdigest()
+
+
+class EmbeddingCache:
+    """Maps (chunk text, model) to its embedding vector.
+
+    Entries are shared across PDFs: any chunk that was embedded before is
+    served from disk. The store is bounded to ``max_entries`` and evicts the
+    least recently used rows once that bound is exceeded.
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS embeddings ('
+            ' key TEXT PRIMARY KEY, model TEXT NOT NULL, dim INTEGER NOT NULL,'
+            ' vector BLOB NOT NULL, last_used REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)')
+        self._conn.commit()
+
+    def get_many(self, texts, model):
+        """Return {position: vector} for every text already in the cache."""
+        keys = [cache_key(t, model) for t in texts]
+        found = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), _LOOKUP_BATCH):
+                batch = list(set(keys[i:i + _LOOKUP_BATCH]))
+                marks = ','.join('?' * len(batch))
+                rows = self._conn.execute(f'SELECT key, vector FROM embeddings WHERE key IN ({marks})', batch).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+                if rows:
+                    self._conn.execute(f'UPDATE embeddings SET last_used = ? WHERE key IN ({marks})', [now] + batch)
+            self._conn.commit()
+            result = {i: found[k] for i, k in enumerate(keys) if k in found}
+            self.hits += len(result)
+            self.misses += len(keys) - len(result)
+        return result
+
+    def put_many(self, texts, vectors, model):
+        now = time.time()
+        rows = []
+        for text, vec in zip(texts, vectors):
+            arr = np.asarray(vec, dtype=np.float32)
+            rows.append((cache_key(text, model), model, int(arr.shape[0]), arr.tobytes(), now))
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO embeddings (key, model, dim, vector, last_used) VALUES (?, ?, ?, ?, ?)', rows)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        count = self._conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                'DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)', (excess,))
+            self.evictions += excess
+            logger.info(f"Embedding cache evicted {excess} least recently used entries")
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': (self.hits / lookups) if lookups else 0.0,
+        }
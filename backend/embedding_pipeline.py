@@ -0,0 +1,148 @@
+"""Batched, concurrent embedding requests with retry/backoff and progress reporting."""
+import os
+import time
+import random
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+logger = logging.getLogger("call-agent-api")
+
+EMBEDDING_MODEL = 'text-embedding-3-small'
+
+# OpenAI accepts up to 2048 inputs per embeddings request; keep batches well
+# below that and cap total characters so a batch stays under the token limit.
+DEFAULT_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '64'))
+DEFAULT_MAX_BATCH_CHARS = int(os.getenv('EMBEDDING_MAX_BATCH_CHARS', '200000'))
+DEFAULT_CONCURRENCY = int(os.getenv('EMBEDDING_CONCURRENCY', '4'))
+DEFAULT_MAX_RETRIES = int(os.getenv('EMBEDDING_MAX_RETRIES', '5'))
+
+_RETRYABLE_ERRORS = ('RateLimitError', 'APIConnectionError', 'APITimeoutError', 'InternalServerError')
+
+
+def _is_retryable(exc):
+    status = getattr(exc, 'status_code', None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(exc).__name__ in _RETRYABLE_ERRORS
+
+
+def _retry_after(exc):
+    """Seconds requested by the server's Retry-After header, if any."""
+    response = getattr(exc, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        value = headers.get('retry-after')
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def make_batches(texts, batch_size=DEFAULT_BATCH_SIZE, max_chars=DEFAULT_MAX_BATCH_CHARS):
+    """Group texts into (start, [texts]) batches bounded by count and total characters."""
+    batches = []
+    start = 0
+    current = []
+    current_chars = 0
+    for i, text in enumerate(texts):
+        if current and (len(current) >= batch_size or current_chars + len(text) > max_chars):
+            batches.append((start, current))
+            start = i
+            current = []
+            current_chars = 0
+        current.append(text)
+        current_chars += len(text)
+    if current:
+        batches.append((start, current))
+    return batches
+
+
+class EmbeddingPipeline:
+    """Embed many texts with few requests: batches run on a bounded thread pool.
+
+    ``progress`` callbacks receive ``(done, total)`` counted in texts, and are
+    called from worker threads as each batch completes. When a ``cache`` is
+    given, texts it already holds are not sent to the API.
+    """
+
+    def __init__(self, client, model=EMBEDDING_MODEL, cache=None, batch_size=DEFAULT_BATCH_SIZE,
+                 max_concurrency=DEFAULT_CONCURRENCY, max_retries=DEFAULT_MAX_RETRIES,
+                 max_batch_chars=DEFAULT_MAX_BATCH_CHARS, base_delay=0.5, max_delay=30.0):
+        self.client = client
+        self.model = model
+        self.cache = cache
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.max_batch_chars = max_batch_chars
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def _backoff(self, attempt, exc):
+        delay = _retry_after(exc)
+        if delay is None:
+            # exponential backoff with full jitter
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        return min(delay, self.max_delay)
+
+    def _embed_batch(self, batch):
+        attempt = 0
+        while True:
+            try:
+                resp = self.client.embeddings.create(model=self.model, input=batch)
+                # the API returns items tagged with their input index
+                data = sorted(resp.data, key=lambda d: d.index)
+                return [d.embedding for d in data]
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    raise
+                delay = self._backoff(attempt, e)
+                attempt += 1
+                logger.warning(f"Embedding batch of {len(batch)} failed ({e}); retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                time.sleep(delay)
+
+    def embed(self, texts, progress=None):
+        """Return one embedding per text, in input order."""
+        texts = list(texts)
+        total = len(texts)
+        results = [None] * total
+        if total == 0:
+            return results
+
+        if self.cache is not None:
+            for i, vec in self.cache.get_many(texts, self.model).items():
+                results[i] = vec
+        pending = [i for i in range(total) if results[i] is None]
+        done = total - len(pending)
+        if progress:
+            progress(done, total)
+        if not pending:
+            logger.info(f"Embedded {total} chunks from cache")
+            return results
+
+        # batch positions refer to ``pending``, not to ``texts``
+        batches = make_batches([texts[i] for i in pending], self.batch_size, self.max_batch_chars)
+
+        workers = min(self.max_concurrency, len(batches))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='embed') as pool:
+            futures = {pool.submit(self._embed_batch, batch): (start, len(batch)) for start, batch in batches}
+            try:
+                for fut in as_completed(futures):
+                    start, size = futures[fut]
+                    vectors = fut.result()
+                    if len(vectors) != size:
+                        raise RuntimeError(f'Embedding response returned {len(vectors)} vectors for {size} inputs')
+                    positions = pending[start:start + size]
+                    for pos, vec in zip(positions, vectors):
+                        results[pos] = vec
+                    if self.cache is not None:
+                        self.cache.put_many([texts[p] for p in positions], vectors, self.model)
+                    done += size
+                    if progress:
+                        progress(done, total)
+            except Exception:
+                for f in futures:
+                    f.cancel()
+                raise
+
+        logger.info(f"Embedded {total} chunks ({len(pending)} new) in {len(batches)} requests")
+        return results
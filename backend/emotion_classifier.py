@@ -0,0 +1,223 @@
+"""Tiered emotion classification for /analyze-emotion.
+
+1. A compiled keyword lexicon (English and Indonesian) answers in microseconds.
+2. When it is not confident, earlier LLM verdicts are reused, keyed by the
+   normalized text.
+3. Only then is the LLM asked; its verdict is cached for next time.
+"""
+import os
+import re
+import json
+import time
+import logging
+import threading
+
+from query_cache import TTLCache, normalize_query
+
+logger = logging.getLogger("call-agent-api")
+
+# below this lexicon confidence the LLM is consulted
+EMOTION_LLM_THRESHOLD = float(os.getenv('EMOTION_LLM_THRESHOLD', '0.6'))
+EMOTION_CACHE_SIZE = int(os.getenv('EMOTION_CACHE_SIZE', '5000'))
+EMOTION_CACHE_TTL_SECONDS = float(os.getenv('EMOTION_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+
+# emotion -> (pitch, rate)
+PROSODY = {
+    'neutral': (1.0, 1.0),
+    'happy': (1.2, 1.05),
+    'apologetic': (0.9, 0.95),
+    'empathetic': (0.92, 0.92),
+    'excited': (1.25, 1.1),
+    'reassuring': (0.95, 0.95),
+    'urgent': (1.05, 1.12),
+}
+
+# emotion -> {term: weight}; weight 1.0 terms decide on their own, 0.5 terms need support
+LEXICON = {
+    'apologetic': {
+        'sorry': 1.0, 'apologize': 1.0, 'apologise': 1.0, 'apologies': 1.0, 'apology': 1.0,
+        'my bad': 1.0, 'unfortunately': 0.5, 'regret': 0.5, 'inconvenience': 1.0,
+        'maaf': 1.0, 'maafkan': 1.0, 'mohon maaf': 1.0, 'minta maaf': 1.0, 'sayangnya': 0.5, 'ketidaknyamanan': 1.0,
+    },
+    'happy': {
+        'thanks': 1.0, 'thank you': 1.0, 'great': 0.5, 'glad': 1.0, 'happy to': 1.0, 'wonderful': 1.0,
+        'congratulate': 1.0, 'congrats': 1.0, 'congratulations': 1.0, 'enjoy': 0.5, 'pleasure': 1.0,
+        'terima kasih': 1.0, 'makasih': 1.0, 'senang': 1.0, 'selamat': 0.5, 'selamat menikmati': 1.0,
+        'dengan senang hati': 1.0, 'mantap': 1.0, 'bagus': 0.5, 'hebat': 1.0,
+    },
+    'empathetic': {
+        'understand': 0.5, 'i understand': 1.0, 'that must be': 1.0, 'frustrating': 1.0,
+        'difficult': 0.5, 'i hear you': 1.0,
+        'saya mengerti': 1.0, 'saya paham': 1.0, 'kami mengerti': 1.0, 'memahami': 0.5, 'turut prihatin': 1.0,
+        'kecewa': 0.5,
+    },
+    'excited': {
+        'amazing': 1.0, 'awesome': 1.0, 'fantastic': 1.0, 'exciting': 1.0, 'special offer': 1.0, 'wow': 1.0,
+        'luar biasa': 1.0, 'keren': 1.0, 'promo': 0.5, 'diskon': 0.5, 'gratis': 0.5, 'spesial': 0.5,
+    },
+    'reassuring': {
+        "don't worry": 1.0, 'no problem': 1.0, 'no worries': 1.0, 'rest assured': 1.0, 'of course': 0.5,
+        'will be fine': 1.0, 'we will help': 1.0,
+        'jangan khawatir': 1.0, 'tidak masalah': 1.0, 'tenang saja': 1.0, 'tentu': 0.5, 'tentu saja': 1.0,
+        'akan kami bantu': 1.0, 'siap membantu': 1.0,
+    },
+    'urgent': {
+        'urgent': 1.0, 'immediately': 1.0, 'right away': 1.0, 'asap': 1.0, 'emergency': 1.0, 'hurry': 1.0,
+        'segera': 0.5, 'darurat': 1.0, 'cepat': 0.5, 'sekarang juga': 1.0, 'penting': 0.5,
+    },
+}
+
+# endings a term may carry and still match ("apologized", "gladly", "senangnya");
+# anything else after a term is a different word ("tentukan", "greater")
+INFLECTIONS = ('s', 'es', 'd', 'ed', 'ing', 'ly', 'nya', 'lah', 'kah', 'pun')
+
+# a term right after one of these does not count ("tidak senang", "not great")
+NEGATORS = frozenset(['not', 'no', 'never', "isn't", "wasn't", "don't", 'tidak', 'tak', 'bukan', 'belum', 'kurang'])
+# a negated cue leaves the text's emotion open
+NEGATED_CONFIDENCE_CAP = 0.5
+# no cue at all: most replies are plain information; '!' hints at something the lexicon missed
+NO_CUE_CONFIDENCE = 0.7
+NO_CUE_EXCLAIM_CONFIDENCE = 0.3
+
+
+def _compile(lexicon, inflections=INFLECTIONS):
+    terms = {}
+    for emotion, entries in lexicon.items():
+        for term, weight in entries.items():
+            terms[term] = (emotion, weight)
+    # longest first, so "mohon maaf" wins over "maaf" at the same position
+    alternation = '|'.join(re.escape(t) for t in sorted(terms, key=len, reverse=True))
+    endings = '|'.join(re.escape(e) for e in sorted(inflections, key=len, reverse=True))
+    return re.compile(rf"(?<![\w'])({alternation})(?:{endings})?(?![\w'])", re.IGNORECASE), terms
+
+
+_PATTERN, _TERMS = _compile(LEXICON)
+_WORD = re.compile(r"[\w']+")
+
+
+def classify_local(text):
+    """Return ``(emotion, confidence)`` from the lexicon alone; confidence is 0..1."""
+    scores = {}
+    negated = False
+    for match in _PATTERN.finditer(text):
+        emotion, weight = _TERMS[match.group(1).lower()]
+        previous = _WORD.findall(text[max(0, match.start() - 12):match.start()])
+        if previous and previous[-1].lower() in NEGATORS:
+            negated = True
+            continue
+        scores[emotion] = scores.get(emotion, 0.0) + weight
+    if not scores:
+        if negated:
+            return 'neutral', NEGATED_CONFIDENCE_CAP * 0.5
+        return 'neutral', NO_CUE_EXCLAIM_CONFIDENCE if '!' in text else NO_CUE_CONFIDENCE
+    ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+    top_emotion, top = ranked[0]
+    second = ranked[1][1] if len(ranked) > 1 else 0.0
+    # strong, unopposed cues -> 1.0; weak or conflicting cues -> lower
+    confidence = min(1.0, top) * (top - second) / top
+    if negated:
+        confidence = min(confidence, NEGATED_CONFIDENCE_CAP)
+    return top_emotion, confidence
+
+
+def llm_messages(text):
+    prompt = (
+        "Analyze the emotion and suggest simple speech parameters. "
+        "Return only a JSON object with keys: emotion (string), pitch (number), rate (number). "
+        "Examples: {\"emotion\": \"neutral\", \"pitch\": 1.0, \"rate\": 1.0}.\n\n"
+        f"Text: {text}\n\nJSON:")
+    return [
+        {"role": "system", "content": "You are an assistant that maps text to short emotion labels and simple pitch/rate values."},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def parse_llm_reply(reply):
+    """(emotion, pitch, rate) from the model's JSON reply; neutral defaults if it is not JSON."""
+    try:
+        parsed = json.loads(reply)
+        pitch = float(parsed.get('pitch', 1.0))
+        rate = float(parsed.get('rate', 1.0))
+        emotion = str(parsed.get('emotion', 'neutral'))
+    except Exception:
+        return 'neutral', 1.0, 1.0
+    return emotion, pitch, rate
+
+
+class _Tier:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.seconds += seconds
+
+
+class EmotionEngine:
+    """Lexicon first, then cached LLM verdicts, then the LLM itself.
+
+    ``chat`` is an async ``chat.completions.create``-style callable, or None
+    to run on the lexicon alone.
+    """
+
+    TIERS = ('lexicon', 'llm_cache', 'llm', 'fallback')
+
+    def __init__(self, chat=None, model='gpt-3.5-turbo', threshold=EMOTION_LLM_THRESHOLD,
+                 cache_size=EMOTION_CACHE_SIZE, cache_ttl=EMOTION_CACHE_TTL_SECONDS):
+        self.chat = chat
+        self.model = model
+        self.threshold = threshold
+        self.verdicts = TTLCache(cache_size, cache_ttl)
+        self._tiers = {name: _Tier() for name in self.TIERS}
+        self._lock = threading.Lock()
+
+    def _record(self, tier, started):
+        with self._lock:
+            self._tiers[tier].add(time.perf_counter() - started)
+
+    async def _ask_llm(self, text):
+        resp = await self.chat(model=self.model, messages=llm_messages(text), temperature=0.0, max_tokens=60)
+        return parse_llm_reply(resp.choices[0].message.content.strip())
+
+    async def analyze(self, text):
+        """Return ``{'emotion', 'pitch', 'rate', 'tier'}`` for ``text``."""
+        started = time.perf_counter()
+        emotion, confidence = classify_local(text)
+        if confidence >= self.threshold or self.chat is None:
+            pitch, rate = PROSODY[emotion]
+            self._record('lexicon', started)
+            return {'emotion': emotion, 'pitch': pitch, 'rate': rate, 'tier': 'lexicon'}
+
+        key = normalize_query(text)
+        verdict = self.verdicts.get(key)
+        if verdict is not None:
+            self._record('llm_cache', started)
+            return dict(verdict, tier='llm_cache')
+
+        try:
+            llm_started = time.perf_counter()
+            llm_emotion, pitch, rate = await self._ask_llm(text)
+        except Exception as e:
+            logger.warning(f"Emotion analysis failed: {e or type(e).__name__}")
+            pitch, rate = PROSODY[emotion]
+            self._record('fallback', started)
+            return {'emotion': emotion, 'pitch': pitch, 'rate': rate, 'tier': 'fallback'}
+        verdict = {'emotion': llm_emotion, 'pitch': pitch, 'rate': rate}
+        self.verdicts.put(key, verdict, time.perf_counter() - llm_started)
+        self._record('llm', started)
+        return dict(verdict, tier='llm')
+
+    def stats(self):
+        with self._lock:
+            total = sum(t.count for t in self._tiers.values())
+            tiers = {
+                name: {
+                    'count': t.count,
+                    'share': (t.count / total) if total else 0.0,
+                    'avg_us': (t.seconds / t.count * 1e6) if t.count else 0.0,
+                }
+                for name, t in self._tiers.items()
+            }
+        return {'threshold': self.threshold, 'requests': total, 'tiers': tiers,
+                'llm_cache': self.verdicts.stats()}
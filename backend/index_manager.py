@@ -0,0 +1,242 @@
+"""In-process vector index + chunk texts, loaded once and hot-swapped on rebuild."""
+import os
+import uuid
+import shutil
+import logging
+import threading
+import numpy as np
+from vector_store import EmbeddingStore, write_store, top_k, normalize_rows
+from ann_index import faiss, faiss_available, build_index, configure, needs_rebuild
+
+logger = logging.getLogger("call-agent-api")
+
+FAISS_INDEX_FILE = 'index.faiss'
+POINTER_FILE = 'CURRENT'
+# old versions kept on disk so workers still mapping them can finish their queries
+KEEP_VERSIONS = 2
+
+
+def _atomic_write(path, write):
+    """Write via a temp file in the same directory, then rename over ``path``."""
+    tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _read_faiss(path):
+    """Load a FAISS index, memory-mapping its data where this faiss build supports it."""
+    flag = getattr(faiss, 'IO_FLAG_MMAP_IFC', None) or getattr(faiss, 'IO_FLAG_MMAP', None)
+    if flag is not None:
+        try:
+            return faiss.read_index(path, flag | faiss.IO_FLAG_READ_ONLY)
+        except Exception:
+            pass
+    return faiss.read_index(path)
+
+
+class IndexSnapshot:
+    """An immutable (index, store, version) set. Readers hold one for a whole query.
+
+    ``index`` is a FAISS index or None; ``items`` is the memory-mapped
+    EmbeddingStore, whose vectors back the NumPy scorer when FAISS is missing.
+    """
+
+    def __init__(self, index, store, version):
+        self.index = index
+        self.items = store
+        self.version = version
+
+    @property
+    def matrix(self):
+        return self.items.vectors
+
+    @property
+    def index_spec(self):
+        """Factory string of ``index``; stores from before specs were recorded always had a flat one."""
+        if self.index is None:
+            return None
+        return self.items.header.get('index_spec') or 'Flat'
+
+
+class IndexManager:
+    """Keeps the vector index and chunk texts resident in memory.
+
+    Each ``publish`` writes a complete store (plus FAISS index, if any) into a
+    new version directory under ``root`` and then atomically rewrites the
+    ``CURRENT`` pointer. Every worker process stats that pointer on each
+    lookup (no file reads) and remaps only when another process has published
+    a new version. The in-memory snapshot is replaced with a single reference
+    assignment, so concurrent searches see either the old or the new index,
+    never a mix.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.pointer_path = os.path.join(root, POINTER_FILE)
+        self._snapshot = None
+        self._stat = None
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def _pointer_stat(self):
+        try:
+            st = os.stat(self.pointer_path)
+            return (st.st_mtime_ns, st.st_size, st.st_ino)
+        except OSError:
+            return None
+
+    def _load(self):
+        with open(self.pointer_path, 'r', encoding='utf-8') as f:
+            version = f.read().strip()
+        directory = os.path.join(self.root, version)
+        store = EmbeddingStore(directory)
+        index = None
+        index_path = os.path.join(directory, FAISS_INDEX_FILE)
+        if faiss_available() and os.path.exists(index_path):
+            index = configure(_read_faiss(index_path))
+            if index.ntotal != len(store):
+                raise RuntimeError(f'FAISS index has {index.ntotal} vectors, store has {len(store)}')
+        return IndexSnapshot(index, store, version)
+
+    def current(self):
+        """Return the latest snapshot, reloading from disk only if the version changed."""
+        stat = self._pointer_stat()
+        if stat is None or stat == self._stat:
+            return self._snapshot
+        with self._lock:
+            if stat != self._stat:
+                try:
+                    self._snapshot = self._load()
+                    self._stat = stat
+                    logger.info(f"Loaded vector store version {self._snapshot.version} ({len(self._snapshot.items)} chunks)")
+                except Exception as e:
+                    logger.warning(f"Vector store reload deferred: {e}")
+        return self._snapshot
+
+    def publish(self, index, vectors, texts, model, source_hash=None, dtype='float32', chunks=None, chunker=None,
+                index_spec=None):
+        """Persist a freshly built store/index and swap it in for this process.
+
+        ``index`` may be None when FAISS is unavailable; ``vectors`` are always
+        stored for the NumPy scorer. ``chunks``/``chunker``/``index_spec`` are
+        passed to ``write_store``.
+        """
+        version = uuid.uuid4().hex
+        directory = os.path.join(self.root, version)
+        write_store(directory, vectors, texts, model, source_hash=source_hash, dtype=dtype, chunks=chunks,
+                    chunker=chunker, index_spec=index_spec)
+        if index is not None:
+            faiss.write_index(index, os.path.join(directory, FAISS_INDEX_FILE))
+
+        def write_pointer(p):
+            with open(p, 'w', encoding='utf-8') as f:
+                f.write(version)
+        _atomic_write(self.pointer_path, write_pointer)
+
+        snapshot = IndexSnapshot(index, EmbeddingStore(directory), version)
+        with self._lock:
+            self._snapshot = snapshot
+            self._stat = self._pointer_stat()
+        self._cleanup(version)
+        return version
+
+    def add(self, vectors, texts, model, chunks=None):
+        """Append chunks to the current store and publish the result as a new version.
+
+        The current FAISS index is copied and grown with the new vectors, so a
+        trained IVF/PQ index is not retrained and an HNSW graph is not rebuilt;
+        only when ``needs_rebuild`` says the larger store calls for another
+        index is one built from scratch. ``chunks`` are positions for the new
+        texts; they are required when the store has positions and ignored
+        when it has none. With no current version this is a plain build and
+        ``publish``.
+        """
+        new = normalize_rows(vectors)
+        with self._write_lock:
+            snapshot = self.current()
+            if snapshot is None or len(snapshot.items) == 0:
+                index, spec = build_index(new) if faiss_available() else (None, None)
+                return self.publish(index, new, texts, model, chunks=chunks, index_spec=spec)
+            items = snapshot.items
+            header = items.header
+            if new.shape[1] != header['dim']:
+                raise ValueError(f"Cannot add {new.shape[1]}-dim vectors to a {header['dim']}-dim store")
+            if header.get('model') != model:
+                raise ValueError(f"Cannot add {model} embeddings to a {header.get('model')} store")
+            all_vectors = np.concatenate([np.asarray(items.vectors, dtype=np.float32), new])
+            all_texts = [items.text(i) for i in range(len(items))] + list(texts)
+            all_chunks = None
+            if items.positions is not None:
+                if chunks is None:
+                    raise ValueError('Cannot add texts without chunk positions to a store that has them')
+                all_chunks = [items.chunk(i) for i in range(len(items))] + list(chunks)
+            index, spec = None, snapshot.index_spec
+            if faiss_available():
+                if snapshot.index is not None and not needs_rebuild(spec, len(all_vectors), new.shape[1]):
+                    # a private, writable copy; the snapshot's index may be memory-mapped and is in use
+                    index = faiss.read_index(os.path.join(items.directory, FAISS_INDEX_FILE))
+                    index.add(new)
+                    configure(index)
+                else:
+                    index, spec = build_index(all_vectors)
+                    logger.info(f"Rebuilt vector index as {spec} for {len(all_vectors)} vectors")
+            return self.publish(index, all_vectors, all_texts, model, source_hash=header.get('source_hash'),
+                                dtype=header['dtype'], chunks=all_chunks, chunker=header.get('chunker'),
+                                index_spec=spec)
+
+    def indexed_prefix(self, texts, model, source_hash=None, dtype='float32', chunker=None):
+        """How many of ``texts`` the current store already holds, in order.
+
+        0 unless the store was written for the same source, model, dtype and
+        chunker; its chunks then come out of chunking the same document the
+        same way, so the remaining ``texts`` can be ``add``-ed to it.
+        """
+        snapshot = self.current()
+        if snapshot is None:
+            return 0
+        items = snapshot.items
+        header = items.header
+        if (header.get('model') != model or header.get('source_hash') != source_hash
+                or header.get('dtype') != dtype or header.get('chunker') != chunker or len(items) > len(texts)):
+            return 0
+        if any(items.text(i) != texts[i] for i in range(len(items))):
+            return 0
+        return len(items)
+
+    def _cleanup(self, keep_version):
+        """Delete all but the newest KEEP_VERSIONS version directories."""
+        try:
+            dirs = [d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d))]
+            dirs.sort(key=lambda d: os.path.getmtime(os.path.join(self.root, d)), reverse=True)
+            for d in dirs[KEEP_VERSIONS:]:
+                if d != keep_version:
+                    shutil.rmtree(os.path.join(self.root, d), ignore_errors=True)
+        except OSError as e:
+            logger.warning(f"Vector store cleanup failed: {e}")
+
+    def search_batch(self, query_vecs, k=3):
+        """Return (per-query lists of (score, item), source), or (None, None) without an index."""
+        snapshot = self.current()
+        if snapshot is None:
+            return None, None
+        items = snapshot.items
+        if snapshot.index is not None:
+            q = np.array(query_vecs, dtype='float32', ndmin=2)
+            faiss.normalize_L2(q)
+            distances, indices = snapshot.index.search(q, k)
+            hits = [list(zip(d.tolist(), i.tolist())) for d, i in zip(distances, indices)]
+            source = 'faiss'
+        else:
+            hits = top_k(snapshot.matrix, query_vecs, k)
+            source = 'numpy'
+        results = [[(float(score), items[idx]) for score, idx in row if 0 <= idx < len(items)] for row in hits]
+        return results, source
+
+    def search(self, query_vec, k=3):
+        """Single-query form of ``search_batch``."""
+        results, source = self.search_batch([query_vec], k)
+        return (results[0] if results is not None else None), source
@@ -0,0 +1,221 @@
+"""Background job queue for PDF ingestion, with status persisted for polling."""
+import os
+import json
+import time
+import uuid
+import hashlib
+import logging
+import threading
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+try:
+    import fcntl
+    _FCNTL_AVAILABLE = True
+except Exception:
+    fcntl = None
+    _FCNTL_AVAILABLE = False
+
+logger = logging.getLogger("call-agent-api")
+
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', '2'))
+INGEST_PROCESSES = int(os.getenv('INGEST_PROCESSES', str(min(2, os.cpu_count() or 1))))
+# finished job records older than this are pruned from disk
+JOB_RETENTION_SECONDS = 24 * 3600
+# per-key claim files, so a key runs one job at a time across workers
+CLAIMS_DIR = 'claims'
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+
+class Job:
+    """One ingestion job. Every update is written to ``<jobs_dir>/<id>.json``.
+
+    The record lives on disk so that any gunicorn worker can answer
+    ``/jobs/{id}``, not only the one running the job.
+    """
+
+    def __init__(self, manager, kind, **fields):
+        self.manager = manager
+        self.id = uuid.uuid4().hex
+        now = datetime.now().isoformat()
+        self.data = {
+            'id': self.id,
+            'kind': kind,
+            'status': JOB_QUEUED,
+            'stage': JOB_QUEUED,
+            'progress': 0.0,
+            'done': 0,
+            'total': 0,
+            'error': None,
+            'result': None,
+            'created': now,
+            'updated': now,
+        }
+        self.data.update(fields)
+        self._lock = threading.Lock()
+
+    def update(self, **fields):
+        with self._lock:
+            self.data.update(fields)
+            if self.data['total']:
+                self.data['progress'] = round(self.data['done'] / self.data['total'], 4)
+            self.data['updated'] = datetime.now().isoformat()
+            self.manager._save(self.data)
+
+    def progress(self, stage):
+        """Return a ``(done, total)`` callback that reports progress for ``stage``."""
+        return lambda done, total: self.update(stage=stage, done=done, total=total)
+
+
+class JobManager:
+    """Runs ingestion jobs on a small thread pool; CPU-bound steps go to a process pool.
+
+    The thread pool keeps request handlers free, and the process pool lets
+    several PDFs be parsed at once without holding the GIL that serves live
+    call traffic. Both pools are created on first use, so idle workers pay
+    nothing.
+    """
+
+    def __init__(self, jobs_dir, workers=INGEST_WORKERS, processes=INGEST_PROCESSES):
+        self.jobs_dir = jobs_dir
+        self.workers = max(1, workers)
+        self.processes = max(1, processes)
+        self._threads = None
+        self._procs = None
+        self._active = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(jobs_dir, CLAIMS_DIR), exist_ok=True)
+
+    def _path(self, job_id):
+        if not job_id or os.path.basename(job_id) != job_id:
+            raise ValueError(f'Invalid job id: {job_id!r}')
+        return os.path.join(self.jobs_dir, f'{job_id}.json')
+
+    def _save(self, data):
+        path = self._path(data['id'])
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def get(self, job_id):
+        """Return the job record, or None if it does not exist."""
+        try:
+            path = self._path(job_id)
+        except ValueError:
+            return None
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _thread_pool(self):
+        with self._lock:
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ingest')
+            return self._threads
+
+    def _process_pool(self):
+        with self._lock:
+            if self._procs is None:
+                # spawn: forking a threaded server process is not safe
+                self._procs = ProcessPoolExecutor(max_workers=self.processes,
+                                                  mp_context=multiprocessing.get_context('spawn'))
+            return self._procs
+
+    def submit_process(self, fn, *args):
+        """Run a picklable, module-level function in the process pool; returns a Future."""
+        return self._process_pool().submit(fn, *args)
+
+    def _claim(self, key, job_id):
+        """Claim ``key`` for ``job_id`` in every process sharing ``jobs_dir``.
+
+        Returns ``(handle, None)`` when claimed: ``handle`` is a file holding
+        the job id under an exclusive ``flock``, kept open until the job ends,
+        so a crashed worker's claim goes with its process. Returns ``(None,
+        job_id)`` of the holder when another job has the key. Without
+        ``fcntl`` nothing is claimed.
+        """
+        if not _FCNTL_AVAILABLE:
+            return None, None
+        base = os.path.join(self.jobs_dir, CLAIMS_DIR, hashlib.sha256(key.encode('utf-8')).hexdigest())
+        # the mutex makes taking the claim and writing its job id one step for readers
+        with open(f'{base}.lock', 'a') as mutex:
+            fcntl.flock(mutex.fileno(), fcntl.LOCK_EX)
+            try:
+                handle = open(f'{base}.claim', 'a+', encoding='utf-8')
+                try:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    handle.seek(0)
+                    holder = handle.read().strip()
+                    handle.close()
+                    return None, holder
+                handle.truncate(0)
+                handle.write(job_id)
+                handle.flush()
+                return handle, None
+            finally:
+                fcntl.flock(mutex.fileno(), fcntl.LOCK_UN)
+
+    def submit(self, kind, target, key=None, **fields):
+        """Queue ``target(job)`` and return the job id immediately.
+
+        While a job with the same ``key`` is queued or running in any worker
+        sharing ``jobs_dir``, that job's id is returned instead of starting
+        a duplicate.
+        """
+        pool = self._thread_pool()
+        with self._lock:
+            if key is not None and key in self._active:
+                return self._active[key].id
+            job = Job(self, kind, **fields)
+            claim = None
+            if key is not None:
+                claim, holder = self._claim(key, job.id)
+                if holder is not None:
+                    return holder
+                self._active[key] = job
+        job.update()
+        pool.submit(self._run, job, target, key, claim)
+        self._prune()
+        return job.id
+
+    def _run(self, job, target, key, claim):
+        job.update(status=JOB_RUNNING)
+        started = time.perf_counter()
+        try:
+            result = target(job)
+            job.update(status=JOB_DONE, stage=JOB_DONE, result=result)
+            logger.info(f"Job {job.id} ({job.data['kind']}) finished in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.data['kind']}) failed: {e}")
+            job.update(status=JOB_FAILED, error=str(e))
+        finally:
+            if key is not None:
+                with self._lock:
+                    self._active.pop(key, None)
+                    if claim is not None:
+                        claim.close()
+
+    def _prune(self):
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        try:
+            for name in os.listdir(self.jobs_dir):
+                path = os.path.join(self.jobs_dir, name)
+                if name.endswith('.json') and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+        except OSError:
+            pass
+
+    def shutdown(self):
+        with self._lock:
+            if self._threads is not None:
+                self._threads.shutdown(wait=False)
+            if self._procs is not None:
+                self._procs.shutdown(wait=False)
@@ -0,0 +1,156 @@
+"""BM25 inverted index over a PDF's chunks, persisted next to its text cache.
+
+Built once per extraction from the same chunks that get embedded. Each term's
+posting list stores its chunk ids and their precomputed BM25 weight, so a
+query is a few vectorized adds into a score array, well under a millisecond
+for a PDF's worth of chunks. The file is a single ``.npz`` written to a temp
+name and renamed into place.
+"""
+import os
+import re
+import math
+import bisect
+import threading
+from collections import Counter
+
+import numpy as np
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# query terms not in the vocabulary match vocabulary terms they prefix, if at least this long
+MIN_PREFIX = 3
+MAX_PREFIX_EXPANSION = 20
+# reciprocal rank fusion constant; 60 is the usual choice
+RRF_K = 60
+
+_TOKEN = re.compile(r'\w+')
+_POSITION_FIELDS = ('start', 'end', 'page_start', 'page_end')
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.casefold())
+
+
+class KeywordIndex:
+    """Ranked keyword search over a fixed list of chunks."""
+
+    def __init__(self, terms, term_ptr, doc_ids, weights, texts, positions=None):
+        self.terms = terms                  # sorted vocabulary
+        self.term_ids = {t: i for i, t in enumerate(terms)}
+        self.term_ptr = term_ptr            # postings of term i: [term_ptr[i], term_ptr[i + 1])
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.texts = texts
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.texts)
+
+    @classmethod
+    def build(cls, chunks, k1=BM25_K1, b=BM25_B):
+        """Index ``Chunker.chunks`` dicts (or plain strings)."""
+        texts = [c if isinstance(c, str) else c['text'] for c in chunks]
+        positions = None
+        if chunks and not isinstance(chunks[0], str) and all(f in chunks[0] for f in _POSITION_FIELDS):
+            positions = np.array([[c[f] for f in _POSITION_FIELDS] for c in chunks], dtype=np.int64)
+        counts = [Counter(tokenize(t)) for t in texts]
+        lengths = np.array([sum(c.values()) for c in counts], dtype=np.float64)
+        avgdl = float(lengths.mean()) if len(lengths) and lengths.mean() > 0 else 1.0
+        postings = {}
+        for doc, c in enumerate(counts):
+            for term, tf in c.items():
+                postings.setdefault(term, []).append((doc, tf))
+        terms = sorted(postings)
+        n = len(texts)
+        term_ptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        doc_ids, weights = [], []
+        for i, term in enumerate(terms):
+            plist = postings[term]
+            idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for doc, tf in plist:
+                norm = k1 * (1 - b + b * lengths[doc] / avgdl)
+                doc_ids.append(doc)
+                weights.append(idf * tf * (k1 + 1) / (tf + norm))
+            term_ptr[i + 1] = len(doc_ids)
+        return cls(terms, term_ptr, np.array(doc_ids, dtype=np.uint32), np.array(weights, dtype=np.float32),
+                   texts, positions)
+
+    def save(self, path):
+        blob = '\n'.join(self.terms).encode('utf-8')
+        encoded = [t.encode('utf-8') for t in self.texts]
+        text_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=text_offsets[1:])
+        arrays = {
+            'terms': np.frombuffer(blob, dtype=np.uint8),
+            'term_ptr': self.term_ptr,
+            'doc_ids': self.doc_ids,
+            'weights': self.weights,
+            'texts': np.frombuffer(b''.join(encoded), dtype=np.uint8),
+            'text_offsets': text_offsets,
+        }
+        if self.positions is not None:
+            arrays['positions'] = self.positions
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            blob = data['terms'].tobytes().decode('utf-8')
+            terms = blob.split('\n') if blob else []
+            raw = data['texts'].tobytes()
+            offsets = data['text_offsets']
+            texts = [raw[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+            positions = data['positions'] if 'positions' in data.files else None
+            return cls(terms, data['term_ptr'], data['doc_ids'], data['weights'], texts, positions)
+
+    def _expand(self, term):
+        """The term itself, or up to MAX_PREFIX_EXPANSION vocabulary terms it prefixes."""
+        if term in self.term_ids:
+            return [self.term_ids[term]]
+        if len(term) < MIN_PREFIX:
+            return []
+        lo = bisect.bisect_left(self.terms, term)
+        hi = bisect.bisect_left(self.terms, term + '￿')
+        return list(range(lo, min(hi, lo + MAX_PREFIX_EXPANSION)))
+
+    def item(self, doc):
+        item = {'id': f'chunk_{doc}', 'text': self.texts[doc]}
+        if self.positions is not None:
+            item.update(zip(_POSITION_FIELDS, (int(v) for v in self.positions[doc])))
+        return item
+
+    def search(self, query, k=3):
+        """Top-k ``(score, item)`` by BM25, best first; chunks sharing no term are left out."""
+        if not self.texts:
+            return []
+        scores = np.zeros(len(self.texts), dtype=np.float32)
+        matched = False
+        for term, qtf in Counter(tokenize(query)).items():
+            for t in self._expand(term):
+                lo, hi = self.term_ptr[t], self.term_ptr[t + 1]
+                scores[self.doc_ids[lo:hi]] += qtf * self.weights[lo:hi]
+                matched = True
+        if not matched:
+            return []
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[d]), self.item(int(d))) for d in top if scores[d] > 0]
+
+
+def fuse(ranked_lists, k=3, rrf_k=RRF_K):
+    """Reciprocal rank fusion of several best-first lists of ``(score, item, pdf_id)``.
+
+    Items are matched by (pdf_id, text), so lists from differently built
+    indexes of the same document still fuse. Returns ``(fused_score, item, pdf_id)``.
+    """
+    fused = {}
+    for ranked in ranked_lists:
+        for rank, (_, item, pdf_id) in enumerate(ranked):
+            key = (pdf_id, item['text'])
+            score, first, _ = fused.get(key, (0.0, item, pdf_id))
+            fused[key] = (score + 1.0 / (rrf_k + rank + 1), first, pdf_id)
+    return sorted(fused.values(), key=lambda r: r[0], reverse=True)[:k]
@@ -0,0 +1,217 @@
+"""Live feed of call session events, shared by every gunicorn worker.
+
+Publishers append one JSON line per event to a shared feed file. Each worker
+runs one tail thread that follows the file and hands new events to the
+subscribers connected to that worker, so an event written by any worker
+reaches every stream. Event ids are ``<inode>:<offset>`` of the line in the
+feed, which lets a reconnecting client resume from ``Last-Event-ID``.
+"""
+import os
+import json
+import asyncio
+import logging
+import threading
+
+try:
+    import fcntl
+    _FCNTL_AVAILABLE = True
+except Exception:
+    fcntl = None
+    _FCNTL_AVAILABLE = False
+
+logger = logging.getLogger("call-agent-api")
+
+FEED_MAX_BYTES = int(os.getenv('LIVE_FEED_MAX_BYTES', str(16 * 1024 * 1024)))
+FEED_POLL_SECONDS = float(os.getenv('LIVE_FEED_POLL_SECONDS', '0.1'))
+# a subscriber that falls this far behind is disconnected; it can resume
+# from its Last-Event-ID
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+
+class Subscription:
+    def __init__(self, loop, session_id=None, types=None):
+        self.loop = loop
+        self.session_id = session_id
+        self.types = set(types) if types else None
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.lagging = False
+
+    def wants(self, event):
+        # an event without a session (e.g. "cleared") concerns every session
+        if self.session_id is not None and event.get("session_id") not in (None, self.session_id):
+            return False
+        return self.types is None or event.get("type") in self.types
+
+    def _put(self, item):
+        if self.lagging:
+            return
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.lagging = True
+            self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    def deliver(self, event_id, event):
+        if self.wants(event):
+            try:
+                self.loop.call_soon_threadsafe(self._put, (event_id, event))
+            except RuntimeError:
+                # the subscriber's event loop has shut down
+                pass
+
+
+class LiveFeed:
+    def __init__(self, path, max_bytes=FEED_MAX_BYTES, poll_seconds=FEED_POLL_SECONDS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.poll_seconds = poll_seconds
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._file = None
+        self._inode = None
+        self._offset = 0
+        # create the file so every worker tails the same inode from the start
+        open(path, 'a').close()
+
+    def publish(self, event_type, session_id, data=None, summary=None):
+        """Append an event to the shared feed; returns nothing, never raises.
+
+        Blocks on the feed lock, so async handlers call it via ``run_in_threadpool``.
+        """
+        event = {"type": event_type, "session_id": session_id, "data": data or {}, "summary": summary}
+        line = (json.dumps(event, ensure_ascii=False) + "\n").encode('utf-8')
+        try:
+            while not self._append(line):
+                pass
+        except Exception as e:
+            logger.error(f"Error publishing {event_type} event for session {session_id}: {e}")
+
+    def _append(self, line):
+        """Append under the feed lock; False if the file was rotated while waiting."""
+        with open(self.path, 'ab') as f:
+            if _FCNTL_AVAILABLE:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                st = os.fstat(f.fileno())
+                if st.st_ino != os.stat(self.path).st_ino:
+                    return False
+                if st.st_size + len(line) > self.max_bytes:
+                    # start a new file; tailers finish the old one first
+                    os.replace(self.path, f"{self.path}.1")
+                    with open(self.path, 'ab') as fresh:
+                        fresh.write(line)
+                else:
+                    f.write(line)
+                return True
+            finally:
+                if _FCNTL_AVAILABLE:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def subscribe(self, session_id=None, types=None, last_event_id=None):
+        """Register a subscriber on the running event loop.
+
+        Returns ``(subscription, backlog)`` where ``backlog`` lists the
+        ``(event_id, event)`` pairs after ``last_event_id`` that the client
+        missed; live events follow on ``subscription.queue``.
+        """
+        sub = Subscription(asyncio.get_running_loop(), session_id, types)
+        self._ensure_tailing()
+        with self._lock:
+            self._subscribers.add(sub)
+            inode, offset = self._inode, self._offset
+        backlog = []
+        if last_event_id:
+            try:
+                last_inode, last_offset = (int(p) for p in last_event_id.split(':'))
+            except ValueError:
+                last_inode = None
+            if last_inode == inode:
+                # the event named by last_event_id was already sent; skip it
+                backlog = [(eid, ev) for eid, ev in self._read_range(last_offset, offset)
+                           if eid != last_event_id and sub.wants(ev)]
+        return sub, backlog
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def _read_range(self, start, end):
+        events = []
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            inode = os.fstat(f.fileno()).st_ino
+            while f.tell() < end:
+                pos = f.tell()
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    events.append((f"{inode}:{pos}", json.loads(line)))
+                except ValueError:
+                    continue
+        return events
+
+    def _ensure_tailing(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._file = open(self.path, 'rb')
+            self._file.seek(0, os.SEEK_END)
+            self._inode = os.fstat(self._file.fileno()).st_ino
+            self._offset = self._file.tell()
+            self._thread = threading.Thread(target=self._tail, name='live-feed', daemon=True)
+            self._thread.start()
+
+    def _drain(self):
+        """Dispatch every complete line after the current offset."""
+        while True:
+            line = self._file.readline()
+            if not line.endswith(b"\n"):
+                # a partial line is re-read once the writer finishes it
+                self._file.seek(self._offset)
+                return
+            event_id = f"{self._inode}:{self._offset}"
+            try:
+                event = json.loads(line)
+            except ValueError:
+                event = None
+            with self._lock:
+                self._offset = self._file.tell()
+                subscribers = list(self._subscribers)
+            if event is not None:
+                for sub in subscribers:
+                    sub.deliver(event_id, event)
+
+    def _tail(self):
+        while not self._stop.is_set():
+            try:
+                self._drain()
+                st = os.stat(self.path)
+                if st.st_ino != self._inode:
+                    # rotated: finish the old file, then follow the new one
+                    self._drain()
+                    self._file.close()
+                    self._file = open(self.path, 'rb')
+                    with self._lock:
+                        self._inode = os.fstat(self._file.fileno()).st_ino
+                        self._offset = 0
+                    continue
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.error(f"Live feed tail error: {e}")
+            self._stop.wait(self.poll_seconds)
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout=1)
@@ -1,47 +1,68 @@
 import os
 import uuid
+import asyncio
 import logging
-from fastapi import FastAPI, UploadFile, File
-from fastapi.responses import JSONResponse
+import threading
+from fastapi import FastAPI, UploadFile, File, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import json
+import hashlib
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime
-from PyPDF2 import PdfReader
-from openai import OpenAI
-import math
-import numpy as np
-import tempfile
 import time
+from embedding_pipeline import EmbeddingPipeline, EMBEDDING_MODEL
+from embedding_cache import EmbeddingCache
+from pdf_registry import PdfRegistry
+from pdf_extract import PageCache, iter_pdf_pages
+from chunker import Chunker
+from keyword_index import KeywordIndex, fuse
+from jobs import JobManager
+from vector_store import normalize_rows
+from ann_index import build_index, faiss_available
+from call_log_store import CallLogStore
+from call_log_index import CallLogIndex, DEFAULT_PAGE_SIZE, listing_fields
+from order_ledger import OrderLedger
+from user_prefs import UserPrefsStore
+from pinecone_sync import PineconeSync, pinecone_configured
+from live_feed import LiveFeed
+from query_cache import SearchCache
+from shared_state import SharedState
+from openai_clients import AsyncUpstream, create_async_client, create_sync_client
+from emotion_classifier import EmotionEngine
+from audio_cache import AudioCache, audio_key
+from tts_pool import TtsPool, TTS_TIMEOUT
+from tts_stream import SsmlAudioStream, split_ssml
+from metrics import Metrics, MetricsMiddleware
+from capabilities import capabilities, warmup_names, CAPABILITY_WARMUP_DELAY
 
-# Initialize OpenAI client
-client = None
+# OpenAI clients: request handlers await the pooled async client; background
+# ingestion threads use the synchronous one. Both are created on first use,
+# which is when the openai package is imported
+openai_upstream = None
 api_key = os.getenv('OPENAI_API_KEY')
 if api_key:
-    client = OpenAI(api_key=api_key)
-
-# Optional integrations
-try:
-    import pinecone
-    _PINECONE_AVAILABLE = True
-except Exception:
-    pinecone = None
-    _PINECONE_AVAILABLE = False
-
-try:
-    import pyttsx3
-    _PYTTSX3_AVAILABLE = True
-except Exception:
-    pyttsx3 = None
-    _PYTTSX3_AVAILABLE = False
-
-# Try to import faiss; if unavailable, we'll fall back to JSON scoring
-try:
-    import faiss
-    _FAISS_AVAILABLE = True
-except Exception:
-    faiss = None
-    _FAISS_AVAILABLE = False
+    openai_upstream = AsyncUpstream(factory=lambda: create_async_client(api_key))
+_sync_client = None
+_sync_client_lock = threading.Lock()
+
+
+def openai_sync_client():
+    """The synchronous OpenAI client, or None without OPENAI_API_KEY."""
+    global _sync_client
+    if _sync_client is None and api_key:
+        with _sync_client_lock:
+            if _sync_client is None:
+                _sync_client = create_sync_client(api_key)
+    return _sync_client
+
+
+# lexicon-first emotion classifier; falls back to OpenAI only for unclear texts
+emotion_engine = EmotionEngine(openai_upstream.chat if openai_upstream else None)
+
+# Optional integrations (faiss, pyttsx3, PyPDF2, pinecone, openai) are imported
+# on first use through the capability registry, and warmed up after startup
 # Email functionality removed for simplicity
 
 logging.basicConfig(level=logging.INFO)
@@ -60,16 +81,125 @@ app.add_middleware(
 # Storage paths
 PDF_TEXT_PATH = "pdf_text_cache.txt"
 PDF_STORAGE_DIR = "uploaded_pdfs"
+PDF_INDEX_DIR = "pdf_indexes"
+JOBS_DIR = "ingest_jobs"
+PAGE_CACHE_DIR = "page_cache"
 CALL_LOGS_DIR = "call_logs"
-EMBEDDINGS_PATH = "embeddings.json"
-FAISS_INDEX_PATH = "embeddings.index"
-EMBEDDINGS_META_PATH = "embeddings_meta.json"
-USER_PREFS_PATH = "user_prefs.json"
+# float16 halves vector storage/page-cache at a small cost in score precision
+VECTOR_STORE_DTYPE = os.getenv('VECTOR_STORE_DTYPE', 'float32')
+# /search-pdf ranking: vector (embeddings only), keyword (BM25 only) or hybrid
+# (both, fused by reciprocal rank); PDFs without embeddings always use keyword
+SEARCH_MODES = ('vector', 'keyword', 'hybrid')
+SEARCH_MODE = os.getenv('SEARCH_MODE', 'hybrid')
+# hits taken from each ranking before fusing them in hybrid mode
+HYBRID_CANDIDATES = int(os.getenv('HYBRID_CANDIDATES', '20'))
+USER_PREFS_PATH = "user_prefs.sqlite"
+# single JSON file of every user's prefs used before the SQLite store; imported once
+LEGACY_USER_PREFS_PATH = "user_prefs.json"
+EMBEDDING_CACHE_PATH = "embedding_cache.sqlite"
+CALL_LOG_INDEX_PATH = "call_logs.sqlite"
+ORDER_LEDGER_PATH = "orders.sqlite"
+# free-text order log written before the ledger; imported into it once
+LEGACY_ORDERS_PATH = "confirmed_orders.txt"
+CALL_EVENTS_PATH = "call_events.jsonl"
+SHARED_STATE_PATH = "shared_state.sqlite"
+AUDIO_CACHE_DIR = "audio_cache"
+METRICS_DIR = "metrics"
+PINECONE_SYNC_PATH = "pinecone_sync.sqlite"
+# comment line sent on idle event streams so proxies keep them open
+EVENTS_KEEPALIVE_SECONDS = 15
 
 # Create directories
 for directory in [PDF_STORAGE_DIR, CALL_LOGS_DIR]:
     os.makedirs(directory, exist_ok=True)
 
+# Request latency, per-stage timers and cache counters for /metrics; every
+# worker shares its totals through METRICS_DIR
+metrics = Metrics(METRICS_DIR)
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+# Splits extracted text into the chunks that are embedded and searched
+# (CHUNK_STRATEGY: fixed, sentence, paragraph, heading, token)
+text_chunker = Chunker()
+
+# Chunk embeddings are reused across PDFs and re-selections
+embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH)
+
+# Repeated /search-pdf questions skip the embedding call, and the search
+# itself while the index is unchanged
+search_cache = SearchCache()
+
+# State every worker must agree on (the selected PDF); a change made through
+# one worker drops the cached search results in all of them
+shared_state = SharedState(SHARED_STATE_PATH)
+shared_state.watch('selected_pdf', lambda _: search_cache.invalidate_results())
+
+# Text cache and vector store per uploaded PDF; stores stay resident and are
+# remapped when their CURRENT pointer changes
+pdf_registry = PdfRegistry(PDF_INDEX_DIR)
+
+# PDF ingestion runs in the background; extraction goes to a process pool
+ingest_jobs = JobManager(JOBS_DIR)
+
+# With Pinecone configured, each build uploads only its new chunks there and
+# deletes the ones that are gone; the index handle is opened once
+pinecone_sync = PineconeSync(PINECONE_SYNC_PATH)
+
+# Call logs are append-only event files with a small summary per session;
+# the summaries are mirrored into an indexed table for /call-logs
+call_log_store = CallLogStore(CALL_LOGS_DIR, index=CallLogIndex(CALL_LOG_INDEX_PATH))
+if call_log_store.index.is_empty():
+    indexed = call_log_store.reindex()
+    if indexed:
+        logger.info(f"Indexed {indexed} existing call log sessions")
+
+# Preferences per user, saved row by row and cached in each worker
+user_prefs = UserPrefsStore(USER_PREFS_PATH)
+if user_prefs.is_empty():
+    imported = user_prefs.import_json(LEGACY_USER_PREFS_PATH)
+    if imported:
+        logger.info(f"Imported preferences of {imported} users")
+
+# Confirmed orders, indexed by order id, phone and date for /orders
+order_ledger = OrderLedger(ORDER_LEDGER_PATH)
+order_ledger.import_legacy(LEGACY_ORDERS_PATH)
+
+# Session activity is pushed to /events subscribers in every worker
+call_events = LiveFeed(CALL_EVENTS_PATH)
+
+# Synthesized speech is cached on disk by SSML and voice settings; misses go
+# to long-lived pyttsx3 engines on their own threads
+audio_cache = AudioCache(AUDIO_CACHE_DIR)
+tts_pool = TtsPool(audio_cache)
+
+
+@metrics.collector
+def component_metrics():
+    """Cache hit counts and in-flight work of this worker's components, read at snapshot time."""
+    caches = {
+        'query_embedding': search_cache.embeddings,
+        'search_results': search_cache.results,
+        'embedding': embedding_cache,
+        'emotion_llm': emotion_engine.verdicts,
+        'audio': audio_cache,
+        'user_prefs': user_prefs,
+    }
+    for name, cache in caches.items():
+        yield 'counter', 'cache_hits_total', {'cache': name}, cache.hits
+        yield 'counter', 'cache_misses_total', {'cache': name}, cache.misses
+    if openai_upstream:
+        for kind, calls in openai_upstream.stats().items():
+            yield 'gauge', 'openai_in_flight', {'kind': kind}, calls['in_flight']
+            yield 'counter', 'openai_calls_total', {'kind': kind}, calls['calls']
+            yield 'counter', 'openai_errors_total', {'kind': kind}, calls['errors']
+            yield 'counter', 'openai_rejected_total', {'kind': kind}, calls['rejected']
+    tts = tts_pool.stats()
+    yield 'gauge', 'tts_queued', {}, tts['queued']
+    yield 'gauge', 'tts_in_flight', {}, tts['in_flight']
+    yield 'counter', 'tts_rejected_total', {}, tts['rejected']
+    for tier, counts in emotion_engine.stats()['tiers'].items():
+        yield 'counter', 'emotion_requests_total', {'tier': tier}, counts['count']
+
 # Models
 class CallLogRequest(BaseModel):
     session_id: str
@@ -95,6 +225,73 @@ class StaffTakeoverRequest(BaseModel):
     session_id: str
     message: str
 
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def index_pdf(pdf_id, job, source_hash=None):
+    """Cache a PDF's text and build its keyword index and vector store in the registry.
+    Runs inside an ingestion job.
+
+    Pages are extracted in parallel and streamed, in order, to the text cache
+    and the chunker; pages seen before (same file hash) come from the page cache.
+    """
+    pdf_path = os.path.join(PDF_STORAGE_DIR, pdf_id)
+    source_hash = source_hash or file_sha256(pdf_path)
+    embed = bool(os.getenv('OPENAI_API_KEY'))
+    pages = metrics.timed_iter("extract", iter_pdf_pages(
+        pdf_path, PageCache(PAGE_CACHE_DIR, source_hash), submit=ingest_jobs.submit_process,
+        workers=ingest_jobs.processes, progress=job.progress("extracting")))
+    started = time.perf_counter()
+    with pdf_registry.text_writer(pdf_id) as out:
+        def pieces():
+            for i, page in enumerate(pages):
+                piece = page if i == 0 else "\n" + page
+                out.write(piece)
+                yield piece
+        chunks = list(text_chunker.chunks(pieces()))
+    # extraction and chunking interleave; chunking gets what extraction did not use
+    metrics.observe("stage_duration_seconds", time.perf_counter() - started - pages.seconds, stage="chunk")
+    logger.info(f"Extracted text from {pdf_id}: {out.length} characters")
+    with metrics.timer("index_build"):
+        pdf_registry.write_keywords(pdf_id, KeywordIndex.build(chunks))
+    # Build embeddings so server-side retrieval is available
+    try:
+        if embed:
+            build_embeddings_for_chunks(chunks, pdf_id, progress=job.progress("embedding"), source_hash=source_hash)
+    except Exception as e:
+        logger.warning(f"Embedding build skipped/failed: {e}")
+    return {"text_length": out.length}
+
+def ingest_pdf(pdf_id, source_hash=None, remove_on_failure=False):
+    """Queue background ingestion of a stored PDF and return the job id; it becomes the active document when done."""
+    def run(job):
+        try:
+            result = index_pdf(pdf_id, job, source_hash=source_hash)
+        except Exception:
+            if remove_on_failure:
+                pdf_path = os.path.join(PDF_STORAGE_DIR, pdf_id)
+                if os.path.exists(pdf_path):
+                    os.remove(pdf_path)
+                pdf_registry.remove(pdf_id)
+            raise
+        select_active_pdf(pdf_id)
+        return result
+    return ingest_jobs.submit("ingest-pdf", run, key=pdf_id, pdf_id=pdf_id)
+
+def active_pdf_text():
+    """Text of the selected PDF, falling back to the legacy single-document cache."""
+    pdf_id = selected_pdf_id()
+    if pdf_id and pdf_registry.has_text(pdf_id):
+        return pdf_registry.read_text(pdf_id)
+    if os.path.exists(PDF_TEXT_PATH):
+        with open(PDF_TEXT_PATH, "r", encoding="utf-8") as f:
+            return f.read()
+    return ""
+
 # PDF Management
 @app.post("/upload-pdf")
 async def upload_pdf(file: UploadFile = File(...)):
@@ -109,24 +306,10 @@ async def upload_pdf(file: UploadFile = File(...)):
         f.write(contents)
     
     try:
-        # Extract text from PDF
-        reader = PdfReader(pdf_path)
-        text = "\n".join(page.extract_text() or "" for page in reader.pages)
-        logger.info(f"Extracted text: {len(text)} characters")
-        
-        # Use text extraction only
-        full_text = text
-        with open(PDF_TEXT_PATH, "w", encoding="utf-8") as f:
-            f.write(full_text)
-        # After saving PDF text, optionally build embeddings if OPENAI_API_KEY is available
-        try:
-            if os.getenv('OPENAI_API_KEY'):
-                build_embeddings_for_text(full_text)
-        except Exception as e:
-            logger.warning(f"Embedding build skipped/failed: {e}")
-        
-        logger.info("PDF processed successfully")
-        return {"success": True, "pdf_path": pdf_path}
+        # Extraction, embedding and indexing run as a background job; poll /jobs/{job_id}
+        job_id = ingest_pdf(unique_name, source_hash=hashlib.sha256(contents).hexdigest(), remove_on_failure=True)
+        logger.info(f"PDF stored, ingestion job {job_id} queued")
+        return {"success": True, "pdf_path": pdf_path, "pdf_id": unique_name, "job_id": job_id}
         
     except Exception as e:
         logger.error(f"PDF processing error: {e}")
@@ -134,22 +317,42 @@ async def upload_pdf(file: UploadFile = File(...)):
             os.remove(pdf_path)
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Job tidak ditemukan"})
+    return job
+
 @app.get("/pdf-text")
 def get_pdf_text():
-    if not os.path.exists(PDF_TEXT_PATH):
-        return {"text": ""}
-    with open(PDF_TEXT_PATH, "r", encoding="utf-8") as f:
-        text = f.read()
-    return {"text": text}
+    return {"text": active_pdf_text()}
+
+def selected_pdf_id():
+    """The active document, as selected through any worker."""
+    selected = shared_state.get('selected_pdf')
+    return selected['pdf_id'] if selected else None
+
+def select_active_pdf(pdf_id):
+    """Make ``pdf_id`` the active document in every worker.
 
-# Global variable to track selected PDF
-SELECTED_PDF_ID = None
+    Each worker drops the search results it cached for the old one when it
+    next reads the selection.
+    """
+    snapshot = pdf_registry.manager(pdf_id).current() if pdf_registry.is_indexed(pdf_id) else None
+    index_version = snapshot.version if snapshot else None
+    selected = shared_state.get('selected_pdf')
+    if selected and selected['pdf_id'] == pdf_id and selected.get('index_version') == index_version:
+        return
+    shared_state.set('selected_pdf', {'pdf_id': pdf_id, 'index_version': index_version,
+                                      'selected_at': datetime.now().isoformat()})
 
 @app.get("/list-pdfs")
 def list_pdfs():
     if not os.path.exists(PDF_STORAGE_DIR):
         return {"pdfs": []}
     
+    selected = selected_pdf_id()
     pdf_files = []
     for filename in os.listdir(PDF_STORAGE_DIR):
         if filename.endswith('.pdf'):
@@ -161,39 +364,33 @@ def list_pdfs():
                 "name": original_name,
                 "path": file_path,
                 "size": os.path.getsize(file_path),
-                "selected": filename == SELECTED_PDF_ID
+                "selected": filename == selected,
+                "indexed": pdf_registry.is_indexed(filename)
             })
     
     return {"pdfs": pdf_files}
 
 @app.post("/select-pdf")
 async def select_pdf(request: SelectPdfRequest):
-    global SELECTED_PDF_ID
     pdf_path = os.path.join(PDF_STORAGE_DIR, request.pdf_id)
     
-    if not os.path.exists(pdf_path):
+    if os.path.basename(request.pdf_id) != request.pdf_id or not os.path.exists(pdf_path):
         return JSONResponse(status_code=404, content={"error": "PDF tidak ditemukan"})
     
     try:
-        reader = PdfReader(pdf_path)
-        text = "\n".join(page.extract_text() or "" for page in reader.pages)
-        
-        # Use text extraction only
-        full_text = text
-        
-        with open(PDF_TEXT_PATH, "w", encoding="utf-8") as f:
-            f.write(full_text)
-        # Build embeddings for selected PDF so server-side retrieval is available
-        try:
-            if os.getenv('OPENAI_API_KEY'):
-                build_embeddings_for_text(full_text)
-        except Exception as e:
-            logger.warning(f"Embedding build skipped/failed: {e}")
+        # Already-indexed documents are a pointer flip; others are ingested once in the background
+        needs_index = not pdf_registry.has_text(request.pdf_id) or (
+            os.getenv('OPENAI_API_KEY') and not pdf_registry.is_indexed(request.pdf_id))
+        if needs_index:
+            job_id = ingest_pdf(request.pdf_id)
+            logger.info(f"Selected PDF: {request.pdf_id}, ingestion job {job_id} queued")
+            return {"success": True, "message": "PDF sedang diproses", "job_id": job_id}
         
         # Update selected PDF ID
-        SELECTED_PDF_ID = request.pdf_id
+        select_active_pdf(request.pdf_id)
         
-        logger.info(f"Selected PDF: {request.pdf_id}, extracted {len(full_text)} characters")
+        full_text = pdf_registry.read_text(request.pdf_id)
+        logger.info(f"Selected PDF: {request.pdf_id}, {len(full_text)} characters")
         return {"success": True, "message": "PDF berhasil dipilih", "text_length": len(full_text)}
         
     except Exception as e:
@@ -201,306 +398,303 @@ async def select_pdf(request: SelectPdfRequest):
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 # Call Logging
+def append_call_log(session_id, **fields):
+    """``call_log_store.append``, timed as the log_write stage."""
+    with metrics.timer("log_write"):
+        return call_log_store.append(session_id, **fields)
+
 @app.post("/log-conversation")
 async def log_conversation(request: CallLogRequest):
-    log_file = os.path.join(CALL_LOGS_DIR, f"{request.session_id}.json")
-    
-    if os.path.exists(log_file):
-        with open(log_file, "r", encoding="utf-8") as f:
-            log_data = json.load(f)
-    else:
-        log_data = {
-            "session_id": request.session_id,
-            "start_time": request.timestamp,
-            "messages": [],
-            "order_status": "none",
-            "session_stats": {
-                "total_messages": 0,
-                "keywords_detected": []
-            }
-        }
-    
-    log_data["messages"].append({
-        "type": request.participant_type,
-        "message": request.message,
-        "timestamp": request.timestamp
-    })
-    
-    log_data["session_stats"]["total_messages"] += 1
+    set_fields = {"status": request.status}
+    keywords = []
     
     # Detect keywords
     if "CLOSE_CALL_CONFIRMED" in request.message:
-        log_data["order_status"] = "completed"
-        log_data["session_stats"]["keywords_detected"].append("CLOSE_CALL_CONFIRMED")
+        set_fields["order_status"] = "completed"
+        keywords.append("CLOSE_CALL_CONFIRMED")
     
     if "TRANSFER_TO_HUMAN" in request.message:
-        log_data["order_status"] = "transferred"
-        log_data["session_stats"]["keywords_detected"].append("TRANSFER_TO_HUMAN")
+        set_fields["order_status"] = "transferred"
+        keywords.append("TRANSFER_TO_HUMAN")
     
-    log_data["status"] = request.status
-    
-    with open(log_file, "w", encoding="utf-8") as f:
-        json.dump(log_data, f, ensure_ascii=False, indent=2)
+    message = {
+        "type": request.participant_type,
+        "message": request.message,
+        "timestamp": request.timestamp
+    }
+    try:
+        summary = await run_in_threadpool(
+            append_call_log,
+            request.session_id,
+            message=message,
+            set_fields=set_fields,
+            keywords=keywords,
+            count_message=True,
+            start_time=request.timestamp
+        )
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
     
+    await run_in_threadpool(call_events.publish, "message", request.session_id, message, listing_fields(summary))
     return {"success": True}
 
 
 # Embedding utilities and endpoints
-def chunk_text(text, chunk_size=800, overlap=200):
-    chunks = []
-    start = 0
-    length = len(text)
-    while start < length:
-        end = min(start + chunk_size, length)
-        chunk = text[start:end]
-        chunks.append(chunk)
-        start += chunk_size - overlap
-    return chunks
-
-
-def build_embeddings_for_text(text):
-    """Split text into chunks and create embeddings via OpenAI API, save to EMBEDDINGS_PATH."""
-    global client
+def build_embeddings_for_chunks(chunks, pdf_id, progress=None, source_hash=None):
+    """Embed already-chunked text (``Chunker.chunks`` dicts) and publish it as pdf_id's vector store.
+
+    ``progress`` is an optional ``(done, total)`` callback reporting embedded chunks;
+    ``source_hash`` identifies the PDF the text came from and is kept in the store header.
+    """
+    client = openai_sync_client()
     if not client:
         raise RuntimeError('OpenAI client not initialized - check OPENAI_API_KEY')
 
-    chunks = chunk_text(text)
-    embeddings = []
-    vectors = []
-    for i, chunk in enumerate(chunks):
-        resp = client.embeddings.create(model='text-embedding-3-small', input=chunk)
-        vec = resp.data[0].embedding
-        embeddings.append({
-            'id': f'chunk_{i}',
-            'text': chunk,
-            'embedding': vec
-        })
-        vectors.append(vec)
-
-    with open(EMBEDDINGS_PATH, 'w', encoding='utf-8') as f:
-        json.dump({'created': datetime.now().isoformat(), 'items': embeddings}, f, ensure_ascii=False)
-
-    # If FAISS available, build an index for faster vector search
-    if _FAISS_AVAILABLE and len(vectors) > 0:
+    texts = [c['text'] for c in chunks]
+    with metrics.timer('embed'):
+        vectors = EmbeddingPipeline(client, cache=embedding_cache).embed(texts, progress=progress)
+
+    # Publish the binary vector store and, if FAISS is available, an index over it
+    # (exact for small stores, HNSW/IVF for large ones; see ann_index)
+    if len(vectors) > 0:
+        with metrics.timer('index_build'):
+            arr = normalize_rows(vectors)
+            manager = pdf_registry.manager(pdf_id)
+            # a store already built from this document is grown, not rebuilt
+            kept = manager.indexed_prefix(texts, EMBEDDING_MODEL, source_hash=source_hash, dtype=VECTOR_STORE_DTYPE,
+                                          chunker=text_chunker.describe())
+            if kept == len(texts):
+                logger.info(f"Vector store for {pdf_id} is up to date ({kept} chunks)")
+            elif kept:
+                manager.add(arr[kept:], texts[kept:], EMBEDDING_MODEL, chunks=chunks[kept:])
+                logger.info(f"Added {len(texts) - kept} chunks to the vector store for {pdf_id}")
+            else:
+                index, index_spec = None, None
+                if faiss_available():
+                    try:
+                        index, index_spec = build_index(arr)
+                    except Exception as e:
+                        index, index_spec = None, None
+                        logger.warning(f"Failed to build FAISS index: {e}")
+                manager.publish(index, arr, texts, EMBEDDING_MODEL, source_hash=source_hash, dtype=VECTOR_STORE_DTYPE,
+                                chunks=chunks, chunker=text_chunker.describe(), index_spec=index_spec)
+
+    # If Pinecone is configured, bring pdf_id's vectors there up to date
+    if pinecone_configured():
         try:
-            arr = np.array(vectors).astype('float32')
-            dim = arr.shape[1]
-            index = faiss.IndexFlatIP(dim)
-            # normalize vectors for inner-product = cosine similarity if desired
-            faiss.normalize_L2(arr)
-            index.add(arr)
-            faiss.write_index(index, FAISS_INDEX_PATH)
-            # save meta (texts, ids)
-            with open(EMBEDDINGS_META_PATH, 'w', encoding='utf-8') as mf:
-                json.dump({'items': embeddings}, mf, ensure_ascii=False)
+            with metrics.timer('vector_sync'):
+                pinecone_sync.sync(pdf_id, chunks, vectors, EMBEDDING_MODEL)
         except Exception as e:
-            logger.warning(f"Failed to build FAISS index: {e}")
-
-    # If Pinecone is configured, upsert the vectors into a Pinecone index
-    try:
-        if _PINECONE_AVAILABLE and os.getenv('PINECONE_API_KEY') and os.getenv('PINECONE_ENV'):
-            pinecone.init(api_key=os.getenv('PINECONE_API_KEY'), environment=os.getenv('PINECONE_ENV'))
-            index_name = os.getenv('PINECONE_INDEX', 'icai-embeddings')
-            if index_name not in pinecone.list_indexes():
-                # create index with appropriate dimension
-                dim = len(vectors[0]) if len(vectors) > 0 else 1536
-                pinecone.create_index(index_name, dimension=dim)
-            idx = pinecone.Index(index_name)
-            # prepare upsert in batches
-            to_upsert = []
-            for it in embeddings:
-                vec = it['embedding']
-                meta = {'text': it['text'], 'id': it['id']}
-                to_upsert.append((it['id'], vec, meta))
-            # Pinecone expects list of tuples (id, vector, metadata)
-            batch_size = 100
-            for i in range(0, len(to_upsert), batch_size):
-                batch = to_upsert[i:i+batch_size]
-                idx.upsert(vectors=batch)
-            logger.info('Pinecone upsert complete')
-    except Exception as e:
-        logger.warning(f"Pinecone upsert skipped/failed: {e}")
+            logger.warning(f"Pinecone sync skipped/failed: {e}")
 
 
-def cosine_similarity(a, b):
-    # simple cosine for two vectors
-    dot = sum(x * y for x, y in zip(a, b))
-    norm_a = math.sqrt(sum(x * x for x in a))
-    norm_b = math.sqrt(sum(y * y for y in b))
-    if norm_a == 0 or norm_b == 0:
-        return 0
-    return dot / (norm_a * norm_b)
+_legacy_keywords = None  # (mtime_ns, KeywordIndex) for PDF_TEXT_PATH
 
 
-def _faiss_search(query_vec, k=3):
-    """Search using saved FAISS index if available. Returns list of (score, item)"""
-    if not _FAISS_AVAILABLE:
-        return None
-    if not os.path.exists(FAISS_INDEX_PATH) or not os.path.exists(EMBEDDINGS_META_PATH):
-        return None
+def _legacy_keyword_index():
+    """Keyword index over the legacy single-document cache, rebuilt when the file changes."""
+    global _legacy_keywords
     try:
-        index = faiss.read_index(FAISS_INDEX_PATH)
-        q = np.array([query_vec]).astype('float32')
-        faiss.normalize_L2(q)
-        distances, indices = index.search(q, k)
-        # distances are inner product after normalization (cosine)
-        with open(EMBEDDINGS_META_PATH, 'r', encoding='utf-8') as f:
-            meta = json.load(f)
-        items = meta.get('items', [])
-        results = []
-        for score, idx in zip(distances[0], indices[0]):
-            if idx < 0 or idx >= len(items):
-                continue
-            results.append((float(score), items[idx]))
-        return results
-    except Exception as e:
-        logger.warning(f"FAISS search failed: {e}")
+        mtime = os.stat(PDF_TEXT_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _legacy_keywords is None or _legacy_keywords[0] != mtime:
+        with open(PDF_TEXT_PATH, "r", encoding="utf-8") as f:
+            _legacy_keywords = (mtime, KeywordIndex.build(list(text_chunker.chunks([f.read()]))))
+    return _legacy_keywords[1]
+
+
+def _keyword_hits(q, k, targets):
+    """BM25 top-k (score, item, pdf_id) over the targets' keyword indexes, or None without any text."""
+    if targets:
+        if not any(pdf_registry.has_text(t) for t in targets):
+            return None
+        return pdf_registry.keyword_search(q, k, pdf_ids=targets, chunker=text_chunker)
+    index = _legacy_keyword_index()
+    if index is None or not len(index):
         return None
+    return [(score, item, None) for score, item in index.search(q, k)]
+
+
+def _fallback_text_search(q, k, targets):
+    """Keyword search when no embeddings exist"""
+    hits = _keyword_hits(q, k, targets)
+    if hits is None:
+        return {'results': [], 'error': 'No PDF content available'}
+    return {'results': [{'score': s, 'text': it['text'], 'pdf_id': pid, **_chunk_pages(it)} for s, it, pid in hits],
+            'source': 'bm25'}
+
+
+def _chunk_pages(item):
+    """Page range of a search hit, for stores built with chunk positions."""
+    if 'page_start' not in item:
+        return {}
+    return {'page_start': item['page_start'], 'page_end': item['page_end']}
 
 
 @app.get('/search-pdf')
-def search_pdf(q: str = '', k: int = 3):
-    """Return top-k chunks matching query using embeddings.json"""
+async def search_pdf(q: str = '', k: int = 3, pdf_id: str = None, all_pdfs: bool = False, mode: str = None):
+    """Return top-k chunks matching query from the selected PDF's indexes.
+
+    ``pdf_id`` searches one specific document; ``all_pdfs`` merges the top-k
+    across every indexed document. ``mode`` overrides SEARCH_MODE.
+    """
     if not q:
         return {'results': [], 'error': 'Query parameter q is required'}
+    mode = mode or SEARCH_MODE
+    if mode not in SEARCH_MODES:
+        return {'results': [], 'error': f'Unknown search mode {mode!r}; expected one of {", ".join(SEARCH_MODES)}'}
+
+    try:
+        if all_pdfs:
+            targets = pdf_registry.pdf_ids()
+        else:
+            target = pdf_id or selected_pdf_id()
+            targets = [target] if target else []
+        indexed = [t for t in targets if pdf_registry.is_indexed(t)]
+    except ValueError as e:
+        return {'results': [], 'error': str(e)}
         
-    # If no embeddings exist, do simple text search
-    if not os.path.exists(EMBEDDINGS_PATH):
-        # Fallback to simple text search in PDF content
-        if os.path.exists(PDF_TEXT_PATH):
-            with open(PDF_TEXT_PATH, 'r', encoding='utf-8') as f:
-                text = f.read()
-            
-            # Simple keyword matching
-            chunks = chunk_text(text)
-            matches = []
-            q_lower = q.lower()
-            
-            for chunk in chunks:
-                if q_lower in chunk.lower():
-                    # Simple relevance score based on keyword frequency
-                    score = chunk.lower().count(q_lower) / len(chunk.split())
-                    matches.append({'score': score, 'text': chunk})
-            
-            matches.sort(key=lambda x: x['score'], reverse=True)
-            return {'results': matches[:k], 'source': 'text_search'}
-        
-        return {'results': [], 'error': 'No PDF content available'}
+    # If no embeddings exist, search the keyword index (file reads, so off the event loop)
+    if not indexed or mode == 'keyword':
+        with metrics.timer('search'):
+            return await run_in_threadpool(_fallback_text_search, q, k, targets)
 
-    global client
-    if not client:
+    # Keyed by the version of every index searched, so a re-index never serves stale hits
+    # (the keyword index is rebuilt by the same ingestion that publishes a version)
+    snapshots = [(pid, pdf_registry.manager(pid).current()) for pid in indexed]
+    result_key = search_cache.result_key(q, k, [(pid, snap.version if snap else None) for pid, snap in snapshots],
+                                         mode=mode)
+    cached = search_cache.results.get(result_key)
+    if cached is not None:
+        return cached
+    started = time.perf_counter()
+
+    if not openai_upstream:
         return {'results': [], 'error': 'OpenAI client not initialized - check OPENAI_API_KEY'}
     
     try:
-        resp = client.embeddings.create(model='text-embedding-3-small', input=q)
-        qvec = resp.data[0].embedding
+        with metrics.timer('query_embed'):
+            qvec = await search_cache.query_embedding_async(
+                q, EMBEDDING_MODEL, lambda text: openai_upstream.embed(text, EMBEDDING_MODEL))
     except Exception as e:
-        return {'results': [], 'error': f'Embedding creation failed: {str(e)}'}
+        return {'results': [], 'error': f'Embedding creation failed: {str(e) or type(e).__name__}'}
     
-    # Try FAISS first if available
-    faiss_results = _faiss_search(qvec, k=k)
-    if faiss_results is not None:
-        top = [{'score': s, 'text': it['text']} for s, it in faiss_results[:k]]
-        return {'results': top, 'source': 'faiss'}
-
-    # Fallback to JSON cosine scan
+    # Resident indexes: FAISS if available, otherwise the memory-mapped NumPy matrix;
+    # in hybrid mode both rankings contribute and the score is the fused one
     try:
-        with open(EMBEDDINGS_PATH, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-
-        items = data.get('items', [])
-        scored = []
-        for it in items:
-            sim = cosine_similarity(qvec, it['embedding'])
-            scored.append((sim, it))
-
-        scored.sort(key=lambda x: x[0], reverse=True)
-        top = [{'score': s, 'text': it['text']} for s, it in scored[:k]]
-        return {'results': top, 'source': 'json'}
+        with metrics.timer('search'):
+            if mode == 'hybrid':
+                depth = max(k, HYBRID_CANDIDATES)
+                hits, sources = await run_in_threadpool(pdf_registry.search, qvec, k=depth, pdf_ids=indexed)
+                keyword_hits = await run_in_threadpool(_keyword_hits, q, depth, indexed)
+                if keyword_hits:
+                    sources.append('bm25')
+                    hits = fuse([hits, keyword_hits], k=k)
+                else:
+                    hits = hits[:k]
+            else:
+                hits, sources = await run_in_threadpool(pdf_registry.search, qvec, k=k, pdf_ids=indexed)
+        top = [{'score': s, 'text': it['text'], 'pdf_id': pid, **_chunk_pages(it)} for s, it, pid in hits]
+        response = {'results': top, 'source': '+'.join(sources)}
     except Exception as e:
         return {'results': [], 'error': f'Search failed: {str(e)}'}
+    search_cache.results.put(result_key, response, time.perf_counter() - started)
+    return response
+
+
+@app.get('/search-cache-stats')
+def get_search_cache_stats():
+    """Hit rates and estimated time saved by the query-embedding and search-result caches"""
+    return search_cache.stats()
+
+
+@app.get('/openai-stats')
+def get_openai_stats():
+    """In-flight calls, limits, timeouts and refusals for the shared OpenAI client"""
+    if not openai_upstream:
+        return {'error': 'OpenAI client not initialized - check OPENAI_API_KEY'}
+    return openai_upstream.stats()
+
+
+@app.get('/embedding-cache-stats')
+def get_embedding_cache_stats():
+    """Hit/miss counters and size of the chunk embedding cache"""
+    return embedding_cache.stats()
 
 
 @app.post('/analyze-emotion')
-def analyze_emotion(payload: dict):
-    """Return a simple mapping of pitch and rate for a given text using OpenAI.
-    Also produce a simple SSML snippet using prosody attributes.
+async def analyze_emotion(payload: dict):
+    """Return a simple mapping of pitch and rate for a given text, plus a simple
+    SSML snippet using prosody attributes. The keyword lexicon answers most texts;
+    OpenAI is only asked (and its verdict cached) when the lexicon is unsure.
     """
     text = payload.get('text', '')
     if not text:
         return {'pitch': 1.0, 'rate': 1.0, 'emotion': 'neutral'}
 
-    global client
-    if not client:
-        # fallback: rule-based
-        low = text.lower()
-        if 'sorry' in low or 'apolog' in low:
-            return {'pitch': 0.9, 'rate': 0.95, 'emotion': 'apologetic'}
-        if 'congrat' in low or 'great' in low or 'thanks' in low:
-            return {'pitch': 1.2, 'rate': 1.05, 'emotion': 'happy'}
-        return {'pitch': 1.0, 'rate': 1.0, 'emotion': 'neutral'}
+    with metrics.timer('analyze'):
+        verdict = await emotion_engine.analyze(text)
+    pitch, rate = verdict['pitch'], verdict['rate']
 
-    try:
-        prompt = (
-            "Analyze the emotion and suggest simple speech parameters. "
-            "Return only a JSON object with keys: emotion (string), pitch (number), rate (number). "
-            "Examples: {\"emotion\": \"neutral\", \"pitch\": 1.0, \"rate\": 1.0}.\n\n"
-            f"Text: {text}\n\nJSON:")
-
-        resp = client.chat.completions.create(
-            model='gpt-3.5-turbo',
-            messages=[
-                {"role": "system", "content": "You are an assistant that maps text to short emotion labels and simple pitch/rate values."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.0,
-            max_tokens=60
-        )
-        reply = resp.choices[0].message.content.strip()
-        # Attempt to parse JSON from reply
-        try:
-            parsed = json.loads(reply)
-            pitch = parsed.get('pitch', 1.0)
-            rate = parsed.get('rate', 1.0)
-            emotion = parsed.get('emotion', 'neutral')
-        except Exception:
-            # Fallback: return defaults
-            pitch = 1.0
-            rate = 1.0
-            emotion = 'neutral'
+    # Generate a simple SSML snippet
+    # Map numeric pitch to percent expression: (pitch - 1.0) * 50 -> +/- percent
+    pitch_pct = int((pitch - 1.0) * 50)
+    # Map rate to percent (100% = normal). Use range ~50..150
+    rate_pct = int(rate * 100)
 
-        # Generate a simple SSML snippet
-        # Map numeric pitch to percent expression: (pitch - 1.0) * 50 -> +/- percent
-        try:
-            pitch_pct = int((float(pitch) - 1.0) * 50)
-        except Exception:
-            pitch_pct = 0
-        # Map rate to percent (100% = normal). Use range ~50..150
-        try:
-            rate_pct = int(float(rate) * 100)
-        except Exception:
-            rate_pct = 100
+    prosody_attrs = []
+    if pitch_pct != 0:
+        prosody_attrs.append(f'pitch="{pitch_pct:+}%'+'"')
+    prosody_attrs.append(f'rate="{rate_pct}%"')
+    prosody = ' '.join(prosody_attrs)
+    ssml = f'<speak><prosody {prosody}>{escape_xml(text)}</prosody></speak>'
 
-        prosody_attrs = []
-        if pitch_pct != 0:
-            prosody_attrs.append(f'pitch="{pitch_pct:+}%'+'"')
-        prosody_attrs.append(f'rate="{rate_pct}%"')
-        prosody = ' '.join(prosody_attrs)
-        ssml = f'<speak><prosody {prosody}>{escape_xml(text)}</prosody></speak>'
+    return {'pitch': pitch, 'rate': rate, 'emotion': verdict['emotion'], 'ssml': ssml, 'tier': verdict['tier']}
 
-        return {'pitch': pitch, 'rate': rate, 'emotion': emotion, 'ssml': ssml}
-    except Exception as e:
-        logger.warning(f"Emotion analysis failed: {e}")
-        return {'pitch': 1.0, 'rate': 1.0, 'emotion': 'neutral', 'ssml': f'<speak><prosody rate="100%">{escape_xml(text)}</prosody></speak>'}
+
+@app.get('/emotion-stats')
+def get_emotion_stats():
+    """Requests answered by each emotion tier (lexicon, cached LLM verdict, LLM, fallback) and their latency"""
+    return emotion_engine.stats()
 
 
 def escape_xml(s: str) -> str:
     return (s.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;').replace("'","&apos;"))
 
 
+def tts_settings(payload: dict) -> dict:
+    """Voice settings a request may override: pyttsx3 voice id, rate (words per minute), volume (0..1)."""
+    settings = {}
+    if payload.get('voice'):
+        settings['voice'] = str(payload['voice'])
+    try:
+        if payload.get('rate') is not None:
+            settings['rate'] = int(payload['rate'])
+        if payload.get('volume') is not None:
+            settings['volume'] = float(payload['volume'])
+    except (TypeError, ValueError):
+        pass
+    return settings
+
+
+def _iter_audio(f, chunk_size=64 * 1024):
+    try:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        f.close()
+
+
 @app.post('/synthesize-ssml')
-def synthesize_ssml(payload: dict):
-    """Synthesize SSML to audio. If pyttsx3 is available, synthesize to wav and return bytes.
+async def synthesize_ssml(payload: dict):
+    """Synthesize SSML to audio. If pyttsx3 is available, stream it back as audio/wav,
+    from the audio cache when the same SSML and voice settings were synthesized before.
+    With 'stream': true, long SSML is synthesized sentence by sentence and audio
+    starts as soon as the first sentence is ready.
     Otherwise return the SSML string so client can handle TTS.
     """
     text = payload.get('text', '')
@@ -509,45 +703,65 @@ def synthesize_ssml(payload: dict):
         # fallback: create SSML from text using neutral prosody
         ssml = f'<speak><prosody rate="100%">{escape_xml(text)}</prosody></speak>'
 
-    if _PYTTSX3_AVAILABLE:
+    # the first check imports pyttsx3; keep that off the event loop
+    if not await run_in_threadpool(capabilities.available, 'pyttsx3'):
+        # No TTS provider, return SSML for client-side consumption
+        return {'ssml': ssml}
+
+    settings = tts_settings(payload)
+    if payload.get('stream'):
+        segments = split_ssml(ssml)
+        if not segments:
+            return {'ssml': ssml}
+        stream = SsmlAudioStream(tts_pool, audio_cache, segments, settings, TTS_TIMEOUT)
         try:
-            engine = pyttsx3.init()
-            # Save to a temporary wav file
-            tmpf = os.path.join(tempfile.gettempdir(), f'ssml_{int(time.time()*1000)}.wav')
-            # pyttsx3 may not support SSML directly; strip tags for basic synthesis
-            import re
-            plain = re.sub(r'<[^>]+>', '', ssml)
-            engine.save_to_file(plain, tmpf)
-            engine.runAndWait()
-            with open(tmpf, 'rb') as f:
-                data = f.read()
-            try:
-                os.remove(tmpf)
-            except Exception:
-                pass
-            return JSONResponse(content=data, media_type='audio/wav')
+            # time to the first segment; the rest is synthesized while it plays
+            with metrics.timer('synthesize'):
+                await stream.start()
         except Exception as e:
-            logger.warning(f"pyttsx3 synthesis failed: {e}")
+            logger.warning(f"pyttsx3 synthesis failed: {e or type(e).__name__}")
             return {'ssml': ssml}
+        return StreamingResponse(stream.frames(), media_type='audio/wav',
+                                 headers={'X-Audio-Segments': str(len(segments))})
+
+    key = audio_key(ssml, settings)
+    cached = audio_cache.open(key)
+    source = 'cache'
+    if cached is None:
+        try:
+            # shield: a timed-out request must not cancel a synthesis other requests share
+            with metrics.timer('synthesize'):
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(tts_pool.submit(key, ssml, settings))),
+                                       TTS_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"pyttsx3 synthesis failed: {e or type(e).__name__}")
+            return {'ssml': ssml}
+        cached = audio_cache.open(key, record=False)
+        if cached is None:
+            return {'ssml': ssml}
+        source = 'engine'
+    f, size = cached
+    return StreamingResponse(_iter_audio(f), media_type='audio/wav',
+                             headers={'Content-Length': str(size), 'X-Audio-Source': source})
+
 
-    # No TTS provider, return SSML for client-side consumption
-    return {'ssml': ssml}
+@app.get('/tts-stats')
+def get_tts_stats():
+    """TTS engine pool activity and audio cache hit rate"""
+    return {'engines': tts_pool.stats(), 'audio_cache': audio_cache.stats()}
 
 
 @app.post('/save-user-prefs')
 def save_user_prefs(payload: dict):
-    """Save user preferences to a simple JSON file. Payload must contain 'user_id' and 'prefs' dict."""
+    """Save user preferences. Payload must contain 'user_id' and 'prefs' dict."""
     user_id = payload.get('user_id', 'default')
     prefs = payload.get('prefs', {})
+    if not isinstance(user_id, str):
+        return JSONResponse(status_code=400, content={'error': 'user_id harus berupa string'})
+    if not isinstance(prefs, dict):
+        return JSONResponse(status_code=400, content={'error': 'prefs harus berupa object'})
     try:
-        if os.path.exists(USER_PREFS_PATH):
-            with open(USER_PREFS_PATH, 'r', encoding='utf-8') as f:
-                allp = json.load(f)
-        else:
-            allp = {}
-        allp[user_id] = prefs
-        with open(USER_PREFS_PATH, 'w', encoding='utf-8') as f:
-            json.dump(allp, f, ensure_ascii=False, indent=2)
+        user_prefs.set(user_id, prefs)
         return {'success': True}
     except Exception as e:
         logger.error(f"Failed to save prefs: {e}")
@@ -557,93 +771,84 @@ def save_user_prefs(payload: dict):
 @app.get('/user-prefs')
 def get_user_prefs(user_id: str = 'default'):
     try:
-        if os.path.exists(USER_PREFS_PATH):
-            with open(USER_PREFS_PATH, 'r', encoding='utf-8') as f:
-                allp = json.load(f)
-            return allp.get(user_id, {})
-        return {}
+        return user_prefs.get(user_id)
     except Exception as e:
         logger.error(f"Failed to load prefs: {e}")
         return {}
 
+
+@app.post('/user-prefs/bulk')
+def get_user_prefs_bulk(payload: dict):
+    """Preferences of many users at once. Payload: {'user_ids': [...]}; users without prefs get {}."""
+    user_ids = payload.get('user_ids') or []
+    if not isinstance(user_ids, list) or not all(isinstance(u, str) for u in user_ids):
+        return JSONResponse(status_code=400, content={'error': 'user_ids harus berupa list string'})
+    try:
+        return {'prefs': user_prefs.get_many(user_ids)}
+    except Exception as e:
+        logger.error(f"Failed to load prefs: {e}")
+        return JSONResponse(status_code=500, content={'error': str(e)})
+
 @app.get('/current-pdf')
 def get_current_pdf():
     """Get currently selected PDF info for all users"""
-    global SELECTED_PDF_ID
-    if SELECTED_PDF_ID and os.path.exists(os.path.join(PDF_STORAGE_DIR, SELECTED_PDF_ID)):
-        original_name = SELECTED_PDF_ID.split('_', 1)[1] if '_' in SELECTED_PDF_ID else SELECTED_PDF_ID
+    selected = shared_state.get('selected_pdf')
+    pdf_id = selected['pdf_id'] if selected else None
+    if pdf_id and os.path.exists(os.path.join(PDF_STORAGE_DIR, pdf_id)):
+        original_name = pdf_id.split('_', 1)[1] if '_' in pdf_id else pdf_id
         return {
             "selected": True,
-            "id": SELECTED_PDF_ID,
-            "filename": original_name
+            "id": pdf_id,
+            "filename": original_name,
+            "index_version": selected.get('index_version'),
+            "selected_at": selected.get('selected_at')
         }
     return {"selected": False}
 
 @app.get("/call-logs")
-def get_call_logs():
-    if not os.path.exists(CALL_LOGS_DIR):
-        return {"logs": []}
-    
-    logs = []
-    for filename in os.listdir(CALL_LOGS_DIR):
-        if filename.endswith('.json'):
-            file_path = os.path.join(CALL_LOGS_DIR, filename)
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    log_data = json.load(f)
-                    logs.append({
-                        "session_id": log_data["session_id"],
-                        "start_time": log_data["start_time"],
-                        "message_count": len(log_data["messages"]),
-                        "last_message": log_data["messages"][-1]["timestamp"] if log_data["messages"] else log_data["start_time"],
-                        "status": log_data.get("status", "active"),
-                        "order_status": log_data.get("order_status", "none")
-                    })
-            except Exception as e:
-                logger.error(f"Error reading log file {filename}: {e}")
-    
-    logs.sort(key=lambda x: x["start_time"], reverse=True)
-    return {"logs": logs}
+def get_call_logs(status: str = None, order_status: str = None, start_from: str = None, start_to: str = None,
+                  limit: int = DEFAULT_PAGE_SIZE, page_token: str = None, since: int = None):
+    """List sessions, newest first, from the summary index.
+
+    Filters: ``status``, ``order_status`` and a ``start_from``/``start_to``
+    range on the session start (ISO date or timestamp). Pages are chained
+    with ``page_token``; pass the returned ``cursor`` as ``since`` to get only
+    the sessions that changed after that response.
+    """
+    try:
+        return call_log_store.index.query(status=status, order_status=order_status, start_from=start_from,
+                                          start_to=start_to, limit=limit, page_token=page_token, since=since)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
 
 @app.get("/call-logs/{session_id}")
 def get_call_log_detail(session_id: str):
-    log_file = os.path.join(CALL_LOGS_DIR, f"{session_id}.json")
-    
-    if not os.path.exists(log_file):
-        return JSONResponse(status_code=404, content={"error": "Log tidak ditemukan"})
-    
     try:
-        with open(log_file, "r", encoding="utf-8") as f:
-            log_data = json.load(f)
-        return log_data
+        log_data = call_log_store.get(session_id)
+    except ValueError:
+        log_data = None
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
+    
+    if log_data is None:
+        return JSONResponse(status_code=404, content={"error": "Log tidak ditemukan"})
+    return log_data
 
 @app.post("/request-staff-takeover")
 async def request_staff_takeover(request: StaffTakeoverRequest):
     try:
-        log_file = os.path.join(CALL_LOGS_DIR, f"{request.session_id}.json")
-        
-        if os.path.exists(log_file):
-            with open(log_file, "r", encoding="utf-8") as f:
-                log_data = json.load(f)
-        else:
-            log_data = {
-                "session_id": request.session_id,
-                "start_time": datetime.now().isoformat(),
-                "messages": []
-            }
-        
-        log_data["messages"].append({
-            "type": "system",
-            "message": f"Staff takeover requested: {request.message}",
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        log_data["status"] = "staff_requested"
-        
-        with open(log_file, "w", encoding="utf-8") as f:
-            json.dump(log_data, f, ensure_ascii=False, indent=2)
+        summary = await run_in_threadpool(
+            append_call_log,
+            request.session_id,
+            message={
+                "type": "system",
+                "message": f"Staff takeover requested: {request.message}",
+                "timestamp": datetime.now().isoformat()
+            },
+            set_fields={"status": "staff_requested"}
+        )
+        await run_in_threadpool(call_events.publish, "takeover", request.session_id, {"message": request.message},
+                                listing_fields(summary))
         
         logger.info(f"Staff takeover requested for session {request.session_id}")
         return {"success": True, "message": "Staff takeover requested"}
@@ -655,25 +860,25 @@ async def request_staff_takeover(request: StaffTakeoverRequest):
 @app.post("/close-call")
 async def close_call(request: CallLogRequest):
     try:
-        log_file = os.path.join(CALL_LOGS_DIR, f"{request.session_id}.json")
-        
-        if os.path.exists(log_file):
-            with open(log_file, "r", encoding="utf-8") as f:
-                log_data = json.load(f)
-        else:
+        if not call_log_store.exists(request.session_id):
             return JSONResponse(status_code=404, content={"error": "Session not found"})
         
-        log_data["messages"].append({
-            "type": "system",
-            "message": "Call closed",
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        log_data["status"] = "completed"
-        log_data["end_time"] = datetime.now().isoformat()
-        
-        with open(log_file, "w", encoding="utf-8") as f:
-            json.dump(log_data, f, ensure_ascii=False, indent=2)
+        end_time = datetime.now().isoformat()
+        summary = await run_in_threadpool(
+            append_call_log,
+            request.session_id,
+            message={
+                "type": "system",
+                "message": "Call closed",
+                "timestamp": end_time
+            },
+            set_fields={
+                "status": "completed",
+                "end_time": end_time
+            }
+        )
+        await run_in_threadpool(call_events.publish, "close", request.session_id, {"end_time": end_time},
+                                listing_fields(summary))
         
         logger.info(f"Call closed for session {request.session_id}")
         return {"success": True, "message": "Call closed"}
@@ -686,11 +891,8 @@ async def close_call(request: CallLogRequest):
 async def clear_logs():
     try:
         # Clear all log files
-        if os.path.exists(CALL_LOGS_DIR):
-            for filename in os.listdir(CALL_LOGS_DIR):
-                if filename.endswith('.json'):
-                    file_path = os.path.join(CALL_LOGS_DIR, filename)
-                    os.remove(file_path)
+        call_log_store.clear()
+        await run_in_threadpool(call_events.publish, "cleared", None)
         
         logger.info("All session logs cleared")
         return {"success": True, "message": "All logs cleared successfully"}
@@ -702,19 +904,19 @@ async def clear_logs():
 @app.post("/confirm-order")
 async def confirm_order(request: OrderConfirmationRequest):
     try:
-        log_file = os.path.join(CALL_LOGS_DIR, f"{request.session_id}.json")
-        
-        if os.path.exists(log_file):
-            with open(log_file, "r", encoding="utf-8") as f:
-                log_data = json.load(f)
-        else:
-            log_data = {
+        with metrics.timer('order_write'):
+            order = await run_in_threadpool(order_ledger.append, {
                 "session_id": request.session_id,
-                "start_time": datetime.now().isoformat(),
-                "messages": []
-            }
-        
+                "customer_name": request.customer_name,
+                "customer_phone": request.customer_phone,
+                "customer_email": request.customer_email,
+                "delivery_address": request.delivery_address,
+                "items": request.order_items,
+                "total_amount": request.total_amount,
+                "notes": request.notes,
+            })
         order_details = {
+            "order_id": order["order_id"],
             "session_id": request.session_id,
             "customer_name": request.customer_name,
             "customer_phone": request.customer_phone,
@@ -723,45 +925,143 @@ async def confirm_order(request: OrderConfirmationRequest):
             "order_items": request.order_items,
             "total_amount": request.total_amount,
             "notes": request.notes,
-            "order_time": datetime.now().isoformat()
+            "order_time": order["created_at"]
         }
         
-        log_data["order_details"] = order_details
-        log_data["order_status"] = "confirmed"
-        
-        log_data["messages"].append({
-            "type": "system",
-            "message": f"Pesanan dikonfirmasi untuk {request.customer_name}",
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        with open(log_file, "w", encoding="utf-8") as f:
-            json.dump(log_data, f, ensure_ascii=False, indent=2)
-        
-        # Log order for manual processing
-        with open("confirmed_orders.txt", "a", encoding="utf-8") as f:
-            f.write(f"\n{datetime.now().isoformat()}\n")
-            f.write(f"Order ID: {request.session_id[:8]}\n")
-            f.write(f"Customer: {request.customer_name}\n")
-            f.write(f"Phone: {request.customer_phone}\n")
-            f.write(f"Email: {request.customer_email}\n")
-            f.write(f"Address: {request.delivery_address}\n")
-            f.write(f"Items: {', '.join(request.order_items)}\n")
-            f.write(f"Total: Rp {request.total_amount:,.0f}\n")
-            f.write(f"Notes: {request.notes}\n")
-            f.write("="*50 + "\n")
+        summary = await run_in_threadpool(
+            append_call_log,
+            request.session_id,
+            message={
+                "type": "system",
+                "message": f"Pesanan dikonfirmasi untuk {request.customer_name}",
+                "timestamp": datetime.now().isoformat()
+            },
+            set_fields={
+                "order_details": order_details,
+                "order_status": "confirmed"
+            }
+        )
+        await run_in_threadpool(call_events.publish, "order", request.session_id, order_details, listing_fields(summary))
         
-        logger.info(f"Order confirmed for session {request.session_id}")
+        logger.info(f"Order {order['order_id']} confirmed for session {request.session_id}")
         return {
             "success": True, 
             "message": "Pesanan berhasil dikonfirmasi",
-            "order_id": request.session_id[:8]
+            "order_id": order["order_id"]
         }
         
     except Exception as e:
         logger.error(f"Error confirming order: {e}")
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+@app.get("/orders")
+def get_orders(phone: str = None, session_id: str = None, date_from: str = None, date_to: str = None,
+               limit: int = DEFAULT_PAGE_SIZE, page_token: str = None):
+    """List confirmed orders, newest first, from the order ledger.
+
+    Filters: ``phone`` (any formatting of the number), ``session_id`` and an
+    inclusive ``date_from``/``date_to`` range of ISO dates. Pages are chained
+    with ``page_token``.
+    """
+    try:
+        return order_ledger.query(phone=phone, session_id=session_id, date_from=date_from, date_to=date_to,
+                                  limit=limit, page_token=page_token)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+@app.get("/orders/daily-totals")
+def get_order_daily_totals(date_from: str = None, date_to: str = None):
+    """Orders and amount per day; the last 30 days with orders when no range is given."""
+    try:
+        return order_ledger.daily_totals(date_from=date_from, date_to=date_to)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+@app.get("/orders/{order_id}")
+def get_order(order_id: str):
+    order = order_ledger.get(order_id)
+    if order is None:
+        return JSONResponse(status_code=404, content={"error": "Pesanan tidak ditemukan"})
+    return order
+
+def _sse(event_id, event):
+    return f"id: {event_id}\nevent: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+async def _event_stream(request: Request, session_id=None, types=None):
+    wanted = [t.strip() for t in types.split(',') if t.strip()] if types else None
+    sub, backlog = call_events.subscribe(session_id, wanted, request.headers.get("last-event-id"))
+    try:
+        yield "retry: 2000\n\n"
+        for event_id, event in backlog:
+            yield _sse(event_id, event)
+        while True:
+            try:
+                item = await asyncio.wait_for(sub.queue.get(), EVENTS_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keepalive\n\n"
+                continue
+            if item is None:
+                # fell too far behind; the client reconnects with Last-Event-ID
+                break
+            yield _sse(*item)
+    finally:
+        call_events.unsubscribe(sub)
+
+
+@app.get("/events")
+async def stream_events(request: Request, types: str = None):
+    """Server-sent events for every session: message, takeover, order, close, cleared.
+
+    ``types`` is an optional comma-separated filter, e.g. ``takeover,order``.
+    """
+    return StreamingResponse(_event_stream(request, types=types), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/events/{session_id}")
+async def stream_session_events(request: Request, session_id: str, types: str = None):
+    """Server-sent events for one session."""
+    return StreamingResponse(_event_stream(request, session_id=session_id, types=types),
+                             media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text exposition: request and stage latency histograms, counters and
+    cache hit ratios, summed over all workers"""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get('/capabilities')
+def get_capabilities():
+    """Optional integrations: whether each is imported yet, available, and how long its import took"""
+    return capabilities.stats()
+
+
+@app.on_event("startup")
+async def start_metrics():
+    metrics.start()
+
+
+@app.on_event("startup")
+async def warm_up_capabilities():
+    capabilities.warm_up(warmup_names(openai_configured=bool(api_key), pinecone_configured=bool(
+        os.getenv('PINECONE_API_KEY') and os.getenv('PINECONE_ENV'))), delay=CAPABILITY_WARMUP_DELAY)
+
+
+@app.on_event("shutdown")
+async def shutdown_workers():
+    metrics.stop()
+    ingest_jobs.shutdown()
+    call_events.close()
+    tts_pool.shutdown()
+    if openai_upstream:
+        await openai_upstream.close()
+
 if __name__ == "__main__":
     import uvicorn
     import sys
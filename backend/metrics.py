@@ -0,0 +1,342 @@
+"""Request and stage timings, exported in Prometheus text format.
+
+Counters and histograms live in process memory; recording one is a dict
+lookup, a bisect and a few adds under a lock, cheap enough to leave on.
+Gauges and counters kept elsewhere (cache hit counts, in-flight calls) are
+read by collectors when a snapshot is taken.
+
+Every gunicorn worker writes its snapshot to ``<directory>/<pid>.json``
+every ``flush_seconds``; ``render()`` (the /metrics handler) sums its own
+live snapshot with those of the other live workers, so a scrape reports the
+whole server whichever worker answers it.
+"""
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+
+logger = logging.getLogger("call-agent-api")
+
+METRICS_PREFIX = 'call_agent'
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', '5'))
+# seconds; from sub-millisecond cache hits to a long PDF ingestion
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 120.0)
+
+HELP = {
+    'http_requests_total': 'HTTP requests by route, method and status',
+    'http_request_duration_seconds': 'HTTP request latency by route and method, to the end of the response body',
+    'http_requests_in_flight': 'HTTP requests being handled',
+    'stage_duration_seconds': 'Time spent in each processing stage',
+    'stage_errors_total': 'Processing stages that raised',
+    'cache_hits_total': 'Cache hits by cache',
+    'cache_misses_total': 'Cache misses by cache',
+    'cache_hit_ratio': 'Cache hits over lookups since start, by cache',
+    'workers': 'Worker processes whose metrics are included',
+    'openai_in_flight': 'OpenAI calls in progress by kind',
+    'openai_calls_total': 'Finished OpenAI calls by kind',
+    'openai_errors_total': 'Failed OpenAI calls by kind',
+    'openai_rejected_total': 'OpenAI calls refused because the concurrency limit stayed full',
+    'tts_queued': 'Syntheses waiting for a TTS engine',
+    'tts_in_flight': 'Distinct syntheses queued or running',
+    'tts_rejected_total': 'Syntheses refused because the TTS queue was full',
+    'emotion_requests_total': 'Emotion analyses by the tier that answered',
+}
+
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+class _Timer:
+    __slots__ = ('metrics', 'stage', 'started')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe('stage_duration_seconds', time.perf_counter() - self.started, stage=self.stage)
+        if exc_type is not None:
+            self.metrics.inc('stage_errors_total', stage=self.stage)
+        return False
+
+
+class TimedIter:
+    """Wraps an iterator, adding up the time spent producing its items.
+
+    The total is observed as ``stage`` once the iterator is exhausted and
+    stays available as ``seconds``.
+    """
+
+    def __init__(self, metrics, stage, iterable):
+        self.metrics = metrics
+        self.stage = stage
+        self.seconds = 0.0
+        self._it = iter(iterable)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            return next(self._it)
+        except StopIteration:
+            self.seconds += time.perf_counter() - started
+            self.metrics.observe('stage_duration_seconds', self.seconds, stage=self.stage)
+            raise
+        except BaseException:
+            self.seconds += time.perf_counter() - started
+            raise
+        else:
+            self.seconds += time.perf_counter() - started
+
+
+class Metrics:
+    """Process-local counters, gauges and histograms, shared through ``directory``."""
+
+    def __init__(self, directory=None, flush_seconds=METRICS_FLUSH_SECONDS, buckets=DEFAULT_BUCKETS, prefix=METRICS_PREFIX):
+        self.directory = directory
+        self.flush_seconds = flush_seconds
+        self.buckets = tuple(buckets)
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters = {}       # (name, labels) -> value
+        self._gauges = {}         # (name, labels) -> value
+        self._histograms = {}     # (name, labels) -> [per-bucket counts..., +Inf count, sum]
+        self._collectors = []
+        self._flusher = None
+        self._stop = threading.Event()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    # series are keyed by the labels as passed; they are sorted and stringified
+    # only when a snapshot is taken, off the recording path
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(labels.items()))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, tuple(labels.items()))] = value
+
+    def add_gauge(self, name, amount, **labels):
+        key = (name, tuple(labels.items()))
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(labels.items()))
+        slot = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            hist[slot] += 1
+            hist[-1] += seconds
+
+    def timer(self, stage):
+        """Context manager observing ``stage_duration_seconds{stage=...}``."""
+        return _Timer(self, stage)
+
+    def timed_iter(self, stage, iterable):
+        return TimedIter(self, stage, iterable)
+
+    def collector(self, callback):
+        """Register ``callback()`` -> iterable of ``(kind, name, labels, value)``, kind
+        'counter' or 'gauge', run whenever a snapshot is taken."""
+        self._collectors.append(callback)
+        return callback
+
+    def snapshot(self):
+        collected = []
+        for callback in self._collectors:
+            try:
+                collected.extend(callback())
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+        with self._lock:
+            counters = [[n, dict(_labels(dict(l))), v] for (n, l), v in self._counters.items()]
+            gauges = [[n, dict(_labels(dict(l))), v] for (n, l), v in self._gauges.items()]
+            histograms = [[n, dict(_labels(dict(l))), list(h)] for (n, l), h in self._histograms.items()]
+        for kind, name, labels, value in collected:
+            (counters if kind == 'counter' else gauges).append([name, labels, value])
+        return {'buckets': list(self.buckets), 'counters': counters, 'gauges': gauges, 'histograms': histograms}
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f'{pid}.json')
+
+    def flush(self):
+        """Write this worker's snapshot for the others to read."""
+        if not self.directory:
+            return
+        path = self._path(os.getpid())
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+    def start(self):
+        """Flush in the background every ``flush_seconds`` (idempotent per process)."""
+        if not self.directory or (self._flusher is not None and self._flusher.is_alive()):
+            return
+
+        def run():
+            while not self._stop.wait(self.flush_seconds):
+                try:
+                    self.flush()
+                except Exception as e:
+                    logger.warning(f"Metrics flush failed: {e}")
+        self._stop.clear()
+        self._flusher = threading.Thread(target=run, name='metrics-flush', daemon=True)
+        self._flusher.start()
+
+    def stop(self):
+        """Stop flushing and drop this worker's file, so its totals leave the sums with it."""
+        self._stop.set()
+        if self.directory:
+            try:
+                os.remove(self._path(os.getpid()))
+            except FileNotFoundError:
+                pass
+
+    def _worker_snapshots(self):
+        """This worker's live snapshot plus the last ones written by other live workers."""
+        snapshots = [self.snapshot()]
+        if not self.directory:
+            return snapshots
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                pid = int(name[:-len('.json')])
+            except ValueError:
+                continue
+            if pid == os.getpid():
+                continue
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                # a worker that died without cleaning up
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+                continue
+            except PermissionError:
+                pass
+            try:
+                with open(os.path.join(self.directory, name), 'r', encoding='utf-8') as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if snapshot.get('buckets') == list(self.buckets):
+                snapshots.append(snapshot)
+        return snapshots
+
+    def render(self):
+        """Prometheus text exposition of the sums over all workers."""
+        counters, gauges, histograms = {}, {}, {}
+        snapshots = self._worker_snapshots()
+        for snapshot in snapshots:
+            for name, labels, value in snapshot['counters']:
+                key = (name, _labels(labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, value in snapshot['gauges']:
+                key = (name, _labels(labels))
+                gauges[key] = gauges.get(key, 0) + value
+            for name, labels, values in snapshot['histograms']:
+                key = (name, _labels(labels))
+                hist = histograms.get(key)
+                histograms[key] = list(values) if hist is None else [a + b for a, b in zip(hist, values)]
+        # ratios cannot be summed across workers, so they are derived from the summed counts
+        for (name, labels), hits in list(counters.items()):
+            if name == 'cache_hits_total':
+                lookups = hits + counters.get(('cache_misses_total', labels), 0)
+                gauges[('cache_hit_ratio', labels)] = (hits / lookups) if lookups else 0.0
+        gauges[('workers', ())] = len(snapshots)
+
+        lines = []
+
+        def header(name, kind):
+            full = f'{self.prefix}_{name}'
+            if name in HELP:
+                lines.append(f'# HELP {full} {HELP[name]}')
+            lines.append(f'# TYPE {full} {kind}')
+            return full
+
+        for kind, series in (('counter', counters), ('gauge', gauges)):
+            for name in sorted({n for n, _ in series}):
+                full = header(name, kind)
+                for (n, labels), value in sorted(series.items()):
+                    if n == name:
+                        lines.append(f'{full}{_format_labels(labels)} {_format_value(value)}')
+        for name in sorted({n for n, _ in histograms}):
+            full = header(name, 'histogram')
+            for (n, labels), values in sorted(histograms.items()):
+                if n != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), values[:-1]):
+                    cumulative += count
+                    lines.append(f'{full}_bucket{_format_labels(labels, [("le", _format_value(bound))])} {cumulative}')
+                lines.append(f'{full}_sum{_format_labels(labels)} {_format_value(values[-1])}')
+                lines.append(f'{full}_count{_format_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting and timing every HTTP request by its route template."""
+
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        self.metrics.add_gauge('http_requests_in_flight', 1)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.metrics.add_gauge('http_requests_in_flight', -1)
+            # the matched route's path template keeps label values bounded
+            route = getattr(scope.get('route'), 'path', None) or 'unmatched'
+            method = scope['method']
+            self.metrics.observe('http_request_duration_seconds', time.perf_counter() - started,
+                                 route=route, method=method)
+            self.metrics.inc('http_requests_total', route=route, method=method, status=status)
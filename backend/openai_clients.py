@@ -0,0 +1,164 @@
+"""Shared OpenAI clients: pooled HTTP connections, per-call timeouts, bounded concurrency.
+
+Request handlers use one ``AsyncUpstream`` per worker, so waiting on OpenAI
+never holds the event loop or a threadpool slot. Each kind of call has its
+own concurrency limit, so a backlog of slow chat completions cannot take
+the connections that query embeddings need. Background ingestion threads
+keep a synchronous client with the same pool settings.
+
+The openai package (and httpx under it) is imported when the first client
+is created, not when this module is, so workers that have not called
+OpenAI yet do not pay for it.
+"""
+import os
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from capabilities import capabilities
+
+logger = logging.getLogger("call-agent-api")
+
+OPENAI_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', '64'))
+OPENAI_MAX_KEEPALIVE = int(os.getenv('OPENAI_MAX_KEEPALIVE', '16'))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv('OPENAI_CONNECT_TIMEOUT', '5'))
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '60'))
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '2'))
+
+# per-call deadlines and in-flight limits for request-path calls
+EMBEDDING_TIMEOUT = float(os.getenv('OPENAI_EMBEDDING_TIMEOUT', '10'))
+CHAT_TIMEOUT = float(os.getenv('OPENAI_CHAT_TIMEOUT', '15'))
+EMBEDDING_CONCURRENCY_LIMIT = int(os.getenv('OPENAI_EMBEDDING_CONCURRENCY', '32'))
+CHAT_CONCURRENCY_LIMIT = int(os.getenv('OPENAI_CHAT_CONCURRENCY', '16'))
+# how long a call may wait for a free slot before it is refused
+QUEUE_TIMEOUT = float(os.getenv('OPENAI_QUEUE_TIMEOUT', '2'))
+
+
+class UpstreamBusy(Exception):
+    """Every slot for this kind of call stayed busy for ``QUEUE_TIMEOUT`` seconds."""
+
+
+def _http_options():
+    import httpx
+    return {
+        'limits': httpx.Limits(max_connections=OPENAI_MAX_CONNECTIONS,
+                               max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+                               keepalive_expiry=30),
+        'timeout': httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+        'follow_redirects': True,
+    }
+
+
+def create_sync_client(api_key, base_url=None):
+    openai = capabilities.lazy('openai')
+    import httpx
+    return openai.OpenAI(api_key=api_key, base_url=base_url, max_retries=OPENAI_MAX_RETRIES,
+                         http_client=httpx.Client(**_http_options()))
+
+
+def create_async_client(api_key, base_url=None):
+    openai = capabilities.lazy('openai')
+    import httpx
+    return openai.AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=OPENAI_MAX_RETRIES,
+                              http_client=httpx.AsyncClient(**_http_options()))
+
+
+class _CallStats:
+    def __init__(self, limit, timeout):
+        self.limit = limit
+        self.timeout = timeout
+        self.in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.seconds = 0.0
+        self.semaphore = None
+
+    def as_dict(self):
+        return {
+            'limit': self.limit,
+            'timeout_seconds': self.timeout,
+            'in_flight': self.in_flight,
+            'calls': self.calls,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'rejected': self.rejected,
+            'avg_ms': (self.seconds / self.calls * 1000) if self.calls else 0.0,
+        }
+
+
+class AsyncUpstream:
+    """Async OpenAI calls with a concurrency limit and deadline per kind of call.
+
+    Pass ``client``, or ``factory`` (no arguments, returns the client) to
+    create it on the first call.
+    """
+
+    def __init__(self, client=None, embedding_limit=EMBEDDING_CONCURRENCY_LIMIT, chat_limit=CHAT_CONCURRENCY_LIMIT,
+                 embedding_timeout=EMBEDDING_TIMEOUT, chat_timeout=CHAT_TIMEOUT, queue_timeout=QUEUE_TIMEOUT,
+                 factory=None):
+        self._client = client
+        self._factory = factory
+        self.queue_timeout = queue_timeout
+        self._kinds = {
+            'embeddings': _CallStats(embedding_limit, embedding_timeout),
+            'chat': _CallStats(chat_limit, chat_timeout),
+        }
+
+    async def _get_client(self):
+        if self._client is None:
+            # creating the first client imports openai; keep that off the event loop
+            client = await asyncio.to_thread(self._factory)
+            if self._client is None:
+                self._client = client
+            else:
+                await client.close()
+        return self._client
+
+    @asynccontextmanager
+    async def _slot(self, kind):
+        stats = self._kinds[kind]
+        if stats.semaphore is None:
+            # created on first use so it belongs to the serving event loop
+            stats.semaphore = asyncio.Semaphore(stats.limit)
+        try:
+            await asyncio.wait_for(stats.semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            stats.rejected += 1
+            raise UpstreamBusy(f'Too many concurrent {kind} calls')
+        stats.in_flight += 1
+        started = time.perf_counter()
+        try:
+            yield stats
+        except Exception as e:
+            stats.errors += 1
+            if isinstance(e, asyncio.TimeoutError) or type(e).__name__ == 'APITimeoutError':
+                stats.timeouts += 1
+            raise
+        finally:
+            stats.in_flight -= 1
+            stats.calls += 1
+            stats.seconds += time.perf_counter() - started
+            stats.semaphore.release()
+
+    async def embed(self, text, model):
+        """Embedding vector for one text."""
+        async with self._slot('embeddings') as stats:
+            client = await self._get_client()
+            # the deadline covers the client's own retries too
+            resp = await asyncio.wait_for(client.embeddings.create(model=model, input=text), stats.timeout)
+        return resp.data[0].embedding
+
+    async def chat(self, **kwargs):
+        """``chat.completions.create`` under the chat limit and deadline."""
+        async with self._slot('chat') as stats:
+            client = await self._get_client()
+            return await asyncio.wait_for(client.chat.completions.create(**kwargs), stats.timeout)
+
+    def stats(self):
+        return {kind: stats.as_dict() for kind, stats in self._kinds.items()}
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
@@ -0,0 +1,261 @@
+"""SQLite ledger of confirmed orders, indexed by order id, phone and date."""
+import os
+import re
+import json
+import base64
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger("call-agent-api")
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# longest span /orders/daily-totals reports in one response
+MAX_TOTAL_DAYS = 366
+
+_COLUMNS = ('order_id', 'session_id', 'created_at', 'order_date', 'customer_name', 'customer_phone',
+            'customer_email', 'delivery_address', 'items', 'total_amount', 'notes', 'status')
+_LEGACY_FIELDS = {'Order ID': 'legacy_id', 'Customer': 'customer_name', 'Phone': 'customer_phone',
+                  'Email': 'customer_email', 'Address': 'delivery_address', 'Items': 'items',
+                  'Total': 'total_amount', 'Notes': 'notes'}
+
+
+def normalize_phone(phone):
+    """Digits only, with a local leading 0 replaced by the 62 country code: '0812-345' -> '62812345'."""
+    digits = re.sub(r'\D', '', phone or '')
+    if digits.startswith('0'):
+        digits = '62' + digits[1:]
+    return digits
+
+
+def _encode_page_token(row_id):
+    return base64.urlsafe_b64encode(json.dumps([row_id]).encode('ascii')).decode('ascii')
+
+
+def _decode_page_token(token):
+    try:
+        (row_id,) = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        return int(row_id)
+    except Exception:
+        raise ValueError('Invalid page token')
+
+
+def _day(value, name):
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value).date().isoformat()
+    except ValueError:
+        raise ValueError(f'Invalid {name}: expected an ISO date')
+
+
+class OrderLedger:
+    """One row per confirmed order, plus a running total per day.
+
+    An append inserts the order and bumps its day's totals in one
+    transaction, so daily totals are a read of one row per day. Order ids
+    are ``ORD-YYYYMMDD-NNNN``, numbered per day under the write lock, so they
+    are unique across workers. Listings page by row id, newest first, and
+    stay constant-cost at any depth.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS orders ('
+            ' id INTEGER PRIMARY KEY AUTOINCREMENT, order_id TEXT NOT NULL UNIQUE, session_id TEXT,'
+            ' created_at TEXT NOT NULL, order_date TEXT NOT NULL, customer_name TEXT, customer_phone TEXT,'
+            ' phone_key TEXT NOT NULL, customer_email TEXT, delivery_address TEXT, items TEXT NOT NULL,'
+            ' total_amount REAL NOT NULL, notes TEXT, status TEXT NOT NULL)'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS daily_totals ('
+            ' order_date TEXT PRIMARY KEY, orders INTEGER NOT NULL, total_amount REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS orders_phone ON orders(phone_key, id)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS orders_date ON orders(order_date, id)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS orders_session ON orders(session_id, id)')
+        self._conn.commit()
+
+    def _insert(self, order, created):
+        day = created.date().isoformat()
+        self._conn.execute(
+            'INSERT INTO daily_totals (order_date, orders, total_amount) VALUES (?, 1, ?)'
+            ' ON CONFLICT(order_date) DO UPDATE SET orders = orders + 1,'
+            ' total_amount = total_amount + excluded.total_amount', (day, float(order.get('total_amount') or 0)))
+        count = self._conn.execute('SELECT orders FROM daily_totals WHERE order_date = ?', (day,)).fetchone()[0]
+        row = {
+            'order_id': f"ORD-{created:%Y%m%d}-{count:04d}",
+            'session_id': order.get('session_id'),
+            'created_at': created.isoformat(),
+            'order_date': day,
+            'customer_name': order.get('customer_name'),
+            'customer_phone': order.get('customer_phone'),
+            'customer_email': order.get('customer_email'),
+            'delivery_address': order.get('delivery_address'),
+            'items': list(order.get('items') or []),
+            'total_amount': float(order.get('total_amount') or 0),
+            'notes': order.get('notes'),
+            'status': order.get('status', 'confirmed'),
+        }
+        values = [json.dumps(row[c], ensure_ascii=False) if c == 'items' else row[c] for c in _COLUMNS]
+        self._conn.execute(
+            f"INSERT INTO orders ({', '.join(_COLUMNS)}, phone_key) VALUES ({', '.join('?' * (len(_COLUMNS) + 1))})",
+            values + [normalize_phone(row['customer_phone'])])
+        return row
+
+    def append(self, order, created=None):
+        """Record a confirmed order and return it with its ``order_id``.
+
+        ``order`` has session_id, customer_name, customer_phone,
+        customer_email, delivery_address, items, total_amount and notes.
+        """
+        created = created or datetime.now()
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock up front, so per-day
+            # numbering cannot race another worker
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._insert(order, created)
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return row
+
+    @staticmethod
+    def _order(row):
+        order = dict(zip(_COLUMNS, row))
+        order['items'] = json.loads(order['items'])
+        return order
+
+    def get(self, order_id):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM orders WHERE order_id = ?", (order_id,)).fetchone()
+        return self._order(row) if row else None
+
+    def query(self, phone=None, session_id=None, date_from=None, date_to=None,
+              limit=DEFAULT_PAGE_SIZE, page_token=None):
+        """Orders newest first, one page at a time; chain pages with ``next_page_token``.
+
+        ``phone`` matches however the number was written; ``date_from`` and
+        ``date_to`` are inclusive ISO dates.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        clauses, params = [], []
+        if phone:
+            clauses.append('phone_key = ?')
+            params.append(normalize_phone(phone))
+        if session_id:
+            clauses.append('session_id = ?')
+            params.append(session_id)
+        date_from, date_to = _day(date_from, 'date_from'), _day(date_to, 'date_to')
+        if date_from:
+            clauses.append('order_date >= ?')
+            params.append(date_from)
+        if date_to:
+            clauses.append('order_date <= ?')
+            params.append(date_to)
+        if page_token:
+            clauses.append('id < ?')
+            params.append(_decode_page_token(page_token))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)}, id FROM orders {where} ORDER BY id DESC LIMIT ?",
+                params + [limit + 1]).fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            'orders': [self._order(row[:-1]) for row in rows],
+            'next_page_token': _encode_page_token(rows[-1][-1]) if more else None,
+        }
+
+    def daily_totals(self, date_from=None, date_to=None):
+        """Order count and amount per day with orders in [date_from, date_to], plus their sums.
+
+        Defaults to the last 30 days of activity when no range is given.
+        """
+        date_from, date_to = _day(date_from, 'date_from'), _day(date_to, 'date_to')
+        if date_from and date_to and (datetime.fromisoformat(date_to) - datetime.fromisoformat(date_from)).days >= MAX_TOTAL_DAYS:
+            raise ValueError(f'Date range too long: at most {MAX_TOTAL_DAYS} days')
+        clauses, params = [], []
+        if date_from:
+            clauses.append('order_date >= ?')
+            params.append(date_from)
+        if date_to:
+            clauses.append('order_date <= ?')
+            params.append(date_to)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        # without a lower bound, the newest days first then put back in order
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT order_date, orders, total_amount FROM daily_totals {where}'
+                f' ORDER BY order_date DESC LIMIT ?', params + [MAX_TOTAL_DAYS if date_from else 30]).fetchall()
+        days = [{'date': d, 'orders': n, 'total_amount': t} for d, n, t in reversed(rows)]
+        return {
+            'days': days,
+            'orders': sum(d['orders'] for d in days),
+            'total_amount': sum(d['total_amount'] for d in days),
+        }
+
+    def import_legacy(self, path):
+        """Import the blocks of the old confirmed_orders.txt once; returns how many were added.
+
+        The text log kept only the first 8 characters of the session id and
+        the items joined by commas, so that is what the imported rows hold.
+        """
+        with self._lock:
+            done = self._conn.execute("SELECT value FROM meta WHERE name = 'legacy_imported'").fetchone()
+        if done or not os.path.exists(path):
+            return 0
+        with open(path, 'r', encoding='utf-8') as f:
+            blocks = [b.strip() for b in f.read().split('=' * 50)]
+        imported = 0
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                if self._conn.execute("SELECT 1 FROM meta WHERE name = 'legacy_imported'").fetchone():
+                    self._conn.rollback()
+                    return 0
+                for block in blocks:
+                    lines = block.splitlines()
+                    if not lines:
+                        continue
+                    try:
+                        created = datetime.fromisoformat(lines[0].strip())
+                    except ValueError:
+                        continue
+                    fields = {}
+                    for line in lines[1:]:
+                        name, _, value = line.partition(': ')
+                        if name in _LEGACY_FIELDS:
+                            fields[_LEGACY_FIELDS[name]] = value.strip()
+                    total = re.sub(r'[^\d]', '', fields.get('total_amount', '')) or '0'
+                    self._insert({
+                        'session_id': fields.get('legacy_id'),
+                        'customer_name': fields.get('customer_name'),
+                        'customer_phone': fields.get('customer_phone'),
+                        'customer_email': None if fields.get('customer_email') in (None, 'None') else fields['customer_email'],
+                        'delivery_address': fields.get('delivery_address'),
+                        'items': [i.strip() for i in fields.get('items', '').split(',') if i.strip()],
+                        'total_amount': float(total),
+                        'notes': None if fields.get('notes') in (None, 'None') else fields['notes'],
+                    }, created)
+                    imported += 1
+                self._conn.execute("INSERT INTO meta (name, value) VALUES ('legacy_imported', ?)",
+                                   (datetime.now().isoformat(),))
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        logger.info(f"Imported {imported} orders from {path}")
+        return imported
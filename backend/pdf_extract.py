@@ -0,0 +1,177 @@
+"""PDF text extraction: page ranges in worker processes, streamed in order, cached per page.
+
+Kept free of app state so the range extractor can run in worker processes.
+"""
+import os
+import json
+import logging
+from collections import deque
+from contextlib import contextmanager
+from capabilities import capabilities
+
+try:
+    import fcntl
+    _FCNTL_AVAILABLE = True
+except Exception:
+    fcntl = None
+    _FCNTL_AVAILABLE = False
+
+# imported on first use, in the worker process that extracts
+PyPDF2 = capabilities.lazy('pypdf')
+
+logger = logging.getLogger("call-agent-api")
+
+PAGES_PER_TASK = int(os.getenv('PDF_PAGES_PER_TASK', '16'))
+PAGES_FILE = 'pages.jsonl'
+COMPLETE_FILE = 'complete'
+LOCK_FILE = 'lock'
+
+
+def count_pages(pdf_path):
+    return len(PyPDF2.PdfReader(pdf_path).pages)
+
+
+def extract_page_range(pdf_path, start, end):
+    """Text of pages [start, end). Runs in a worker process."""
+    reader = PyPDF2.PdfReader(pdf_path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+class _Inline:
+    """Stand-in for a Future when extraction runs in the calling process."""
+
+    def __init__(self, fn, *args):
+        self._fn = fn
+        self._args = args
+
+    def result(self):
+        return self._fn(*self._args)
+
+
+class PageCache:
+    """Extracted page texts for one PDF, keyed by the file's content hash.
+
+    Pages are appended in order to ``<root>/<hash>/pages.jsonl`` as they are
+    extracted; a ``complete`` marker records the page count once every page
+    is in. An interrupted extraction resumes after the last cached page.
+    Extraction runs under an exclusive ``flock`` on ``<hash>/lock`` (where
+    ``fcntl`` exists), so two workers given the same PDF never write the
+    file at once; the second waits and then reads the first one's pages.
+    """
+
+    def __init__(self, root, content_hash):
+        self.dir = os.path.join(root, content_hash)
+        self.pages_path = os.path.join(self.dir, PAGES_FILE)
+        self.complete_path = os.path.join(self.dir, COMPLETE_FILE)
+        self.lock_path = os.path.join(self.dir, LOCK_FILE)
+
+    def is_complete(self):
+        return os.path.exists(self.complete_path)
+
+    def cached_pages(self):
+        """Yield cached page texts in order, stopping at a torn final line."""
+        if not os.path.exists(self.pages_path):
+            return
+        with open(self.pages_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    return
+
+    @contextmanager
+    def locked(self):
+        """Hold the cache's extraction lock, across processes, for the ``with`` block."""
+        os.makedirs(self.dir, exist_ok=True)
+        with open(self.lock_path, 'a') as f:
+            if _FCNTL_AVAILABLE:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if _FCNTL_AVAILABLE:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def open_for_append(self, keep):
+        """Truncate to the first ``keep`` valid pages and return an append handle; call under ``locked()``."""
+        os.makedirs(self.dir, exist_ok=True)
+        pages = []
+        for i, page in enumerate(self.cached_pages()):
+            if i >= keep:
+                break
+            pages.append(page)
+        with open(self.pages_path, 'w', encoding='utf-8') as f:
+            for page in pages:
+                f.write(json.dumps(page, ensure_ascii=False) + '\n')
+        return open(self.pages_path, 'a', encoding='utf-8')
+
+    def page_count(self):
+        with open(self.complete_path, 'r', encoding='utf-8') as f:
+            return int(f.read().strip() or 0)
+
+    def mark_complete(self, page_count):
+        tmp = f'{self.complete_path}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(str(page_count))
+        os.replace(tmp, self.complete_path)
+
+
+def _iter_cached(cache, progress):
+    total = cache.page_count()
+    for i, page in enumerate(cache.cached_pages()):
+        if progress:
+            progress(i + 1, total)
+        yield page
+
+
+def iter_pdf_pages(pdf_path, cache, submit=None, workers=1, pages_per_task=PAGES_PER_TASK, progress=None):
+    """Yield page texts in page order.
+
+    Pages already in ``cache`` are read back without touching the PDF. The
+    rest are split into ranges of ``pages_per_task`` and handed to ``submit``
+    (e.g. a process pool's submit); at most ``2 * workers`` ranges are in
+    flight, so memory stays bounded. Each page is appended to the cache and
+    yielded as soon as every earlier page is done. ``progress`` receives
+    ``(done, total)`` page counts.
+
+    The extraction holds ``cache.locked()``; a caller that waited for it
+    finds the cache complete and reads it back instead.
+    """
+    if cache.is_complete():
+        yield from _iter_cached(cache, progress)
+        return
+
+    with cache.locked():
+        if cache.is_complete():
+            # another worker extracted it while this one waited for the lock
+            yield from _iter_cached(cache, progress)
+            return
+
+        total = count_pages(pdf_path)
+        done = 0
+        for page in cache.cached_pages():
+            if done >= total:
+                break
+            done += 1
+            if progress:
+                progress(done, total)
+            yield page
+        if done:
+            logger.info(f"Resuming extraction of {pdf_path} at page {done + 1}/{total}")
+
+        submit = submit or _Inline
+        ranges = deque((s, min(s + pages_per_task, total)) for s in range(done, total, pages_per_task))
+        inflight = deque()
+        with cache.open_for_append(done) as out:
+            while ranges or inflight:
+                while ranges and len(inflight) < max(1, 2 * workers):
+                    start, end = ranges.popleft()
+                    inflight.append(submit(extract_page_range, pdf_path, start, end))
+                for page in inflight.popleft().result():
+                    out.write(json.dumps(page, ensure_ascii=False) + '\n')
+                    done += 1
+                    if progress:
+                        progress(done, total)
+                    yield page
+                out.flush()
+        cache.mark_complete(total)
@@ -0,0 +1,165 @@
+"""Per-PDF text caches, keyword and vector indexes, so every uploaded document stays searchable."""
+import os
+import heapq
+import shutil
+import logging
+import threading
+from index_manager import IndexManager
+from keyword_index import KeywordIndex
+
+logger = logging.getLogger("call-agent-api")
+
+TEXT_FILE = 'text.txt'
+KEYWORDS_FILE = 'keywords.npz'
+VECTORS_DIR = 'vectors'
+
+
+class _TextWriter:
+    def __init__(self, path):
+        self.path = path
+        self.tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        self.length = 0
+        self._f = None
+
+    def __enter__(self):
+        self._f = open(self.tmp, 'w', encoding='utf-8')
+        return self
+
+    def write(self, text):
+        self._f.write(text)
+        self.length += len(text)
+
+    def __exit__(self, exc_type, exc, tb):
+        self._f.close()
+        if exc_type is None:
+            os.replace(self.tmp, self.path)
+        elif os.path.exists(self.tmp):
+            os.remove(self.tmp)
+        return False
+
+
+class PdfRegistry:
+    """Maps a PDF id (its file name in uploaded_pdfs/) to its own index directory.
+
+    Layout: ``<root>/<pdf_id>/text.txt`` holds the extracted text and
+    ``<root>/<pdf_id>/keywords.npz`` its BM25 index, and
+    ``<root>/<pdf_id>/vectors/`` is the IndexManager store for that PDF.
+    Managers are created on first use and kept for the life of the process;
+    keyword indexes are kept too and reloaded when their file changes.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._managers = {}
+        self._keywords = {}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _dir(self, pdf_id):
+        if not pdf_id or os.path.basename(pdf_id) != pdf_id or pdf_id in ('.', '..'):
+            raise ValueError(f'Invalid PDF id: {pdf_id!r}')
+        return os.path.join(self.root, pdf_id)
+
+    def text_path(self, pdf_id):
+        return os.path.join(self._dir(pdf_id), TEXT_FILE)
+
+    def has_text(self, pdf_id):
+        return os.path.exists(self.text_path(pdf_id))
+
+    def read_text(self, pdf_id):
+        with open(self.text_path(pdf_id), 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def text_writer(self, pdf_id):
+        """Context manager that streams text to the cache, replacing it only on success."""
+        os.makedirs(self._dir(pdf_id), exist_ok=True)
+        return _TextWriter(self.text_path(pdf_id))
+
+    def keyword_path(self, pdf_id):
+        return os.path.join(self._dir(pdf_id), KEYWORDS_FILE)
+
+    def write_keywords(self, pdf_id, index):
+        os.makedirs(self._dir(pdf_id), exist_ok=True)
+        index.save(self.keyword_path(pdf_id))
+
+    def keyword_index(self, pdf_id, chunker=None):
+        """The PDF's KeywordIndex, or None if it has no text.
+
+        A PDF cached before keyword indexes existed gets one built from its
+        text with ``chunker`` (and persisted) on first use.
+        """
+        path = self.keyword_path(pdf_id)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            if chunker is None or not self.has_text(pdf_id):
+                return None
+            index = KeywordIndex.build(list(chunker.chunks([self.read_text(pdf_id)])))
+            self.write_keywords(pdf_id, index)
+            logger.info(f"Built keyword index for {pdf_id}: {len(index)} chunks")
+            st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._keywords.get(pdf_id)
+            if cached is not None and cached[0] == stamp:
+                return cached[1]
+        index = KeywordIndex.load(path)
+        with self._lock:
+            self._keywords[pdf_id] = (stamp, index)
+        return index
+
+    def manager(self, pdf_id):
+        directory = self._dir(pdf_id)
+        with self._lock:
+            mgr = self._managers.get(pdf_id)
+            if mgr is None:
+                mgr = IndexManager(os.path.join(directory, VECTORS_DIR))
+                self._managers[pdf_id] = mgr
+            return mgr
+
+    def is_indexed(self, pdf_id):
+        if not os.path.isdir(self._dir(pdf_id)):
+            return False
+        return self.manager(pdf_id).current() is not None
+
+    def pdf_ids(self):
+        if not os.path.exists(self.root):
+            return []
+        return [d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d))]
+
+    def indexed_ids(self):
+        return [pdf_id for pdf_id in self.pdf_ids() if self.is_indexed(pdf_id)]
+
+    def remove(self, pdf_id):
+        with self._lock:
+            self._managers.pop(pdf_id, None)
+            self._keywords.pop(pdf_id, None)
+        shutil.rmtree(self._dir(pdf_id), ignore_errors=True)
+
+    def search(self, query_vec, k=3, pdf_ids=None):
+        """Top-k (score, item, pdf_id) across ``pdf_ids`` (default: every indexed PDF).
+
+        Returns (results, sources) where ``sources`` lists the backends used.
+        """
+        if pdf_ids is None:
+            pdf_ids = self.indexed_ids()
+        merged = []
+        sources = set()
+        for pdf_id in pdf_ids:
+            hits, source = self.manager(pdf_id).search(query_vec, k)
+            if hits is None:
+                continue
+            sources.add(source)
+            merged.extend((score, item, pdf_id) for score, item in hits)
+        return heapq.nlargest(k, merged, key=lambda r: r[0]), sorted(sources)
+
+    def keyword_search(self, query, k=3, pdf_ids=None, chunker=None):
+        """Top-k (score, item, pdf_id) by BM25 across ``pdf_ids`` (default: every PDF with text)."""
+        if pdf_ids is None:
+            pdf_ids = self.pdf_ids()
+        merged = []
+        for pdf_id in pdf_ids:
+            index = self.keyword_index(pdf_id, chunker)
+            if index is not None:
+                merged.extend((score, item, pdf_id) for score, item in index.search(query, k))
+        return heapq.nlargest(k, merged, key=lambda r: r[0])
@@ -0,0 +1,219 @@
+"""Incremental sync of PDF chunk vectors to a Pinecone index."""
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from capabilities import capabilities
+
+logger = logging.getLogger("call-agent-api")
+
+# imported only once Pinecone is configured and used
+pinecone = capabilities.lazy('pinecone')
+
+PINECONE_INDEX = os.getenv('PINECONE_INDEX', 'icai-embeddings')
+PINECONE_BATCH_SIZE = int(os.getenv('PINECONE_BATCH_SIZE', '100'))
+PINECONE_SYNC_WORKERS = int(os.getenv('PINECONE_SYNC_WORKERS', '4'))
+# Pinecone accepts at most 1000 ids per delete or fetch request
+_ID_BATCH = 1000
+
+
+def vector_id(pdf_id, chunk, model):
+    """Stable id of a chunk's vector: the PDF id plus a hash of model, text and pages.
+
+    A chunk whose text and position are unchanged keeps its id across
+    rebuilds, so it is neither re-uploaded nor deleted.
+    """
+    h = hashlib.sha256()
+    for part in (model, chunk['text'], str(chunk.get('page_start')), str(chunk.get('page_end'))):
+        h.update(part.encode('utf-8'))
+        h.update(b'\0')
+    return f'{pdf_id}-{h.hexdigest()[:32]}'
+
+
+def pinecone_configured():
+    """Credentials are set and the client imports (the import happens only once they are set)."""
+    return bool(os.getenv('PINECONE_API_KEY')) and bool(os.getenv('PINECONE_ENV')) and capabilities.available('pinecone')
+
+
+def connect_index(dimension=None, index_name=PINECONE_INDEX):
+    """Open the configured Pinecone index, creating it with ``dimension`` if it does not exist."""
+    pinecone.init(api_key=os.getenv('PINECONE_API_KEY'), environment=os.getenv('PINECONE_ENV'))
+    if index_name not in pinecone.list_indexes():
+        if dimension is None:
+            raise RuntimeError(f'Pinecone index {index_name} does not exist')
+        pinecone.create_index(index_name, dimension=dimension)
+    return pinecone.Index(index_name)
+
+
+class InMemoryIndex:
+    """Local stand-in for a Pinecone index handle: ``upsert``, ``delete``, ``fetch``
+    and ``describe_index_stats`` over a dict, with an optional per-request
+    ``latency`` in seconds to imitate the network. Counts requests by kind."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.vectors = {}
+        self.requests = {'upsert': 0, 'delete': 0, 'fetch': 0}
+        self._lock = threading.Lock()
+
+    def _request(self, kind):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.requests[kind] += 1
+
+    def upsert(self, vectors, namespace=None):
+        self._request('upsert')
+        with self._lock:
+            for vid, values, metadata in vectors:
+                self.vectors[vid] = (list(values), dict(metadata or {}))
+        return {'upserted_count': len(vectors)}
+
+    def delete(self, ids=None, namespace=None):
+        self._request('delete')
+        with self._lock:
+            for vid in ids or ():
+                self.vectors.pop(vid, None)
+        return {}
+
+    def fetch(self, ids, namespace=None):
+        self._request('fetch')
+        with self._lock:
+            found = {vid: {'id': vid, 'values': self.vectors[vid][0], 'metadata': self.vectors[vid][1]}
+                     for vid in ids if vid in self.vectors}
+        return {'vectors': found}
+
+    def describe_index_stats(self):
+        with self._lock:
+            return {'total_vector_count': len(self.vectors)}
+
+
+class PineconeSync:
+    """Keeps each PDF's chunk vectors in a Pinecone index equal to its latest build.
+
+    The ids synced for each PDF are recorded in a SQLite table at ``path``,
+    shared by every worker, so a rebuild uploads only chunks whose ids are
+    not there yet and deletes the ids that are no longer produced. Upserts
+    and deletes go out in batches on a thread pool; a batch is recorded only
+    after Pinecone accepted it, so a failed sync is resumed by the next one.
+    When a PDF has no record (first sync, or a lost table) the candidate ids
+    are looked up with ``fetch`` instead, so vectors already in the index
+    are not sent again.
+
+    ``index`` is a Pinecone index handle (or ``InMemoryIndex``); by default
+    ``connect_index`` opens the configured one on first use and the handle
+    is kept for the life of the process.
+    """
+
+    def __init__(self, path, index=None, batch_size=PINECONE_BATCH_SIZE, workers=PINECONE_SYNC_WORKERS):
+        self.path = path
+        self.batch_size = batch_size
+        self.workers = workers
+        self._index = index
+        self._connect_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS synced ('
+            ' pdf_id TEXT NOT NULL, vector_id TEXT NOT NULL, PRIMARY KEY (pdf_id, vector_id))'
+        )
+        self._conn.commit()
+
+    def index(self, dimension=None):
+        if self._index is None:
+            with self._connect_lock:
+                if self._index is None:
+                    self._index = connect_index(dimension)
+        return self._index
+
+    def synced_ids(self, pdf_id):
+        with self._lock:
+            return {row[0] for row in self._conn.execute(
+                'SELECT vector_id FROM synced WHERE pdf_id = ?', (pdf_id,)).fetchall()}
+
+    def _record(self, pdf_id, ids, present):
+        with self._lock:
+            if present:
+                self._conn.executemany('INSERT OR IGNORE INTO synced (pdf_id, vector_id) VALUES (?, ?)',
+                                       [(pdf_id, vid) for vid in ids])
+            else:
+                self._conn.executemany('DELETE FROM synced WHERE pdf_id = ? AND vector_id = ?',
+                                       [(pdf_id, vid) for vid in ids])
+            self._conn.commit()
+
+    def _existing(self, index, ids):
+        """Which of ``ids`` the index already holds."""
+        found = set()
+        for i in range(0, len(ids), _ID_BATCH):
+            found.update(index.fetch(ids=ids[i:i + _ID_BATCH])['vectors'])
+        return found
+
+    def _run(self, calls):
+        """Run the ``calls`` (no-argument callables) on the pool; raise the first error after all finish."""
+        if not calls:
+            return
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(calls))),
+                                thread_name_prefix='pinecone-sync') as pool:
+            futures = [pool.submit(call) for call in calls]
+        errors = [f.exception() for f in futures if f.exception() is not None]
+        if errors:
+            raise errors[0]
+
+    def _deletes(self, index, pdf_id, ids):
+        """Calls deleting ``ids`` from the index, in batches, for ``_run``."""
+        def delete(batch):
+            def call():
+                index.delete(ids=batch)
+                self._record(pdf_id, batch, False)
+            return call
+        return [delete(ids[i:i + _ID_BATCH]) for i in range(0, len(ids), _ID_BATCH)]
+
+    def sync(self, pdf_id, chunks, vectors, model):
+        """Make ``pdf_id``'s vectors in the index match ``chunks``/``vectors`` (``Chunker.chunks`` dicts).
+
+        Returns counts of the vectors upserted, deleted and left unchanged.
+        """
+        wanted = {}
+        for chunk, vec in zip(chunks, vectors):
+            vid = vector_id(pdf_id, chunk, model)
+            if vid not in wanted:
+                wanted[vid] = (chunk, vec)
+        dimension = len(vectors[0]) if len(vectors) > 0 else 1536
+        index = self.index(dimension)
+        known = self.synced_ids(pdf_id)
+        if not known and wanted:
+            known = self._existing(index, list(wanted))
+            self._record(pdf_id, known, True)
+        new = [vid for vid in wanted if vid not in known]
+        stale = sorted(known - wanted.keys())
+
+        def upsert(ids):
+            def call():
+                batch = []
+                for vid in ids:
+                    chunk, vec = wanted[vid]
+                    meta = {'pdf_id': pdf_id, 'text': chunk['text'], 'page_start': chunk.get('page_start'),
+                            'page_end': chunk.get('page_end')}
+                    batch.append((vid, [float(x) for x in vec], meta))
+                index.upsert(vectors=batch)
+                self._record(pdf_id, ids, True)
+            return call
+
+        self._run([upsert(new[i:i + self.batch_size]) for i in range(0, len(new), self.batch_size)]
+                  + self._deletes(index, pdf_id, stale))
+        result = {'upserted': len(new), 'deleted': len(stale), 'unchanged': len(wanted) - len(new)}
+        logger.info(f"Pinecone sync for {pdf_id}: {result}")
+        return result
+
+    def remove(self, pdf_id):
+        """Delete every vector synced for ``pdf_id``."""
+        stale = sorted(self.synced_ids(pdf_id))
+        if not stale:
+            return 0
+        self._run(self._deletes(self.index(), pdf_id, stale))
+        return len(stale)
@@ -0,0 +1,134 @@
+"""In-memory caches for /search-pdf: query embeddings and full search results."""
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger("call-agent-api")
+
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', '2000'))
+QUERY_EMBEDDING_TTL_SECONDS = float(os.getenv('QUERY_EMBEDDING_TTL_SECONDS', str(24 * 3600)))
+SEARCH_RESULT_CACHE_SIZE = int(os.getenv('SEARCH_RESULT_CACHE_SIZE', '2000'))
+SEARCH_RESULT_TTL_SECONDS = float(os.getenv('SEARCH_RESULT_TTL_SECONDS', '600'))
+
+
+def normalize_query(q):
+    """Case-fold and collapse whitespace, so "Harga  menu" and "harga menu" share entries."""
+    return ' '.join(q.casefold().split())
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries also expire ``ttl`` seconds after insertion.
+
+    Tracks hits and misses, and the average time a miss took to compute, so
+    ``stats`` can report roughly how much time the hits saved.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._miss_seconds = 0.0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, value, compute_seconds=0.0):
+        """Store ``value``; ``compute_seconds`` is what producing it cost on the miss."""
+        with self._lock:
+            self._miss_seconds += compute_seconds
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            started = time.perf_counter()
+            value = compute()
+            self.put(key, value, time.perf_counter() - started)
+        return value
+
+    async def aget_or_compute(self, key, compute):
+        """``get_or_compute`` for a coroutine function ``compute``."""
+        value = self.get(key)
+        if value is None:
+            started = time.perf_counter()
+            value = await compute()
+            self.put(key, value, time.perf_counter() - started)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            avg_miss = self._miss_seconds / self.misses if self.misses else 0.0
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_ratio': (self.hits / lookups) if lookups else 0.0,
+                'avg_miss_ms': avg_miss * 1000,
+                'saved_ms': self.hits * avg_miss * 1000,
+            }
+
+
+class SearchCache:
+    """Query-embedding cache plus a result cache for the vector search path.
+
+    Result keys carry the version of every index searched, so a re-publish or
+    a different PDF selection can never serve stale hits; ``invalidate_results``
+    additionally drops them eagerly when the selection changes.
+    """
+
+    def __init__(self, embedding_size=QUERY_EMBEDDING_CACHE_SIZE, embedding_ttl=QUERY_EMBEDDING_TTL_SECONDS,
+                 result_size=SEARCH_RESULT_CACHE_SIZE, result_ttl=SEARCH_RESULT_TTL_SECONDS):
+        self.embeddings = TTLCache(embedding_size, embedding_ttl)
+        self.results = TTLCache(result_size, result_ttl)
+
+    def query_embedding(self, q, model, embed):
+        """Embedding of the normalized query; ``embed(text)`` is called on a miss."""
+        text = normalize_query(q)
+        return self.embeddings.get_or_compute((model, text), lambda: embed(text))
+
+    async def query_embedding_async(self, q, model, embed):
+        """``query_embedding`` for a coroutine function ``embed``."""
+        text = normalize_query(q)
+        return await self.embeddings.aget_or_compute((model, text), lambda: embed(text))
+
+    @staticmethod
+    def result_key(q, k, versions, mode=None):
+        """``versions`` is an iterable of (pdf_id, index version) for every index searched."""
+        return (normalize_query(q), k, mode, tuple(sorted(versions)))
+
+    def invalidate_results(self):
+        self.results.clear()
+
+    def stats(self):
+        return {'query_embeddings': self.embeddings.stats(), 'results': self.results.stats()}
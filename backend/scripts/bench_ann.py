@@ -0,0 +1,136 @@
+"""Benchmark: recall vs latency of the FAISS index options on synthetic vectors.
+
+Vectors are drawn around random cluster centres (embeddings of real text are
+clustered too, which is what IVF relies on) and row-normalized; queries are
+perturbed copies of stored vectors. Exact top-k from a flat scan is the
+ground truth. For every index spec and search setting it reports build time,
+index size, recall@k and single-query latency, then the cost of adding 10%
+more vectors through IndexManager.add versus publishing a rebuild:
+    cd backend && python scripts/bench_ann.py
+    cd backend && python scripts/bench_ann.py --n 200000 --dim 256 --k 10
+
+Settings found here map to ANN_INDEX, ANN_QUANTIZATION, ANN_EF_SEARCH,
+ANN_NPROBE, ANN_NLIST and ANN_PQ_M.
+"""
+import argparse
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ann_index import _pq_m, build_index  # noqa: E402
+from index_manager import IndexManager  # noqa: E402
+from vector_store import normalize_rows, top_k  # noqa: E402
+
+
+MODEL = 'text-embedding-3-small'
+
+
+def synthetic(n, dim, clusters, rng):
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, n)
+    return normalize_rows(centres[labels] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32))
+
+
+def search_settings(spec):
+    """(parameter, values) swept for a spec."""
+    if spec.startswith('HNSW'):
+        return 'efSearch', [16, 32, 64, 128]
+    if spec.startswith('IVF'):
+        return 'nprobe', [1, 4, 16, 64]
+    return None, [None]
+
+
+def measure(index, queries, truth, k):
+    latencies, found = [], 0
+    for q, expected in zip(queries, truth):
+        started = time.perf_counter()
+        _, ids = index.search(q[None, :], k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        found += len(set(ids[0].tolist()) & expected)
+    latencies.sort()
+    return found / (k * len(queries)), statistics.median(latencies), latencies[int(0.95 * (len(latencies) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--n', type=int, default=50000)
+    parser.add_argument('--dim', type=int, default=128)
+    parser.add_argument('--clusters', type=int, default=200)
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--specs', nargs='*', help='FAISS factory strings (default: flat, HNSW and IVF variants)')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = synthetic(args.n, args.dim, args.clusters, rng)
+    picks = rng.choice(args.n, args.queries, replace=False)
+    queries = normalize_rows(data[picks] + 0.05 * rng.standard_normal((args.queries, args.dim)).astype(np.float32))
+    truth = [{i for _, i in row} for row in top_k(data, queries, args.k)]
+    nlist = max(1, min(int(4 * math.sqrt(args.n)), args.n // 39))
+    pq = _pq_m(args.dim)
+    specs = args.specs or ['Flat', 'HNSW32', 'HNSW32_SQ8', f'IVF{nlist},Flat', f'IVF{nlist},SQ8',
+                           f'IVF{nlist},PQ{pq}']
+    print(f'{args.n} vectors x {args.dim} dims ({args.clusters} clusters), {args.queries} queries, '
+          f'recall@{args.k}, {faiss.omp_get_max_threads()} threads')
+
+    latencies = []
+    for q in queries[:100]:
+        started = time.perf_counter()
+        top_k(data, q, args.k)
+        latencies.append((time.perf_counter() - started) * 1000)
+    print(f"{'spec':>18} {'setting':>12} {'build s':>8} {'MB':>7} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    print(f"{'numpy':>18} {'':>12} {0:>8.1f} {data.nbytes / 1e6:>7.1f} {1:>7.1%} "
+          f"{statistics.median(latencies):>8.3f} {sorted(latencies)[94]:>8.3f}")
+
+    params = faiss.ParameterSpace()
+    built = {}
+    for spec in specs:
+        started = time.perf_counter()
+        index, _ = build_index(data, spec)
+        build_s = time.perf_counter() - started
+        built[spec] = build_s
+        size_mb = len(faiss.serialize_index(index)) / 1e6
+        name, values = search_settings(spec)
+        for value in values:
+            if name:
+                params.set_index_parameter(index, name, value)
+            recall, p50, p95 = measure(index, queries, truth, args.k)
+            setting = f'{name}={value}' if name else ''
+            print(f'{spec:>18} {setting:>12} {build_s:>8.1f} {size_mb:>7.1f} {recall:>7.1%} {p50:>8.3f} {p95:>8.3f}')
+
+    # IndexManager.add, as ingestion uses it: copy and grow the published index, write a new version
+    extra = synthetic(args.n // 10, args.dim, args.clusters, rng)
+    texts = [f'chunk {i}' for i in range(args.n)]
+    extra_texts = [f'chunk {args.n + i}' for i in range(len(extra))]
+    print(f'\nIndexManager.add of {len(extra)} vectors vs publishing a rebuild over {args.n + len(extra)}')
+    print(f"{'spec':>18} {'add s':>8} {'rebuild s':>10}  index after add")
+    combined = np.concatenate([data, extra])
+    for spec in specs:
+        with tempfile.TemporaryDirectory() as tmp:
+            manager = IndexManager(os.path.join(tmp, 'grown'))
+            manager.publish(build_index(data, spec)[0], data, texts, MODEL, index_spec=spec)
+            started = time.perf_counter()
+            manager.add(extra, extra_texts, MODEL)
+            add_s = time.perf_counter() - started
+            after = manager.current().index_spec
+            assert len(manager.current().items) == len(combined)
+
+            started = time.perf_counter()
+            index, _ = build_index(combined, spec)
+            IndexManager(os.path.join(tmp, 'rebuilt')).publish(index, combined, texts + extra_texts, MODEL,
+                                                               index_spec=spec)
+            rebuild_s = time.perf_counter() - started
+        how = 'grown' if after == spec else f'rebuilt as {after} (auto-selection)'
+        print(f'{spec:>18} {add_s:>8.2f} {rebuild_s:>10.2f}  {how}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Benchmark: /call-logs listing time as the number of sessions grows.
+
+Compares the old scan (json.load every session file, sort in Python) with a
+page from the summary index, a filtered page, a deep page and an
+incremental refresh:
+    cd backend && python scripts/bench_call_logs_list.py --sizes 1000 10000 100000 --scan-max 10000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from call_log_index import CallLogIndex  # noqa: E402
+
+STATUSES = ('active', 'completed', 'staff_requested')
+ORDER_STATUSES = ('none', 'confirmed', 'completed', 'transferred')
+
+
+def make_sessions(count, messages=12):
+    base = datetime(2024, 1, 1)
+    for i in range(count):
+        start = (base + timedelta(minutes=7 * i)).isoformat()
+        yield {
+            "session_id": f"session-{i:07d}",
+            "start_time": start,
+            "messages": [{"type": "user", "message": f"pesan {n} untuk sesi {i}", "timestamp": start}
+                         for n in range(messages)],
+            "status": STATUSES[i % len(STATUSES)],
+            "order_status": ORDER_STATUSES[i % len(ORDER_STATUSES)],
+        }
+
+
+def scan_listing(root):
+    """What get_call_logs did before the index."""
+    logs = []
+    for filename in os.listdir(root):
+        if filename.endswith('.json'):
+            with open(os.path.join(root, filename), "r", encoding="utf-8") as f:
+                log_data = json.load(f)
+            logs.append({
+                "session_id": log_data["session_id"],
+                "start_time": log_data["start_time"],
+                "message_count": len(log_data["messages"]),
+                "last_message": log_data["messages"][-1]["timestamp"],
+                "status": log_data.get("status", "active"),
+                "order_status": log_data.get("order_status", "none"),
+            })
+    logs.sort(key=lambda x: x["start_time"], reverse=True)
+    return logs
+
+
+def timed(fn, repeat=20):
+    best = float('inf')
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--scan-max', type=int, default=10000, help='largest size to run the old scan on')
+    args = parser.parse_args()
+
+    print(f"{'sessions':>9} {'old scan':>10} {'page':>8} {'filtered':>9} {'page 20':>8} {'since':>8}   (ms)")
+    for size in args.sizes:
+        workdir = tempfile.mkdtemp(prefix='bench_call_logs_')
+        index = CallLogIndex(os.path.join(workdir, 'call_logs.sqlite'))
+        summaries = []
+        scan_ms = None
+        if size <= args.scan_max:
+            log_dir = os.path.join(workdir, 'call_logs')
+            os.makedirs(log_dir)
+        for log_data in make_sessions(size):
+            if size <= args.scan_max:
+                with open(os.path.join(log_dir, f"{log_data['session_id']}.json"), "w", encoding="utf-8") as f:
+                    json.dump(log_data, f, ensure_ascii=False, indent=2)
+            summaries.append({"session_id": log_data["session_id"], "start_time": log_data["start_time"],
+                              "message_count": len(log_data["messages"]),
+                              "last_message": log_data["messages"][-1]["timestamp"],
+                              "status": log_data["status"], "order_status": log_data["order_status"]})
+        index.upsert_many(summaries)
+        if size <= args.scan_max:
+            scan_ms = timed(lambda: scan_listing(log_dir), repeat=3)
+
+        first = index.query()
+        cursor = first["cursor"]
+        index.upsert_many(summaries[:5])
+
+        def deep_page():
+            token = None
+            for _ in range(20):
+                token = index.query(page_token=token)["next_page_token"]
+
+        page_ms = timed(lambda: index.query())
+        filtered_ms = timed(lambda: index.query(status='completed', order_status='confirmed',
+                                                start_from='2024-02-01', start_to='2024-06-30'))
+        deep_ms = timed(deep_page, repeat=3) / 20
+        since_ms = timed(lambda: index.query(since=cursor))
+        assert len(index.query(since=cursor)["logs"]) == 5
+        scan = f'{scan_ms:10.1f}' if scan_ms is not None else f"{'-':>10}"
+        print(f'{size:>9} {scan} {page_ms:>8.2f} {filtered_ms:>9.2f} {deep_ms:>8.2f} {since_ms:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
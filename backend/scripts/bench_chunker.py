@@ -0,0 +1,142 @@
+"""Benchmark: chunking strategies on the cached PDF text.
+
+For every strategy it reports chunk count, characters and tokens sent to the
+embedding model (and their cost), the share of source lines cut in two by a
+chunk boundary, and retrieval hit rate: each "name: price" line becomes the
+query "name", and a hit means one of the top-k chunks contains the whole
+line. Retrieval is scored with TF-IDF cosine by default; --embed uses the
+OpenAI embedding model instead (needs OPENAI_API_KEY):
+    cd backend && python scripts/bench_chunker.py
+    cd backend && python scripts/bench_chunker.py --text pdf_indexes/<pdf_id>/text.txt --k 3 --embed
+"""
+import argparse
+import math
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from chunker import STRATEGIES, Chunker, count_tokens  # noqa: E402
+from embedding_pipeline import EMBEDDING_MODEL  # noqa: E402
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+# text-embedding-3-small, USD per 1M tokens
+EMBEDDING_PRICE_PER_M = 0.02
+_WORD = re.compile(r'\w+')
+
+
+def facts(text):
+    """(query, line) pairs from "name: value" lines."""
+    pairs = []
+    for line in text.splitlines():
+        line = line.strip()
+        if ':' in line:
+            name = line.split(':', 1)[0].strip(' •-*')
+            if name:
+                pairs.append((name, line))
+    return pairs
+
+
+def tfidf_ranker(chunks):
+    docs = [Counter(w.lower() for w in _WORD.findall(c)) for c in chunks]
+    df = Counter(w for d in docs for w in d)
+    idf = {w: math.log((1 + len(docs)) / (1 + n)) + 1 for w, n in df.items()}
+
+    def vec(counts):
+        v = {w: c * idf.get(w, 0.0) for w, c in counts.items()}
+        norm = math.sqrt(sum(x * x for x in v.values())) or 1.0
+        return {w: x / norm for w, x in v.items()}
+
+    doc_vecs = [vec(d) for d in docs]
+
+    def rank(query, k):
+        q = vec(Counter(w.lower() for w in _WORD.findall(query)))
+        scores = [sum(x * d.get(w, 0.0) for w, x in q.items()) for d in doc_vecs]
+        return list(np.argsort(scores)[::-1][:k])
+    return rank
+
+
+def embedding_ranker(client, chunks):
+    def embed(texts):
+        out = []
+        for i in range(0, len(texts), 100):
+            resp = client.embeddings.create(model=EMBEDDING_MODEL, input=texts[i:i + 100])
+            out.extend(d.embedding for d in resp.data)
+        arr = np.array(out, dtype=np.float32)
+        return arr / np.linalg.norm(arr, axis=1, keepdims=True)
+
+    matrix = embed(chunks)
+
+    def rank(query, k):
+        return list(np.argsort(matrix @ embed([query])[0])[::-1][:k])
+    return rank
+
+
+def evaluate(chunker, pages, pairs, k, client=None):
+    started = time.perf_counter()
+    chunks = list(chunker.chunks(pages))
+    elapsed = time.perf_counter() - started
+    texts = [c['text'] for c in chunks]
+    source = ''.join(pages)
+    lines = [ln.strip() for ln in source.splitlines() if ln.strip()]
+    split = sum(1 for ln in lines if not any(ln in t for t in texts))
+    rank = embedding_ranker(client, texts) if client else tfidf_ranker(texts)
+    hits = sum(1 for query, line in pairs if any(line in texts[i] for i in rank(query, k)))
+    chars = sum(len(t) for t in texts)
+    tokens = sum(count_tokens(t) for t in texts)
+    return {
+        'chunks': len(chunks),
+        'chars': chars,
+        'redundancy': chars / max(1, len(source)) - 1,
+        'tokens': tokens,
+        'cost': tokens * EMBEDDING_PRICE_PER_M / 1e6,
+        'split': split / max(1, len(lines)),
+        'hit': hits / max(1, len(pairs)),
+        'ms': elapsed * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--text', default=os.path.join(BACKEND_DIR, 'pdf_text_cache.txt'))
+    parser.add_argument('--page-chars', type=int, default=1000, help='split the text into pages of about this size')
+    parser.add_argument('--repeat', type=int, default=1, help='repeat the text to simulate a longer PDF')
+    parser.add_argument('--k', type=int, default=1)
+    parser.add_argument('--embed', action='store_true')
+    args = parser.parse_args()
+
+    with open(args.text, 'r', encoding='utf-8') as f:
+        text = '\n'.join([f.read()] * args.repeat)
+    # page-sized pieces cut at line breaks, joined the way the text cache joins pages
+    pages, current = [], ''
+    for line in text.splitlines(keepends=True):
+        current += line
+        if len(current) >= args.page_chars:
+            pages.append(current)
+            current = ''
+    if current:
+        pages.append(current)
+    pairs = facts(text)
+    client = None
+    if args.embed:
+        from openai import OpenAI
+        client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+
+    print(f'{len(text)} chars in {len(pages)} pages, {len(pairs)} queries, hit@{args.k} by '
+          f'{"embeddings" if client else "TF-IDF"}')
+    print(f"{'strategy':>22} {'chunks':>7} {'chars':>7} {'redund':>7} {'tokens':>7} {'cost $':>9} "
+          f"{'split':>6} {'hit':>6} {'ms':>6}")
+    for strategy in STRATEGIES:
+        chunker = Chunker(strategy)
+        r = evaluate(chunker, pages, pairs, args.k, client)
+        print(f"{chunker.describe():>22} {r['chunks']:>7} {r['chars']:>7} {r['redundancy']:>7.1%} {r['tokens']:>7} "
+              f"{r['cost']:>9.6f} {r['split']:>6.1%} {r['hit']:>6.1%} {r['ms']:>6.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Benchmark: wall-clock embedding time vs. chunk count, sequential vs. batched pipeline.
+
+Runs against the local OpenAI stub, so no API key or network access is needed:
+    cd backend && python scripts/bench_embeddings.py
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from openai import OpenAI  # noqa: E402
+from embedding_pipeline import EmbeddingPipeline  # noqa: E402
+from openai_stub import start_stub  # noqa: E402
+
+
+def run(pipeline, chunks):
+    start = time.perf_counter()
+    vectors = pipeline.embed(chunks)
+    elapsed = time.perf_counter() - start
+    assert len(vectors) == len(chunks) and all(v is not None for v in vectors)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--counts', default='25,100,400')
+    parser.add_argument('--latency', type=float, default=0.05, help='stub latency per request (s)')
+    parser.add_argument('--dim', type=int, default=256)
+    parser.add_argument('--rate-limit-every', type=int, default=7)
+    args = parser.parse_args()
+
+    server, config, base_url = start_stub(latency=args.latency, dim=args.dim, rate_limit_every=args.rate_limit_every)
+    client = OpenAI(api_key='stub', base_url=base_url, max_retries=0)
+
+    sequential = EmbeddingPipeline(client, batch_size=1, max_concurrency=1, base_delay=0.01)
+    batched = EmbeddingPipeline(client, base_delay=0.01)
+
+    print(f"{'chunks':>8} {'sequential (s)':>15} {'pipeline (s)':>13} {'speedup':>8}")
+    for count in [int(c) for c in args.counts.split(',')]:
+        chunks = [f'chunk {i} ' + 'menu item harga ' * 50 for i in range(count)]
+        t_seq = run(sequential, chunks)
+        t_pipe = run(batched, chunks)
+        print(f'{count:>8} {t_seq:>15.3f} {t_pipe:>13.3f} {t_seq / t_pipe:>7.1f}x')
+
+    print(f'stub: {config.requests} requests, {config.rate_limited} rate-limited and retried')
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Benchmark: /analyze-emotion with an LLM call per text vs the tiered classifier.
+
+Replays agent utterances (a JSONL file of {"text": ...} lines, or a generated
+mix of common Indonesian/English replies) through the chat-completion stub:
+    cd backend && python scripts/bench_emotion.py --texts 1000 --chat-latency 0.3
+    cd backend && python scripts/bench_emotion.py --replay utterances.jsonl
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from openai import AsyncOpenAI
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from emotion_classifier import EmotionEngine, llm_messages, parse_llm_reply  # noqa: E402
+from openai_stub import start_stub  # noqa: E402
+
+UTTERANCES = [
+    "Terima kasih sudah memesan!", "Mohon maaf, menu tersebut sedang habis.", "Baik, pesanan Anda sudah kami catat.",
+    "Pesanan Anda nasi goreng dua porsi dan es teh satu.", "Totalnya 75 ribu rupiah.", "Ada lagi yang bisa saya bantu?",
+    "Jangan khawatir, akan kami bantu.", "Maaf, bisa diulangi alamatnya?", "Wow, hari ini ada promo spesial!",
+    "Makasih ya, selamat menikmati!", "Pesanan akan diantar sekitar 30 menit.", "Halo! Selamat datang di Warung Kami.",
+    "Saya mengerti, itu pasti mengecewakan.", "Sorry, we are closed on Sundays.", "Thank you for calling!",
+    "Apakah mau tambah sambal?", "Harganya bagus kok.", "Saya tidak senang dengan ini.",
+]
+
+
+def generate_traffic(count, seed=0):
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, len(UTTERANCES) + 1)
+    picks = rng.choice(len(UTTERANCES), size=count, p=weights / weights.sum())
+    return [UTTERANCES[i] for i in picks]
+
+
+def load_traffic(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line)['text'] for line in f if line.strip()]
+
+
+async def run_llm_only(texts, chat):
+    latencies = []
+    for text in texts:
+        started = time.perf_counter()
+        resp = await chat(model='gpt-3.5-turbo', messages=llm_messages(text), temperature=0.0, max_tokens=60)
+        parse_llm_reply(resp.choices[0].message.content.strip())
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def run_tiered(texts, engine):
+    latencies = []
+    for text in texts:
+        started = time.perf_counter()
+        await engine.analyze(text)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--replay', help='JSONL file of {"text": ...} utterances')
+    parser.add_argument('--texts', type=int, default=1000)
+    parser.add_argument('--chat-latency', type=float, default=0.3, help='stub latency per chat completion (s)')
+    args = parser.parse_args()
+
+    texts = load_traffic(args.replay) if args.replay else generate_traffic(args.texts)
+    server, config, base_url = start_stub(chat_latency=args.chat_latency)
+
+    async def bench():
+        # one event loop for both modes: the async client's pool belongs to it
+        client = AsyncOpenAI(api_key='stub', base_url=base_url, max_retries=0)
+        engine = EmotionEngine(client.chat.completions.create)
+        rows = []
+        for name, run in (('llm-only', lambda: run_llm_only(texts, client.chat.completions.create)),
+                          ('tiered', lambda: run_tiered(texts, engine))):
+            before = config.chat_requests
+            rows.append((name, np.array(await run()) * 1000, config.chat_requests - before))
+        await client.close()
+        return rows, engine.stats()
+
+    rows, stats = asyncio.run(bench())
+    print(f'{len(texts)} utterances, {len(set(texts))} distinct, stub chat latency {args.chat_latency * 1000:.0f} ms')
+    print(f"{'mode':>9} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'total s':>8} {'llm calls':>10}")
+    for name, latencies, calls in rows:
+        print(f'{name:>9} {np.percentile(latencies, 50):>8.3f} {np.percentile(latencies, 90):>8.3f} '
+              f'{np.percentile(latencies, 99):>8.1f} {latencies.sum() / 1000:>8.2f} {calls:>10}')
+    for tier, tier_stats in stats['tiers'].items():
+        print(f"  {tier:>9}: {tier_stats['count']:>5} ({tier_stats['share']:.1%}), avg {tier_stats['avg_us']:.0f} us")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
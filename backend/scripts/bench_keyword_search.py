@@ -0,0 +1,97 @@
+"""Benchmark: BM25 keyword index vs the old substring scan of the text fallback.
+
+Queries come from the "name: price" lines of the cached PDF text, in three
+forms: the exact name, its words reversed, and its words with the last few
+letters cut off (how a caller's partial phrase reaches the search). A hit
+means one of the top-k results contains the whole line. The old scan
+re-chunked the text on every query and only matched the query as one
+substring:
+    cd backend && python scripts/bench_keyword_search.py
+    cd backend && python scripts/bench_keyword_search.py --repeat 200 --k 3
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from chunker import Chunker  # noqa: E402
+from keyword_index import KeywordIndex  # noqa: E402
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_chunker import facts  # noqa: E402
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def substring_search(chunker, text, q, k):
+    """The previous _text_search: chunk, keep chunks containing q, score by frequency."""
+    matches = []
+    q_lower = q.lower()
+    for chunk in chunker.chunk_text(text):
+        if q_lower in chunk.lower():
+            score = chunk.lower().count(q_lower) / len(chunk.split())
+            matches.append((score, chunk))
+    matches.sort(key=lambda x: x[0], reverse=True)
+    return [chunk for _, chunk in matches[:k]]
+
+
+def variants(name):
+    words = name.split()
+    return {
+        'exact': name,
+        'reordered': ' '.join(reversed(words)),
+        'partial': ' '.join(w[:max(3, len(w) - 2)] for w in words),
+    }
+
+
+def run(search, queries, k):
+    """(hit rate, per-query latencies in ms)"""
+    hits, latencies = 0, []
+    for q, line in queries:
+        started = time.perf_counter()
+        results = search(q, k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits += any(line in r for r in results)
+    return hits / max(1, len(queries)), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--text', default=os.path.join(BACKEND_DIR, 'pdf_text_cache.txt'))
+    parser.add_argument('--repeat', type=int, default=50, help='repeat the text to simulate a longer PDF')
+    parser.add_argument('--k', type=int, default=3)
+    args = parser.parse_args()
+
+    with open(args.text, 'r', encoding='utf-8') as f:
+        source = f.read()
+    text = '\n'.join([source] * args.repeat)
+    chunker = Chunker()
+    started = time.perf_counter()
+    index = KeywordIndex.build(list(chunker.chunks([text])))
+    build_ms = (time.perf_counter() - started) * 1000
+    pairs = facts(source)
+    print(f'{len(text)} chars, {len(index)} chunks ({chunker.describe()}), {len(index.terms)} terms, '
+          f'index built in {build_ms:.0f} ms; {len(pairs)} queries per form, hit@{args.k}')
+    print(f"{'form':>10} {'method':>10} {'hit':>7} {'p50 ms':>9} {'p95 ms':>9}")
+
+    def bm25(q, k):
+        return [item['text'] for _, item in index.search(q, k)]
+
+    def scan(q, k):
+        return substring_search(chunker, text, q, k)
+
+    for form in ('exact', 'reordered', 'partial'):
+        queries = [(variants(name)[form], line) for name, line in pairs]
+        for method, search in (('substring', scan), ('bm25', bm25)):
+            hit, latencies = run(search, queries, args.k)
+            latencies.sort()
+            p95 = latencies[int(0.95 * (len(latencies) - 1))]
+            print(f'{form:>10} {method:>10} {hit:>7.1%} {statistics.median(latencies):>9.3f} {p95:>9.3f}')
+
+
+if __name__ == '__main__':
+    main()
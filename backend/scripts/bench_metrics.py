@@ -0,0 +1,104 @@
+"""Benchmark: cost of the metrics instrumentation.
+
+Times the recording primitives on their own, then the same small FastAPI
+endpoint (one stage timer inside, like the instrumented handlers) served
+in-process with and without MetricsMiddleware, and finally one /metrics
+render with realistic series counts:
+    cd backend && python scripts/bench_metrics.py --requests 1000 --rounds 11
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from metrics import Metrics, MetricsMiddleware  # noqa: E402
+
+
+def per_call_ns(fn, n):
+    started = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - started) / n * 1e9
+
+
+def make_app(metrics, instrumented):
+    app = FastAPI()
+
+    @app.post('/echo/{session_id}')
+    async def echo(session_id: str, payload: dict):
+        if instrumented:
+            with metrics.timer('analyze'):
+                return {'session_id': session_id, 'text': payload.get('text', '')}
+        return {'session_id': session_id, 'text': payload.get('text', '')}
+
+    if instrumented:
+        app.add_middleware(MetricsMiddleware, metrics=metrics)
+    return app
+
+
+async def serve(apps, requests, rounds):
+    """Per app, the median over rounds of the mean per-request time in microseconds.
+
+    Rounds alternate between the apps so machine noise hits both alike.
+    """
+    clients = [httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://bench') for app in apps]
+    results = [[] for _ in apps]
+    try:
+        for _ in range(rounds):
+            for client, times in zip(clients, results):
+                started = time.perf_counter()
+                for i in range(requests):
+                    await client.post(f'/echo/s{i % 50}', json={'text': 'halo'})
+                times.append((time.perf_counter() - started) / requests * 1e6)
+    finally:
+        for client in clients:
+            await client.aclose()
+    return [statistics.median(times) for times in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=11)
+    args = parser.parse_args()
+
+    metrics = Metrics()
+    print('recording primitives')
+    print(f"  inc        {per_call_ns(lambda: metrics.inc('http_requests_total', route='/x', method='GET', status=200), 200000):7.0f} ns")
+    print(f"  observe    {per_call_ns(lambda: metrics.observe('stage_duration_seconds', 0.003, stage='search'), 200000):7.0f} ns")
+
+    def timed():
+        with metrics.timer('search'):
+            pass
+    print(f"  timer      {per_call_ns(timed, 200000):7.0f} ns")
+
+    bare, instrumented = asyncio.run(serve([make_app(Metrics(), False), make_app(Metrics(), True)],
+                                           args.requests, args.rounds))
+    print(f'\nin-process request, median of {args.rounds} x {args.requests}')
+    print(f'  without metrics  {bare:8.1f} us')
+    print(f'  with metrics     {instrumented:8.1f} us  (+{instrumented - bare:.1f} us, {instrumented / bare - 1:+.1%})')
+
+    # ~40 routes x 3 statuses, 10 stages, 5 caches
+    for route in range(40):
+        for status in (200, 404, 500):
+            metrics.inc('http_requests_total', route=f'/r{route}', method='GET', status=status)
+        metrics.observe('http_request_duration_seconds', 0.01, route=f'/r{route}', method='GET')
+    for stage in range(10):
+        metrics.observe('stage_duration_seconds', 0.01, stage=f's{stage}')
+    for cache in range(5):
+        metrics.inc('cache_hits_total', 3, cache=f'c{cache}')
+        metrics.inc('cache_misses_total', 1, cache=f'c{cache}')
+    started = time.perf_counter()
+    text = metrics.render()
+    print(f'\n/metrics render: {(time.perf_counter() - started) * 1000:.2f} ms for {len(text.splitlines())} lines')
+
+
+if __name__ == '__main__':
+    main()
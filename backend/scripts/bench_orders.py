@@ -0,0 +1,157 @@
+"""Benchmark: order lookups in confirmed_orders.txt vs the SQLite order ledger.
+
+Writes the same synthetic orders (spread over --days days and --customers
+phone numbers) both as the old free-text blocks and into an OrderLedger, then
+times the three questions the orders views ask: the newest page, one
+customer's orders by phone, and per-day totals over a month:
+    cd backend && python scripts/bench_orders.py --orders 100000
+"""
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from order_ledger import OrderLedger, normalize_phone  # noqa: E402
+
+SEPARATOR = '=' * 50
+
+
+def make_orders(n, days, customers, rng):
+    start = datetime(2026, 1, 1)
+    seconds = sorted(rng.randrange(days * 86400) for _ in range(n))
+    for i, s in enumerate(seconds):
+        phone = f'0812{rng.randrange(customers):07d}'
+        yield start + timedelta(seconds=s), {
+            'session_id': f'{i:08x}-session',
+            'customer_name': f'Pelanggan {i}',
+            'customer_phone': phone if i % 2 else f'+62 {phone[1:4]}-{phone[4:]}',
+            'customer_email': None,
+            'delivery_address': f'Jl. Contoh No. {i % 200}',
+            'items': ['Nasi Goreng', 'Es Teh'],
+            'total_amount': float(rng.randrange(10, 500) * 1000),
+            'notes': None,
+        }
+
+
+def write_text(path, orders):
+    with open(path, 'w', encoding='utf-8') as f:
+        for created, o in orders:
+            f.write(f"\n{created.isoformat()}\n")
+            f.write(f"Order ID: {o['session_id'][:8]}\n")
+            f.write(f"Customer: {o['customer_name']}\n")
+            f.write(f"Phone: {o['customer_phone']}\n")
+            f.write(f"Email: {o['customer_email']}\n")
+            f.write(f"Address: {o['delivery_address']}\n")
+            f.write(f"Items: {', '.join(o['items'])}\n")
+            f.write(f"Total: Rp {o['total_amount']:,.0f}\n")
+            f.write(f"Notes: {o['notes']}\n")
+            f.write(SEPARATOR + "\n")
+
+
+def text_blocks(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [b.strip().splitlines() for b in f.read().split(SEPARATOR) if b.strip()]
+
+
+def text_page(path, limit):
+    return text_blocks(path)[-limit:][::-1]
+
+
+def text_by_phone(path, phone):
+    key = normalize_phone(phone)
+    return [b for b in text_blocks(path) if normalize_phone(b[3].partition(': ')[2]) == key]
+
+
+def text_daily_totals(path, date_from, date_to):
+    totals = {}
+    for b in text_blocks(path):
+        day = b[0][:10]
+        if date_from <= day <= date_to:
+            n, amount = totals.get(day, (0, 0.0))
+            totals[day] = (n + 1, amount + float(re.sub(r'\D', '', b[7])))
+    return totals
+
+
+def timed_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=100000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--customers', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    orders = list(make_orders(args.orders, args.days, args.customers, rng))
+    with tempfile.TemporaryDirectory() as tmp:
+        text_path = os.path.join(tmp, 'confirmed_orders.txt')
+        started = time.perf_counter()
+        write_text(text_path, orders)
+        text_write_s = time.perf_counter() - started
+
+        ledger = OrderLedger(os.path.join(tmp, 'orders.sqlite'))
+        timed = min(1000, len(orders))
+        started = time.perf_counter()
+        for created, o in orders[:timed]:
+            ledger.append(o, created)
+        append_ms = (time.perf_counter() - started) * 1000 / timed
+        for created, o in orders[timed:]:
+            ledger.append(o, created)
+
+        print(f'{args.orders} orders over {args.days} days, {args.customers} customers')
+        print(f'  text file written in {text_write_s:.2f} s ({os.path.getsize(text_path) / 1e6:.1f} MB); '
+              f'ledger append {append_ms:.3f} ms per order (one transaction each)')
+
+        phone = orders[-1][1]['customer_phone']
+        month_to = orders[-1][0].date()
+        month_from = (month_to - timedelta(days=29)).isoformat()
+        month_to = month_to.isoformat()
+        expected = len(text_by_phone(text_path, phone))
+        found, token = 0, None
+        while True:
+            page = ledger.query(phone=phone, limit=500, page_token=token)
+            found += len(page['orders'])
+            token = page['next_page_token']
+            if not token:
+                break
+        assert found == expected, (found, expected)
+        text_totals = text_daily_totals(text_path, month_from, month_to)
+        ledger_totals = ledger.daily_totals(month_from, month_to)
+        assert {d['date']: d['orders'] for d in ledger_totals['days']} == {k: v[0] for k, v in text_totals.items()}
+
+        deep = ledger.query(limit=50)
+        for _ in range(100):
+            deep = ledger.query(limit=50, page_token=deep['next_page_token'])
+        cases = [
+            ('newest page (50)', lambda: text_page(text_path, 50), lambda: ledger.query(limit=50)),
+            ('page 100 (50)', lambda: text_blocks(text_path)[-5050:-5000],
+             lambda: ledger.query(limit=50, page_token=deep['next_page_token'])),
+            (f'by phone ({expected} orders)', lambda: text_by_phone(text_path, phone),
+             lambda: ledger.query(phone=phone, limit=500)),
+            ('daily totals (30 days)', lambda: text_daily_totals(text_path, month_from, month_to),
+             lambda: ledger.daily_totals(month_from, month_to)),
+        ]
+        print(f"\n{'query':>26} {'text scan ms':>13} {'ledger ms':>10} {'speedup':>8}")
+        for name, scan, indexed in cases:
+            scan_ms = timed_ms(scan, args.repeat)
+            indexed_ms = timed_ms(indexed, args.repeat * 20)
+            print(f'{name:>26} {scan_ms:>13.1f} {indexed_ms:>10.3f} {scan_ms / indexed_ms:>7.0f}x')
+
+
+if __name__ == '__main__':
+    main()
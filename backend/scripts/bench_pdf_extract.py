@@ -0,0 +1,85 @@
+"""Benchmark: PDF text extraction pages/sec on a large synthetic PDF.
+
+Compares the old single-core join, the process-pool page streamer, and a
+re-select served from the page cache:
+    cd backend && python scripts/bench_pdf_extract.py --pages 400 --processes 4
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from PyPDF2 import PdfReader  # noqa: E402
+from pdf_extract import PageCache, iter_pdf_pages  # noqa: E402
+
+
+def make_pdf(page_count, lines_per_page=45):
+    """Build a simple text-only PDF (Helvetica, one content stream per page)."""
+    objs = ['<< /Type /Catalog /Pages 2 0 R >>']
+    font_id = 3 + 2 * page_count
+    kids = ' '.join(f'{3 + 2 * i} 0 R' for i in range(page_count))
+    objs.append(f'<< /Type /Pages /Kids [{kids}] /Count {page_count} >>')
+    for p in range(page_count):
+        objs.append(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * p} 0 R '
+                    f'/Resources << /Font << /F1 {font_id} 0 R >> >> >>')
+        lines = ''.join(f'(Halaman {p + 1} baris {n}: Nasi goreng spesial harga Rp {20000 + n * 500}) Tj T* '
+                        for n in range(lines_per_page))
+        stream = f'BT /F1 9 Tf 11 TL 40 760 Td {lines}ET'
+        objs.append(f'<< /Length {len(stream)} >>\nstream\n{stream}\nendstream')
+    objs.append('<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>')
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for i, body in enumerate(objs):
+        offsets.append(len(out))
+        out += f'{i + 1} 0 obj\n{body}\nendobj\n'.encode('latin-1')
+    xref = len(out)
+    out += f'xref\n0 {len(objs) + 1}\n0000000000 65535 f \n'.encode('latin-1')
+    for off in offsets:
+        out += f'{off:010d} 00000 n \n'.encode('latin-1')
+    out += f'trailer\n<< /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode('latin-1')
+    return bytes(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pages', type=int, default=400)
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_pdf_')
+    pdf_path = os.path.join(workdir, 'synthetic.pdf')
+    with open(pdf_path, 'wb') as f:
+        f.write(make_pdf(args.pages))
+    print(f'{args.pages} pages, {os.path.getsize(pdf_path) / 1e6:.1f} MB, {args.processes} processes')
+
+    t = time.perf_counter()
+    reader = PdfReader(pdf_path)
+    baseline = "\n".join(page.extract_text() or "" for page in reader.pages)
+    t_single = time.perf_counter() - t
+
+    with ProcessPoolExecutor(max_workers=args.processes, mp_context=multiprocessing.get_context('spawn')) as pool:
+        # warm the pool so process start-up is not billed to extraction
+        list(pool.map(abs, range(args.processes)))
+        t = time.perf_counter()
+        pages = list(iter_pdf_pages(pdf_path, PageCache(workdir, 'bench'), submit=pool.submit, workers=args.processes))
+        t_pool = time.perf_counter() - t
+    assert "\n".join(pages) == baseline
+
+    t = time.perf_counter()
+    cached = list(iter_pdf_pages(pdf_path, PageCache(workdir, 'bench')))
+    t_cached = time.perf_counter() - t
+    assert cached == pages
+
+    print(f"{'mode':>22} {'seconds':>9} {'pages/sec':>10}")
+    for name, secs in (('single core', t_single), ('process pool', t_pool), ('page cache (reselect)', t_cached)):
+        print(f'{name:>22} {secs:>9.3f} {args.pages / secs:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
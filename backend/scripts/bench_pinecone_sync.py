@@ -0,0 +1,98 @@
+"""Benchmark: full serial Pinecone upserts vs PineconeSync, against InMemoryIndex.
+
+The stand-in index sleeps --latency seconds per request, like a round trip
+to Pinecone. Three builds of one PDF are synced: the first build, the same
+build again, and a rebuild where --changed of the chunks have new text and
+the PDF lost 5% of its chunks. The old code path (serial batches of 100,
+ids chunk_<i>, everything re-sent, nothing deleted) is run on the same
+builds for comparison:
+    cd backend && python scripts/bench_pinecone_sync.py --chunks 5000 --latency 0.05
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pinecone_sync import InMemoryIndex, PineconeSync  # noqa: E402
+
+MODEL = 'text-embedding-3-small'
+
+
+def build(n, dim, changed, rng, base=None):
+    """Chunks and vectors of one build; with ``base``, a rebuild of it."""
+    if base is None:
+        chunks = [{'text': f'chunk {i} ' + 'isi dokumen ' * 20, 'page_start': i // 5 + 1, 'page_end': i // 5 + 1}
+                  for i in range(n)]
+        return chunks, rng.standard_normal((n, dim)).astype(np.float32)
+    chunks, vectors = base
+    keep = int(len(chunks) * 0.95)
+    chunks, vectors = [dict(c) for c in chunks[:keep]], vectors[:keep].copy()
+    for i in rng.choice(keep, int(keep * changed), replace=False):
+        chunks[i]['text'] += ' (revisi)'
+        vectors[i] = rng.standard_normal(vectors.shape[1])
+    return chunks, vectors
+
+
+def old_upsert(index, chunks, vectors):
+    """What build_embeddings_for_chunks used to do after every build."""
+    to_upsert = [(f'chunk_{i}', vec.tolist(), {'text': c['text'], 'id': f'chunk_{i}', 'page_start': c['page_start'],
+                                               'page_end': c['page_end']})
+                 for i, (c, vec) in enumerate(zip(chunks, vectors))]
+    for i in range(0, len(to_upsert), 100):
+        index.upsert(vectors=to_upsert[i:i + 100])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--chunks', type=int, default=5000)
+    parser.add_argument('--dim', type=int, default=256)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--changed', type=float, default=0.1)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    first = build(args.chunks, args.dim, args.changed, rng)
+    builds = [('first build', first), ('same build', first),
+              (f'rebuild, {args.changed:.0%} changed, 5% removed', build(0, 0, args.changed, rng, base=first))]
+    print(f'{args.chunks} chunks x {args.dim} dims, {args.latency * 1000:.0f} ms per request, '
+          f'{args.workers} sync workers')
+    print(f"{'':>34} {'old s':>7} {'reqs':>5} {'stored':>7}   {'sync s':>7} {'reqs':>5} {'stored':>7}  upserted/deleted")
+
+    old_index = InMemoryIndex(args.latency)
+    new_index = InMemoryIndex(args.latency)
+    with tempfile.TemporaryDirectory() as tmp:
+        sync = PineconeSync(os.path.join(tmp, 'pinecone_sync.sqlite'), index=new_index, workers=args.workers)
+        for name, (chunks, vectors) in builds:
+            before = sum(old_index.requests.values())
+            started = time.perf_counter()
+            old_upsert(old_index, chunks, vectors)
+            old_s = time.perf_counter() - started
+            old_reqs = sum(old_index.requests.values()) - before
+
+            before = sum(new_index.requests.values())
+            started = time.perf_counter()
+            result = sync.sync('menu.pdf', chunks, vectors, MODEL)
+            new_s = time.perf_counter() - started
+            new_reqs = sum(new_index.requests.values()) - before
+            print(f'{name:>34} {old_s:>7.2f} {old_reqs:>5} {len(old_index.vectors):>7}   {new_s:>7.2f} {new_reqs:>5} '
+                  f"{len(new_index.vectors):>7}  {result['upserted']}/{result['deleted']}")
+        assert len(new_index.vectors) == len(builds[-1][1][0])
+
+        # a lost sync table: the next sync fetches ids instead of re-sending vectors
+        fresh = PineconeSync(os.path.join(tmp, 'lost.sqlite'), index=new_index, workers=args.workers)
+        before = dict(new_index.requests)
+        started = time.perf_counter()
+        result = fresh.sync('menu.pdf', *builds[-1][1], MODEL)
+        print(f"\nsync with an empty table: {time.perf_counter() - started:.2f} s, "
+              f"{new_index.requests['fetch'] - before['fetch']} fetch + "
+              f"{new_index.requests['upsert'] - before['upsert']} upsert requests, {result}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Benchmark: /search-pdf vector path with and without the query/result caches.
+
+Replays a JSONL query log (one {"q": ..., "k": ...} per line) against a
+resident index, embedding queries through the local OpenAI stub. Without
+--replay, a skewed stream of common customer questions (with case and
+spacing variants) is generated:
+    cd backend && python scripts/bench_search_cache.py --queries 2000 --latency 0.05
+    cd backend && python scripts/bench_search_cache.py --replay queries.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from openai import OpenAI
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from embedding_pipeline import EMBEDDING_MODEL  # noqa: E402
+from index_manager import IndexManager  # noqa: E402
+from openai_stub import start_stub  # noqa: E402
+from query_cache import SearchCache  # noqa: E402
+from vector_store import normalize_rows  # noqa: E402
+
+QUESTIONS = [
+    "harga", "menu", "jam buka", "alamat", "promo hari ini", "ongkir", "harga nasi goreng",
+    "apakah ada menu vegetarian", "metode pembayaran", "berapa lama pengiriman", "menu minuman",
+    "paket keluarga", "cara pesan", "nomor telepon", "apakah buka hari minggu", "menu pedas",
+    "harga es teh", "minimal order", "bisa bayar qris", "lokasi cabang",
+]
+
+
+def generate_traffic(count, seed=0):
+    """Zipf-like popularity over QUESTIONS, with the casing/spacing noise real callers produce."""
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, len(QUESTIONS) + 1)
+    picks = rng.choice(len(QUESTIONS), size=count, p=weights / weights.sum())
+    traffic = []
+    for i in picks:
+        q = QUESTIONS[i]
+        variant = rng.integers(3)
+        if variant == 1:
+            q = q.capitalize()
+        elif variant == 2:
+            q = f" {q}  "
+        traffic.append({"q": q, "k": int(rng.choice([3, 5]))})
+    return traffic
+
+
+def load_traffic(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def run(traffic, manager, client, cache=None):
+    """The /search-pdf vector path; returns per-query latencies in seconds."""
+    latencies = []
+    for req in traffic:
+        q, k = req["q"], int(req.get("k", 3))
+        started = time.perf_counter()
+        snap = manager.current()
+        key = None
+        if cache is not None:
+            key = cache.result_key(q, k, [('bench', snap.version)])
+            if cache.results.get(key) is not None:
+                latencies.append(time.perf_counter() - started)
+                continue
+
+        def embed(text):
+            return client.embeddings.create(model=EMBEDDING_MODEL, input=text).data[0].embedding
+
+        qvec = cache.query_embedding(q, EMBEDDING_MODEL, embed) if cache is not None else embed(q)
+        hits, source = manager.search(qvec, k)
+        response = {'results': [{'score': s, 'text': it['text']} for s, it in hits], 'source': source}
+        if cache is not None:
+            cache.results.put(key, response, time.perf_counter() - started)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--replay', help='JSONL file of {"q": ..., "k": ...} requests')
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--chunks', type=int, default=2000)
+    parser.add_argument('--dim', type=int, default=1536)
+    parser.add_argument('--latency', type=float, default=0.05, help='stub latency per embedding request (s)')
+    args = parser.parse_args()
+
+    traffic = load_traffic(args.replay) if args.replay else generate_traffic(args.queries)
+    server, config, base_url = start_stub(latency=args.latency, dim=args.dim)
+    client = OpenAI(api_key='stub', base_url=base_url, max_retries=0)
+
+    rng = np.random.default_rng(1)
+    vectors = normalize_rows(rng.standard_normal((args.chunks, args.dim)))
+    manager = IndexManager(os.path.join(tempfile.mkdtemp(prefix='bench_search_cache_'), 'vectors'))
+    manager.publish(None, vectors, [f'chunk {i}' for i in range(args.chunks)], EMBEDDING_MODEL)
+
+    print(f"{len(traffic)} queries, {len(set(' '.join(r['q'].casefold().split()) for r in traffic))} distinct, "
+          f"stub latency {args.latency * 1000:.0f} ms")
+    print(f"{'mode':>9} {'p50 ms':>8} {'p99 ms':>8} {'total s':>8} {'api calls':>10}")
+    for name, cache in (('uncached', None), ('cached', SearchCache())):
+        before = config.requests
+        latencies = np.array(run(traffic, manager, client, cache)) * 1000
+        print(f'{name:>9} {np.percentile(latencies, 50):>8.2f} {np.percentile(latencies, 99):>8.2f} '
+              f'{latencies.sum() / 1000:>8.2f} {config.requests - before:>10}')
+        if cache is not None:
+            for part, stats in cache.stats().items():
+                print(f"  {part}: hit ratio {stats['hit_ratio']:.1%}, "
+                      f"avg miss {stats['avg_miss_ms']:.1f} ms, saved {stats['saved_ms'] / 1000:.1f} s")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Benchmark: /search-pdf vector lookup latency, reload-per-query vs. resident IndexManager.
+
+Also times the NumPy fallback scorer (used when FAISS is missing) against the
+old per-item pure-Python cosine loop.
+
+    cd backend && python scripts/bench_search_latency.py --chunks 2000 --queries 300
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import faiss
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from index_manager import IndexManager  # noqa: E402
+from vector_store import top_k  # noqa: E402
+
+
+def python_cosine_scan(items, qvec, k):
+    """The previous JSON fallback: one generator-based cosine per chunk."""
+    def cosine(a, b):
+        dot = sum(x * y for x, y in zip(a, b))
+        na = sum(x * x for x in a) ** 0.5
+        nb = sum(y * y for y in b) ** 0.5
+        return dot / (na * nb) if na and nb else 0
+    scored = sorted(((cosine(qvec, it['embedding']), it) for it in items), key=lambda x: x[0], reverse=True)
+    return scored[:k]
+
+
+def reload_per_query(index_path, meta_path, qvec, k):
+    """The previous _faiss_search: read index and metadata from disk on every call."""
+    index = faiss.read_index(index_path)
+    q = np.array([qvec]).astype('float32')
+    faiss.normalize_L2(q)
+    distances, indices = index.search(q, k)
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        items = json.load(f).get('items', [])
+    return [(float(s), items[i]) for s, i in zip(distances[0], indices[0]) if 0 <= i < len(items)]
+
+
+def percentiles(samples):
+    arr = np.array(samples) * 1000
+    return np.percentile(arr, 50), np.percentile(arr, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--chunks', type=int, default=2000)
+    parser.add_argument('--dim', type=int, default=1536)
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('-k', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.chunks, args.dim)).astype('float32')
+    items = [{'id': f'chunk_{i}', 'text': 'menu ' * 150, 'embedding': vectors[i].tolist()} for i in range(args.chunks)]
+    queries = rng.standard_normal((args.queries, args.dim)).astype('float32')
+
+    workdir = tempfile.mkdtemp(prefix='bench_search_')
+    # the pre-resident layout: a FAISS file plus JSON metadata carrying every vector
+    index_path = os.path.join(workdir, 'embeddings.index')
+    meta_path = os.path.join(workdir, 'embeddings_meta.json')
+    store_dir = os.path.join(workdir, 'vector_store')
+    manager = IndexManager(store_dir)
+
+    index = faiss.IndexFlatIP(args.dim)
+    normalized = vectors.copy()
+    faiss.normalize_L2(normalized)
+    index.add(normalized)
+    faiss.write_index(index, index_path)
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({'items': items}, f)
+    manager.publish(index, normalized, [it['text'] for it in items], 'text-embedding-3-small')
+
+    before = []
+    for q in queries:
+        t = time.perf_counter()
+        reload_per_query(index_path, meta_path, q, args.k)
+        before.append(time.perf_counter() - t)
+
+    # a fresh manager, as another worker would have, pays the load cost once
+    reader = IndexManager(store_dir)
+    after = []
+    for q in queries:
+        t = time.perf_counter()
+        reader.search(q, args.k)
+        after.append(time.perf_counter() - t)
+
+    matrix = reader.current().matrix
+    numpy_times = []
+    for q in queries:
+        t = time.perf_counter()
+        top_k(matrix, q, args.k)
+        numpy_times.append(time.perf_counter() - t)
+    t = time.perf_counter()
+    top_k(matrix, queries, args.k)
+    batch_per_query = (time.perf_counter() - t) / len(queries)
+
+    python_times = []
+    for q in queries[:min(len(queries), 10)]:
+        qlist = q.tolist()
+        t = time.perf_counter()
+        python_cosine_scan(items, qlist, args.k)
+        python_times.append(time.perf_counter() - t)
+
+    b50, b99 = percentiles(before)
+    a50, a99 = percentiles(after[1:])
+    print(f'{args.chunks} chunks x {args.dim} dims, {args.queries} queries, k={args.k}')
+    print(f"{'':>20} {'p50 (ms)':>10} {'p99 (ms)':>10}")
+    print(f"{'reload per query':>20} {b50:>10.3f} {b99:>10.3f}")
+    print(f"{'resident index':>20} {a50:>10.3f} {a99:>10.3f}")
+    n50, n99 = percentiles(numpy_times)
+    p50, p99 = percentiles(python_times)
+    print(f"{'python cosine loop':>20} {p50:>10.3f} {p99:>10.3f}")
+    print(f"{'numpy mmap scorer':>20} {n50:>10.3f} {n99:>10.3f}")
+    print(f'numpy batched scoring: {batch_per_query * 1000:.3f} ms per query')
+    print(f'first query on a fresh worker (includes load): {after[0] * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
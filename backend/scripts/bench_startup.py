@@ -0,0 +1,77 @@
+"""Benchmark: worker cold start, with optional integrations imported eagerly vs lazily.
+
+Each run is a fresh interpreter (as a gunicorn worker is) that imports
+main in a scratch directory and reports the import time and its resident
+memory. "eager" first imports every optional integration the way main.py
+used to at module load; "lazy" imports main alone, then also reports the
+memory after the background warm-up has imported them:
+    cd backend && python scripts/bench_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+CHILD = r'''
+import json, os, sys, time
+sys.path.insert(0, {backend!r})
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+
+started = time.perf_counter()
+if {eager!r}:
+    for name in ('openai', 'faiss', 'PyPDF2', 'pyttsx3', 'pinecone'):
+        try:
+            __import__(name)
+        except Exception:
+            pass
+import main
+result = {{'import_s': time.perf_counter() - started, 'rss_mb': rss_mb()}}
+if not {eager!r}:
+    from capabilities import warmup_names
+    main.capabilities.warm_up(warmup_names('auto', openai_configured=True)).join()
+    result['warm_rss_mb'] = rss_mb()
+print(json.dumps(result))
+'''
+
+
+def run(eager):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, OPENAI_API_KEY='sk-bench', PYTHONDONTWRITEBYTECODE='1')
+        out = subprocess.run([sys.executable, '-c', CHILD.format(backend=os.path.abspath(BACKEND), eager=eager)],
+                             cwd=tmp, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=4, help='workers per server, for the totals')
+    args = parser.parse_args()
+
+    run(False)  # warm the OS file cache so the first measured run is not an outlier
+    results = {'eager': [], 'lazy': []}
+    for _ in range(args.runs):
+        for mode in results:
+            results[mode].append(run(mode == 'eager'))
+    print(f'median of {args.runs} fresh interpreters importing main')
+    print(f"{'':>8} {'import s':>9} {'RSS MB':>8} {'x' + str(args.workers) + ' workers MB':>16}")
+    for mode, runs in results.items():
+        import_s = statistics.median(r['import_s'] for r in runs)
+        rss = statistics.median(r['rss_mb'] for r in runs)
+        print(f'{mode:>8} {import_s:>9.3f} {rss:>8.1f} {rss * args.workers:>16.1f}')
+    warm = statistics.median(r['warm_rss_mb'] for r in results['lazy'])
+    print(f"{'warm':>8} {'':>9} {warm:>8.1f} {warm * args.workers:>16.1f}   (lazy, after the background warm-up)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Benchmark: time-to-first-audio of whole-file vs streamed /synthesize-ssml synthesis.
+
+By default the engine is simulated: it writes silent 16 kHz PCM whose length
+and synthesis time grow with the text (--ms-per-char), like a real engine.
+Pass --real to use pyttsx3 (needs eSpeak on Linux):
+    cd backend && python scripts/bench_tts_stream.py --sentences 5 20 80
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import wave
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from audio_cache import AudioCache, audio_key  # noqa: E402
+from tts_pool import TtsPool, ssml_to_text  # noqa: E402
+from tts_stream import SsmlAudioStream, split_ssml  # noqa: E402
+
+SENTENCES = [
+    "Nasi goreng spesial dengan telur mata sapi dan kerupuk harganya dua puluh lima ribu rupiah.",
+    "Mie ayam bakso tersedia dalam porsi biasa dan porsi jumbo.",
+    "Untuk minuman kami punya es teh manis, es jeruk, dan kopi susu gula aren.",
+    "Paket keluarga berisi empat nasi, dua lauk, dan satu teko teh.",
+]
+
+
+class SimulatedEngine:
+    """pyttsx3-shaped engine: 80 ms of audio and --ms-per-char of work per character."""
+
+    def __init__(self, ms_per_char):
+        self.ms_per_char = ms_per_char
+        self.props = {'rate': 200, 'volume': 1.0, 'voice': 'sim'}
+        self.job = None
+
+    def getProperty(self, name):
+        return self.props[name]
+
+    def setProperty(self, name, value):
+        self.props[name] = value
+
+    def save_to_file(self, text, path):
+        self.job = (text, path)
+
+    def runAndWait(self):
+        text, path = self.job
+        time.sleep(len(text) * self.ms_per_char / 1000)
+        with wave.open(path, 'wb') as out:
+            out.setnchannels(1)
+            out.setsampwidth(2)
+            out.setframerate(16000)
+            out.writeframes(b'\0\0' * int(16000 * 0.08 * len(text)))
+
+
+def build_ssml(count):
+    body = ' '.join(SENTENCES[i % len(SENTENCES)] + f' Nomor {i}.' for i in range(count))
+    return f'<speak><prosody rate="100%">{body}</prosody></speak>'
+
+
+async def whole_file(pool, cache, ssml):
+    """The non-streaming path: synthesize everything, then read it back."""
+    started = time.perf_counter()
+    key = audio_key(ssml, {})
+    await asyncio.wrap_future(pool.submit(key, ssml, {}))
+    f, _ = cache.open(key, record=False)
+    data = f.read()
+    f.close()
+    first = time.perf_counter() - started
+    return first, first, len(data)
+
+
+async def streamed(pool, cache, ssml):
+    started = time.perf_counter()
+    stream = SsmlAudioStream(pool, cache, split_ssml(ssml), {}, timeout=600)
+    await stream.start()
+    first, size = None, 0
+    async for chunk in stream.frames():
+        if first is None:
+            first = time.perf_counter() - started
+        size += len(chunk)
+    return first, time.perf_counter() - started, size
+
+
+def measure(run, pool, cache, ssml):
+    cache.clear()
+    tracemalloc.start()
+    first, total, size = asyncio.run(run(pool, cache, ssml))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first, total, size, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sentences', type=int, nargs='+', default=[5, 20, 80])
+    parser.add_argument('--engines', type=int, default=2)
+    parser.add_argument('--ms-per-char', type=float, default=1.0)
+    parser.add_argument('--real', action='store_true', help='use pyttsx3 instead of the simulated engine')
+    args = parser.parse_args()
+
+    cache = AudioCache(os.path.join(tempfile.mkdtemp(prefix='bench_tts_'), 'audio'))
+    pool = TtsPool(cache, size=args.engines)
+    if not args.real:
+        pool.engine_factory = lambda: SimulatedEngine(args.ms_per_char)
+
+    print(f"{'sentences':>9} {'chars':>7} {'mode':>8} {'first ms':>9} {'total ms':>9} {'audio MB':>9} {'peak MB':>8}")
+    for count in args.sentences:
+        ssml = build_ssml(count)
+        for name, run in (('whole', whole_file), ('streamed', streamed)):
+            first, total, size, peak = measure(run, pool, cache, ssml)
+            print(f'{count:>9} {len(ssml_to_text(ssml)):>7} {name:>8} {first * 1000:>9.0f} {total * 1000:>9.0f} '
+                  f'{size / 1e6:>9.1f} {peak / 1e6:>8.1f}')
+    pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()
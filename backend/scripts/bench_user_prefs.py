@@ -0,0 +1,133 @@
+"""Benchmark: user preferences in one JSON file vs UserPrefsStore, as users grow.
+
+For each user count it times a save and a read of one random user with the
+old whole-file approach and with the store (cold read from SQLite, cached
+read, and a bulk get of 100 users), then runs concurrent saves from several
+processes against both to count lost updates:
+    cd backend && python scripts/bench_user_prefs.py --users 1000 10000 100000
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from user_prefs import UserPrefsStore  # noqa: E402
+
+
+def prefs_for(i):
+    return {'voice': 'id-ID', 'rate': 150 + i % 50, 'volume': 0.8, 'language': 'id', 'last_pdf': f'pdf-{i % 30}'}
+
+
+# the handlers as they were: parse the whole file, rewrite it for one save
+def json_save(path, user_id, prefs):
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            allp = json.load(f)
+    else:
+        allp = {}
+    allp[user_id] = prefs
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(allp, f, ensure_ascii=False, indent=2)
+
+
+def json_get(path, user_id):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f).get(user_id, {})
+
+
+def timed_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+
+def json_writer(path, worker, saves):
+    for i in range(saves):
+        try:
+            json_save(path, f'w{worker}-{i}', prefs_for(i))
+        except ValueError:
+            # read the file mid-rewrite; the old handler answered 500 and the save was gone
+            pass
+
+
+def store_writer(path, worker, saves):
+    store = UserPrefsStore(path)
+    for i in range(saves):
+        store.set(f'w{worker}-{i}', prefs_for(i))
+
+
+def lost_updates(target, path, workers, saves):
+    procs = [multiprocessing.Process(target=target, args=(path, w, saves)) for w in range(workers)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    if path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            try:
+                kept = len(json.load(f))
+            except ValueError:
+                return 'file corrupted'
+    else:
+        kept = UserPrefsStore(path).stats()['users']
+    return f'{workers * saves - kept} of {workers * saves} lost'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, nargs='*', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--saves', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'users':>8} {'json save':>10} {'json get':>9} {'store save':>11} {'cold get':>9} "
+          f"{'cached get':>11} {'bulk 100':>9}   (ms, median)")
+    for n in args.users:
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path = os.path.join(tmp, 'user_prefs.json')
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump({f'user-{i}': prefs_for(i) for i in range(n)}, f, ensure_ascii=False, indent=2)
+            store = UserPrefsStore(os.path.join(tmp, 'user_prefs.sqlite'), cache_size=1000)
+            store.import_json(json_path)
+
+            repeat = max(3, args.repeat if n <= 10000 else args.repeat // 4)
+            json_save_ms = timed_ms(lambda: json_save(json_path, f'user-{rng.randrange(n)}', prefs_for(1)), repeat)
+            json_get_ms = timed_ms(lambda: json_get(json_path, f'user-{rng.randrange(n)}'), repeat)
+            save_ms = timed_ms(lambda: store.set(f'user-{rng.randrange(n)}', prefs_for(2)), args.repeat * 10)
+            # users outside the cache: each read goes to SQLite
+            cold_ms = timed_ms(lambda: store.get(f'user-{rng.randrange(n)}'), args.repeat * 10)
+            store.get('user-0')
+            cached_ms = timed_ms(lambda: store.get('user-0'), args.repeat * 10)
+            bulk_ms = timed_ms(lambda: store.get_many([f'user-{rng.randrange(n)}' for _ in range(100)]), args.repeat)
+            print(f'{n:>8} {json_save_ms:>10.2f} {json_get_ms:>9.2f} {save_ms:>11.3f} {cold_ms:>9.3f} '
+                  f'{cached_ms:>11.4f} {bulk_ms:>9.3f}')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f'\n{args.workers} processes x {args.saves} saves of distinct users')
+        print(f"  json file  {lost_updates(json_writer, os.path.join(tmp, 'user_prefs.json'), args.workers, args.saves)}")
+        print(f"  store      {lost_updates(store_writer, os.path.join(tmp, 'user_prefs.sqlite'), args.workers, args.saves)}")
+
+        # a save in one process is seen by another's next read
+        path = os.path.join(tmp, 'shared.sqlite')
+        a, b = UserPrefsStore(path), UserPrefsStore(path)
+        a.set('u', {'rate': 1})
+        assert b.get('u') == {'rate': 1}
+        a.set('u', {'rate': 2})
+        assert b.get('u') == {'rate': 2}, 'stale cached prefs'
+        print('  cross-worker invalidation ok')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Check: do all gunicorn workers agree on the selected PDF?
+
+Runs the app under gunicorn with several workers, seeds a few text-only
+PDFs, then repeatedly selects one through /select-pdf and reads
+/current-pdf, /list-pdfs and /pdf-text over fresh connections, so the reads
+land on different workers. Every read must report the latest selection:
+    cd backend && python scripts/check_shared_state.py --workers 4 --rounds 20
+
+Pass --app-dir to run the same check against another checkout of backend/.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pdf_registry import PdfRegistry  # noqa: E402
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(SCRIPTS_DIR, '..')
+
+
+def seed(workdir, count):
+    os.makedirs(os.path.join(workdir, 'uploaded_pdfs'))
+    registry = PdfRegistry(os.path.join(workdir, 'pdf_indexes'))
+    pdf_ids = []
+    for i in range(count):
+        pdf_id = f'{i:08d}-0000-0000-0000-000000000000_menu_{i}.pdf'
+        open(os.path.join(workdir, 'uploaded_pdfs', pdf_id), 'wb').close()
+        with registry.text_writer(pdf_id) as out:
+            out.write(f'Menu {i}: nasi goreng, mie ayam, es teh.')
+        pdf_ids.append(pdf_id)
+    return pdf_ids
+
+
+def read_selection(base, pdf_id):
+    """One read of each endpoint on a new connection; returns the ones that disagree."""
+    wrong = []
+    with httpx.Client(base_url=base, timeout=10) as http:
+        if http.get('/current-pdf').json().get('id') != pdf_id:
+            wrong.append('/current-pdf')
+    with httpx.Client(base_url=base, timeout=10) as http:
+        selected = [p['id'] for p in http.get('/list-pdfs').json()['pdfs'] if p['selected']]
+        if selected != [pdf_id]:
+            wrong.append('/list-pdfs')
+    with httpx.Client(base_url=base, timeout=10) as http:
+        if f"Menu {pdf_id[:8].lstrip('0') or '0'}:" not in http.get('/pdf-text').json()['text']:
+            wrong.append('/pdf-text')
+    return wrong
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--app-dir', default=BACKEND_DIR)
+    parser.add_argument('--port', type=int, default=8797)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--rounds', type=int, default=20, help='selections to make')
+    parser.add_argument('--reads', type=int, default=20, help='reads of each endpoint per selection')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='check_shared_state_')
+    pdf_ids = seed(workdir, 4)
+    env = dict(os.environ, OPENAI_API_KEY='', PYTHONPATH=os.path.abspath(args.app_dir))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-w', str(args.workers), '-k', 'uvicorn.workers.UvicornWorker',
+         'main:app', '--bind', f'127.0.0.1:{args.port}', '--log-level', 'warning'],
+        cwd=workdir, env=env)
+    base = f'http://127.0.0.1:{args.port}'
+    reads = mismatches = 0
+    by_endpoint = {}
+    try:
+        for _ in range(100):
+            try:
+                httpx.get(f'{base}/list-pdfs', timeout=1)
+                break
+            except httpx.HTTPError:
+                time.sleep(0.2)
+        time.sleep(1.0)  # let every worker finish booting
+        for round_no in range(args.rounds):
+            pdf_id = pdf_ids[round_no % len(pdf_ids)]
+            resp = httpx.post(f'{base}/select-pdf', json={'pdf_id': pdf_id}, timeout=10)
+            resp.raise_for_status()
+            for _ in range(args.reads):
+                wrong = read_selection(base, pdf_id)
+                reads += 3
+                mismatches += len(wrong)
+                for endpoint in wrong:
+                    by_endpoint[endpoint] = by_endpoint.get(endpoint, 0) + 1
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f'{args.workers} workers, {args.rounds} selections, {reads} reads: {mismatches} disagreed with the selection')
+    for endpoint, count in sorted(by_endpoint.items()):
+        print(f'  {endpoint}: {count}')
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
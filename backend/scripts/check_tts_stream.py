@@ -0,0 +1,147 @@
+"""Check: do overlapping segments of a streamed /synthesize-ssml all produce audio?
+
+SsmlAudioStream hands up to ``lookahead`` segments to the TTS pool at once,
+so with more than one engine thread they are synthesized at the same time.
+The check streams multi-sentence SSML and compares the PCM it received with
+the audio of every segment in the cache; a missing or failed segment makes
+the stream shorter. Engines are wrapped to count overlapping syntheses and
+to fail like pyttsx3 ("run loop already started") when one engine is run
+from two threads at once. --shared gives every thread the same engine, as
+``pyttsx3.init()`` did, to show the failure the check catches:
+    cd backend && python scripts/check_tts_stream.py --engines 2 --rounds 10
+    cd backend && python scripts/check_tts_stream.py --engines 2 --shared
+Pass --real to use pyttsx3 (needs eSpeak on Linux).
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import wave
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from audio_cache import AudioCache, audio_key  # noqa: E402
+from bench_tts_stream import SimulatedEngine, build_ssml  # noqa: E402
+from tts_pool import TtsPool, _default_engine  # noqa: E402
+from tts_stream import SsmlAudioStream, split_ssml  # noqa: E402
+
+
+class Overlap:
+    """Counts syntheses running at once, across every engine."""
+
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def enter(self):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+
+    def exit(self):
+        with self._lock:
+            self.running -= 1
+
+
+class TrackedEngine:
+    """Wraps a pyttsx3-shaped engine; refuses to run it from two threads at once."""
+
+    def __init__(self, engine, overlap):
+        self.engine = engine
+        self.overlap = overlap
+        self._busy = False
+        self._lock = threading.Lock()
+
+    def getProperty(self, name):
+        return self.engine.getProperty(name)
+
+    def setProperty(self, name, value):
+        self.engine.setProperty(name, value)
+
+    def save_to_file(self, text, path):
+        self.engine.save_to_file(text, path)
+
+    def runAndWait(self):
+        with self._lock:
+            if self._busy:
+                raise RuntimeError('run loop already started')
+            self._busy = True
+        self.overlap.enter()
+        try:
+            self.engine.runAndWait()
+        finally:
+            self.overlap.exit()
+            with self._lock:
+                self._busy = False
+
+
+def segment_bytes(cache, key):
+    """PCM bytes of one segment's cached audio, or 0 if it is not there."""
+    opened = cache.open(key, record=False)
+    if opened is None:
+        return 0
+    with opened[0] as f, wave.open(f, 'rb') as reader:
+        return len(reader.readframes(reader.getnframes()))
+
+
+async def stream_once(pool, cache, segments):
+    stream = SsmlAudioStream(pool, cache, segments, {}, timeout=60)
+    await stream.start()
+    chunks = [chunk async for chunk in stream.frames()]
+    # the first chunk is the WAV header
+    return sum(len(c) for c in chunks[1:])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--engines', type=int, default=2)
+    parser.add_argument('--sentences', type=int, default=4)
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--ms-per-char', type=float, default=1.0)
+    parser.add_argument('--shared', action='store_true', help='one engine for every thread, like pyttsx3.init()')
+    parser.add_argument('--real', action='store_true', help='use pyttsx3 instead of the simulated engine')
+    args = parser.parse_args()
+
+    overlap = Overlap()
+    make = _default_engine if args.real else (lambda: SimulatedEngine(args.ms_per_char))
+    if args.shared:
+        shared = TrackedEngine(make(), overlap)
+        factory = lambda: shared  # noqa: E731
+    else:
+        factory = lambda: TrackedEngine(make(), overlap)  # noqa: E731
+
+    cache = AudioCache(os.path.join(tempfile.mkdtemp(prefix='check_tts_stream_'), 'audio'))
+    pool = TtsPool(cache, size=args.engines, engine_factory=factory)
+    short = 0
+    try:
+        for round_no in range(args.rounds):
+            cache.clear()
+            # a different text each round, so nothing is served from the cache
+            segments = split_ssml(build_ssml(args.sentences).replace('Nomor', f'Putaran {round_no} nomor'))
+            try:
+                streamed = asyncio.run(stream_once(pool, cache, segments))
+            except Exception as e:
+                # the first segment failed, so the stream never started
+                print(f'  round {round_no}: {e}')
+                streamed = 0
+            sizes = [segment_bytes(cache, audio_key(s, {})) for s in segments]
+            missing = sizes.count(0)
+            if missing or streamed != sum(sizes):
+                short += 1
+                print(f'  round {round_no}: streamed {streamed} of {sum(sizes)} PCM bytes, '
+                      f'{missing} of {len(segments)} segments without audio')
+    finally:
+        pool.shutdown()
+
+    stats = pool.stats()
+    print(f'{args.engines} engines{" (shared)" if args.shared else ""}, {args.rounds} streams of '
+          f'{len(segments)} segments: {short} incomplete, {stats["failures"]} failed syntheses, '
+          f'up to {overlap.peak} at once')
+    sys.exit(1 if short or stats['failures'] else 0)
+
+
+if __name__ == '__main__':
+    main()
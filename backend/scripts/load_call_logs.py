@@ -0,0 +1,112 @@
+"""Load test: many writers appending to the same call sessions at once.
+
+Runs the old read-modify-rewrite JSON logging and the append-only store
+side by side, then checks every message made it into the log:
+    cd backend && python scripts/load_call_logs.py --processes 4 --threads 4 --messages 250
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from call_log_store import CallLogStore  # noqa: E402
+
+
+def legacy_append(root, session_id, message):
+    """The per-message logic /log-conversation used before the event log."""
+    log_file = os.path.join(root, f"{session_id}.json")
+    if os.path.exists(log_file):
+        try:
+            with open(log_file, "r", encoding="utf-8") as f:
+                log_data = json.load(f)
+        except ValueError:
+            # another writer truncated the file mid-rewrite
+            log_data = None
+    else:
+        log_data = None
+    if log_data is None:
+        log_data = {"session_id": session_id, "start_time": datetime.now().isoformat(),
+                    "messages": [], "session_stats": {"total_messages": 0, "keywords_detected": []}}
+    log_data["messages"].append(message)
+    log_data["session_stats"]["total_messages"] += 1
+    with open(log_file, "w", encoding="utf-8") as f:
+        json.dump(log_data, f, ensure_ascii=False, indent=2)
+
+
+def store_append(root, session_id, message):
+    CallLogStore(root).append(session_id, message=message, count_message=True)
+
+
+def writer(mode, root, sessions, threads, messages, worker):
+    append = legacy_append if mode == 'legacy' else store_append
+
+    def run(thread):
+        for n in range(messages):
+            session_id = sessions[n % len(sessions)]
+            append(root, session_id, {"type": "user", "message": f"w{worker}t{thread} pesan {n}",
+                                      "timestamp": datetime.now().isoformat()})
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(run, range(threads)))
+
+
+def count_messages(mode, root, sessions):
+    total = 0
+    for session_id in sessions:
+        if mode == 'legacy':
+            try:
+                with open(os.path.join(root, f"{session_id}.json"), "r", encoding="utf-8") as f:
+                    total += len(json.load(f)["messages"])
+            except ValueError:
+                pass
+        else:
+            log = CallLogStore(root).get(session_id)
+            total += len(log["messages"]) if log else 0
+    return total
+
+
+def run_mode(mode, args):
+    root = tempfile.mkdtemp(prefix=f'load_{mode}_')
+    sessions = [f'session-{i}' for i in range(args.sessions)]
+    ctx = multiprocessing.get_context('spawn')
+    procs = [ctx.Process(target=writer, args=(mode, root, sessions, args.threads, args.messages, w))
+             for w in range(args.processes)]
+    t = time.perf_counter()
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - t
+    expected = args.processes * args.threads * args.messages
+    return expected, count_messages(mode, root, sessions), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--messages', type=int, default=250, help='messages per thread')
+    parser.add_argument('--sessions', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{args.processes} processes x {args.threads} threads x {args.messages} messages "
+          f"into {args.sessions} sessions")
+    print(f"{'mode':>8} {'sent':>7} {'logged':>7} {'lost':>6} {'seconds':>8} {'msgs/sec':>9}")
+    ok = True
+    for mode in ('legacy', 'store'):
+        expected, logged, elapsed = run_mode(mode, args)
+        print(f'{mode:>8} {expected:>7} {logged:>7} {expected - logged:>6} {elapsed:>8.2f} {expected / elapsed:>9.0f}')
+        if mode == 'store' and logged != expected:
+            ok = False
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
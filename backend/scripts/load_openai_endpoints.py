@@ -0,0 +1,157 @@
+"""Load test: do slow OpenAI calls stall unrelated requests?
+
+Starts the local OpenAI stub (slow chat completions, fast embeddings), seeds
+an indexed PDF, and runs the app under uvicorn pointed at the stub. It then
+floods /analyze-emotion while measuring /search-pdf (a fresh query every
+time, so each one embeds) and /call-logs:
+    cd backend && python scripts/load_openai_endpoints.py --emotion 200 --search 200 --chat-latency 3
+
+Pass --app-dir to run the same load against another checkout of backend/.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from embedding_pipeline import EMBEDDING_MODEL  # noqa: E402
+from pdf_registry import PdfRegistry  # noqa: E402
+from vector_store import normalize_rows  # noqa: E402
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(SCRIPTS_DIR, '..')
+PDF_ID = 'load_menu.pdf'
+
+
+def seed(workdir, chunks, dim):
+    os.makedirs(os.path.join(workdir, 'uploaded_pdfs'))
+    open(os.path.join(workdir, 'uploaded_pdfs', PDF_ID), 'wb').close()
+    registry = PdfRegistry(os.path.join(workdir, 'pdf_indexes'))
+    texts = [f'menu item {i}' for i in range(chunks)]
+    with registry.text_writer(PDF_ID) as out:
+        out.write('\n'.join(texts))
+    vectors = normalize_rows(np.random.default_rng(0).standard_normal((chunks, dim)))
+    registry.manager(PDF_ID).publish(None, vectors, texts, EMBEDDING_MODEL)
+
+
+async def timed_get(http, url, params, samples):
+    started = time.perf_counter()
+    resp = await http.get(url, params=params)
+    samples.append((time.perf_counter() - started, resp.status_code))
+
+
+async def timed_post(http, url, payload, samples):
+    started = time.perf_counter()
+    resp = await http.post(url, json=payload)
+    samples.append((time.perf_counter() - started, resp.status_code))
+
+
+async def flood(base, count):
+    async with httpx.AsyncClient(base_url=base, timeout=120, limits=httpx.Limits(max_connections=count)) as http:
+        samples = []
+        await asyncio.gather(*(timed_post(http, '/analyze-emotion', {'text': f'terima kasih {i}'}, samples)
+                               for i in range(count)))
+        return samples
+
+
+def run_flood(base, count, results):
+    results.put(asyncio.run(flood(base, count)))
+
+
+async def measure(base, args):
+    async with httpx.AsyncClient(base_url=base, timeout=120) as http:
+        search, logs = [], []
+        sem = asyncio.Semaphore(args.concurrency)
+
+        async def one_search(i):
+            async with sem:
+                await timed_get(http, '/search-pdf', {'q': f'harga menu nomor {i}', 'pdf_id': PDF_ID}, search)
+                await timed_get(http, '/call-logs', {'limit': 10}, logs)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one_search(i) for i in range(args.search)))
+        return search, logs, time.perf_counter() - started
+
+
+def drive(base, args):
+    # the flood comes from its own process, so its 100s of open requests do
+    # not slow down the client that is taking the measurements
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    flooder = ctx.Process(target=run_flood, args=(base, args.emotion, results))
+    flooder.start()
+    time.sleep(1.0)
+    search, logs, wall = asyncio.run(measure(base, args))
+    emotion = results.get()
+    flooder.join()
+    return emotion, search, logs, wall
+
+
+def report(name, samples):
+    secs = np.array([s for s, _ in samples]) * 1000
+    ok = sum(1 for _, status in samples if status == 200)
+    print(f'{name:>16} {len(samples):>6} {ok:>6} {np.percentile(secs, 50):>9.1f} {np.percentile(secs, 99):>9.1f} '
+          f'{secs.max():>9.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--app-dir', default=BACKEND_DIR)
+    parser.add_argument('--port', type=int, default=8796)
+    parser.add_argument('--stub-port', type=int, default=8556)
+    parser.add_argument('--emotion', type=int, default=200, help='concurrent /analyze-emotion requests')
+    parser.add_argument('--search', type=int, default=200, help='/search-pdf requests during the flood')
+    parser.add_argument('--concurrency', type=int, default=20, help='concurrent /search-pdf clients')
+    parser.add_argument('--chat-latency', type=float, default=3.0)
+    parser.add_argument('--latency', type=float, default=0.05, help='stub embedding latency (s)')
+    parser.add_argument('--dim', type=int, default=1536)
+    args = parser.parse_args()
+
+    # the stub gets its own process so its work does not skew the client's timings
+    stub = subprocess.Popen([sys.executable, os.path.join(SCRIPTS_DIR, 'openai_stub.py'), '--port', str(args.stub_port),
+                             '--latency', str(args.latency), '--dim', str(args.dim),
+                             '--chat-latency', str(args.chat_latency)], stdout=subprocess.DEVNULL)
+    stub_url = f'http://127.0.0.1:{args.stub_port}/v1'
+    workdir = tempfile.mkdtemp(prefix='load_openai_')
+    seed(workdir, 2000, args.dim)
+    env = dict(os.environ, OPENAI_API_KEY='stub', OPENAI_BASE_URL=stub_url, PYTHONPATH=os.path.abspath(args.app_dir))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(args.port), '--log-level', 'warning'],
+        cwd=workdir, env=env)
+    base = f'http://127.0.0.1:{args.port}'
+    try:
+        for url in (f'{stub_url}/stats', f'{base}/list-pdfs'):
+            for _ in range(100):
+                try:
+                    httpx.get(url, timeout=1)
+                    break
+                except httpx.HTTPError:
+                    time.sleep(0.2)
+        emotion, search, logs, wall = drive(base, args)
+        stats = httpx.get(f'{stub_url}/stats').json()
+    finally:
+        server.terminate()
+        server.wait()
+        stub.terminate()
+        stub.wait()
+
+    print(f'{args.emotion} /analyze-emotion at {args.chat_latency:.1f}s upstream latency, '
+          f'{args.search} /search-pdf + /call-logs alongside ({args.concurrency} concurrent)')
+    print(f"{'endpoint':>16} {'reqs':>6} {'200s':>6} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    report('/analyze-emotion', emotion)
+    report('/search-pdf', search)
+    report('/call-logs', logs)
+    print(f'search throughput during flood: {args.search / wall:.1f} req/s; '
+          f"stub saw {stats['chat_requests']} chat and {stats['requests']} embedding requests")
+
+
+if __name__ == '__main__':
+    main()
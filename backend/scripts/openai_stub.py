@@ -0,0 +1,147 @@
+"""Local stand-in for the OpenAI embeddings and chat endpoints, for benchmarks and load tests.
+
+Run standalone:  python scripts/openai_stub.py --port 8555 --latency 0.05
+Then point the backend at it with OPENAI_BASE_URL=http://127.0.0.1:8555/v1
+"""
+import argparse
+import hashlib
+import json
+import random
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_embedding(text, dim):
+    """Deterministic pseudo-embedding derived from the text hash."""
+    seed = struct.unpack('<Q', hashlib.sha256(text.encode('utf-8')).digest()[:8])[0]
+    rng = random.Random(seed)
+    return [rng.uniform(-1.0, 1.0) for _ in range(dim)]
+
+
+class StubConfig:
+    def __init__(self, latency=0.05, per_input_latency=0.0005, dim=1536, rate_limit_every=0,
+                 chat_latency=0.3, chat_reply='{"emotion": "neutral", "pitch": 1.0, "rate": 1.0}'):
+        self.latency = latency
+        self.chat_latency = chat_latency
+        self.chat_reply = chat_reply
+        self.per_input_latency = per_input_latency
+        self.dim = dim
+        # return HTTP 429 on every Nth request (0 disables)
+        self.rate_limit_every = rate_limit_every
+        self.requests = 0
+        self.inputs = 0
+        self.rate_limited = 0
+        self.chat_requests = 0
+        self.lock = threading.Lock()
+
+
+def make_handler(config):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body, headers=None):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip('/').endswith('/stats'):
+                with config.lock:
+                    self._send(200, {'requests': config.requests, 'inputs': config.inputs,
+                                     'rate_limited': config.rate_limited, 'chat_requests': config.chat_requests})
+                return
+            self._send(404, {'error': {'message': f'Unknown path {self.path}'}})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            if self.path.endswith('/chat/completions'):
+                self._chat(payload)
+                return
+            if not self.path.endswith('/embeddings'):
+                self._send(404, {'error': {'message': f'Unknown path {self.path}'}})
+                return
+
+            inputs = payload.get('input', [])
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            with config.lock:
+                config.requests += 1
+                limited = config.rate_limit_every and config.requests % config.rate_limit_every == 0
+                if limited:
+                    config.rate_limited += 1
+                else:
+                    config.inputs += len(inputs)
+            if limited:
+                self._send(429, {'error': {'message': 'Rate limit reached', 'type': 'requests'}},
+                           headers={'retry-after': '0.05'})
+                return
+
+            time.sleep(config.latency + config.per_input_latency * len(inputs))
+            data = [{'object': 'embedding', 'index': i, 'embedding': fake_embedding(t, config.dim)}
+                    for i, t in enumerate(inputs)]
+            tokens = sum(len(t) // 4 for t in inputs)
+            self._send(200, {
+                'object': 'list',
+                'data': data,
+                'model': payload.get('model', 'text-embedding-3-small'),
+                'usage': {'prompt_tokens': tokens, 'total_tokens': tokens},
+            })
+
+        def _chat(self, payload):
+            with config.lock:
+                config.chat_requests += 1
+            time.sleep(config.chat_latency)
+            self._send(200, {
+                'id': 'chatcmpl-stub',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': payload.get('model', 'gpt-3.5-turbo'),
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': config.chat_reply}}],
+                'usage': {'prompt_tokens': 10, 'completion_tokens': 10, 'total_tokens': 20},
+            })
+
+    return Handler
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # the default listen backlog of 5 drops SYNs under load tests, adding 1-3s retransmit stalls
+    request_queue_size = 256
+
+
+def start_stub(port=0, **kwargs):
+    """Start the stub on a background thread. Returns (server, config, base_url)."""
+    config = StubConfig(**kwargs)
+    server = _StubServer(('127.0.0.1', port), make_handler(config))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}/v1'
+    return server, config, base_url
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=8555)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--dim', type=int, default=1536)
+    parser.add_argument('--rate-limit-every', type=int, default=0)
+    parser.add_argument('--chat-latency', type=float, default=0.3)
+    args = parser.parse_args()
+    server, _, url = start_stub(args.port, latency=args.latency, dim=args.dim, rate_limit_every=args.rate_limit_every,
+                                chat_latency=args.chat_latency)
+    print(f'OpenAI stub listening on {url}')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,114 @@
+"""Small key/value state shared by every gunicorn worker (SQLite, WAL).
+
+Each worker keeps the whole table in memory. Before a read it asks SQLite
+for ``PRAGMA data_version``, which changes only when another connection has
+committed; that check is served from the WAL index in shared memory, so the
+table itself is only re-read after some worker actually changed it.
+"""
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger("call-agent-api")
+
+
+class SharedState:
+    """JSON values by key, visible to all processes that open the same file.
+
+    ``watch(key, callback)`` registers ``callback(value)`` to run in this
+    process whenever ``key`` changes, whichever worker changed it; it runs
+    on the next read after the change.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS state ('
+            ' key TEXT PRIMARY KEY, value TEXT NOT NULL, version INTEGER NOT NULL, updated REAL NOT NULL)'
+        )
+        self._values = {}
+        self._versions = {}
+        self._watchers = {}
+        self._data_version = None
+        self.reloads = 0
+        self._refresh()
+
+    def _load(self):
+        rows = self._conn.execute('SELECT key, value, version FROM state').fetchall()
+        changed = [key for key, _, version in rows if self._versions.get(key) != version]
+        changed += [key for key in self._versions if key not in {row[0] for row in rows}]
+        self._values = {key: json.loads(value) for key, value, _ in rows}
+        self._versions = {key: version for key, _, version in rows}
+        self.reloads += 1
+        return changed
+
+    def _refresh(self):
+        """Reload if another connection committed; returns the keys that changed."""
+        data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+        if data_version == self._data_version:
+            return []
+        self._data_version = data_version
+        return self._load()
+
+    def _notify(self, keys):
+        for key in keys:
+            for callback in self._watchers.get(key, ()):
+                try:
+                    callback(self._values.get(key))
+                except Exception as e:
+                    logger.warning(f"Shared state watcher for {key} failed: {e}")
+
+    def get(self, key, default=None):
+        with self._lock:
+            changed = self._refresh()
+            value = self._values.get(key, default)
+        self._notify(changed)
+        return value
+
+    def version(self, key):
+        """How many times ``key`` has been set (0 if never)."""
+        with self._lock:
+            changed = self._refresh()
+            version = self._versions.get(key, 0)
+        self._notify(changed)
+        return version
+
+    def set(self, key, value):
+        """Store ``value`` (JSON-serializable) and return the key's new version."""
+        encoded = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute('SELECT version FROM state WHERE key = ?', (key,)).fetchone()
+                version = (row[0] if row else 0) + 1
+                self._conn.execute(
+                    'INSERT INTO state (key, value, version, updated) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT(key) DO UPDATE SET value = excluded.value, version = excluded.version,'
+                    ' updated = excluded.updated',
+                    (key, encoded, version, time.time()))
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            # our own commits do not move data_version, so apply everything that
+            # other workers wrote meanwhile, plus this write; read the version
+            # first so a commit that lands during the load is seen next time
+            self._data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+            changed = self._load()
+        self._notify(changed)
+        return version
+
+    def watch(self, key, callback):
+        with self._lock:
+            self._watchers.setdefault(key, []).append(callback)
+
+    def stats(self):
+        with self._lock:
+            return {'keys': len(self._values), 'reloads': self.reloads,
+                    'versions': dict(self._versions)}
@@ -0,0 +1,202 @@
+"""Long-lived pyttsx3 engines, each owned by a dedicated worker thread.
+
+pyttsx3 engines are not safe to share between threads, and building one
+costs tens of milliseconds (it loads the driver and voice list). Each worker
+thread builds its own engine with ``pyttsx3.Engine`` (``pyttsx3.init()``
+would hand every thread the same cached engine), keeps it, and takes jobs
+from a shared queue. Audio is synthesized straight into an ``AudioCache``
+temp file and committed under its cache key, so the caller streams the
+result from the cache.
+"""
+import os
+import re
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from capabilities import capabilities
+
+logger = logging.getLogger("call-agent-api")
+
+# eSpeak, the Linux driver, routes audio through one process-wide callback,
+# so separate engines in one process still collide: raise this only with a
+# driver whose engines are independent
+TTS_POOL_SIZE = int(os.getenv('TTS_POOL_SIZE', '1'))
+# synthesis requests waiting for an engine beyond this are refused
+TTS_MAX_QUEUE = int(os.getenv('TTS_MAX_QUEUE', '64'))
+# how long a request waits for its audio before falling back to returning SSML
+TTS_TIMEOUT = float(os.getenv('TTS_TIMEOUT', '30'))
+# after an engine fails to start, wait this long before trying again
+TTS_ENGINE_RETRY_SECONDS = 30.0
+
+_TAG = re.compile(r'<[^>]+>')
+_ENTITIES = (('&lt;', '<'), ('&gt;', '>'), ('&quot;', '"'), ('&apos;', "'"), ('&amp;', '&'))
+
+
+class TtsBusy(Exception):
+    """The synthesis queue is full."""
+
+
+def ssml_to_text(ssml):
+    """pyttsx3 does not speak SSML; drop the tags and unescape the text."""
+    plain = _TAG.sub('', ssml)
+    for entity, char in _ENTITIES:
+        plain = plain.replace(entity, char)
+    return plain
+
+
+def _default_engine():
+    # not init(): it caches one engine per driver and returns it to every caller
+    return capabilities.lazy('pyttsx3').Engine()
+
+
+class _Worker(threading.Thread):
+    def __init__(self, pool, index):
+        super().__init__(name=f'tts-{index}', daemon=True)
+        self.pool = pool
+        self.engine = None
+        self.defaults = {}
+        self._retry_at = 0.0
+
+    def _ensure_engine(self):
+        if self.engine is not None:
+            return self.engine
+        if time.monotonic() < self._retry_at:
+            raise RuntimeError('TTS engine unavailable')
+        try:
+            engine = self.pool.engine_factory()
+        except Exception:
+            self._retry_at = time.monotonic() + TTS_ENGINE_RETRY_SECONDS
+            raise
+        self.defaults = {name: engine.getProperty(name) for name in ('rate', 'volume', 'voice')}
+        self.engine = engine
+        return engine
+
+    def _synthesize(self, key, ssml, settings):
+        cache = self.pool.cache
+        if key in cache:
+            # another request or worker process finished it first
+            return key
+        engine = self._ensure_engine()
+        # the engine outlives the request: reset what the last job changed
+        for name, value in self.defaults.items():
+            engine.setProperty(name, settings.get(name, value))
+        tmp = cache.temp_path()
+        try:
+            engine.save_to_file(ssml_to_text(ssml), tmp)
+            engine.runAndWait()
+            if not os.path.exists(tmp) or os.path.getsize(tmp) == 0:
+                raise RuntimeError('TTS engine produced no audio')
+            cache.commit(tmp, key)
+        except Exception:
+            try:
+                os.remove(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+        return key
+
+    def run(self):
+        while True:
+            job = self.pool._jobs.get()
+            if job is None:
+                return
+            key, ssml, settings, future = job
+            if not future.set_running_or_notify_cancel():
+                self.pool._finish(key)
+                continue
+            started = time.perf_counter()
+            try:
+                future.set_result(self._synthesize(key, ssml, settings))
+                self.pool._record(time.perf_counter() - started, failed=False)
+            except Exception as e:
+                logger.warning(f"TTS synthesis failed: {e}")
+                # a broken engine is rebuilt on the next job
+                self.engine = None
+                self.pool._record(time.perf_counter() - started, failed=True)
+                future.set_exception(e)
+            finally:
+                self.pool._finish(key)
+
+
+class TtsPool:
+    """``size`` engine threads behind a bounded job queue.
+
+    ``submit`` returns a ``concurrent.futures.Future`` that resolves to the
+    cache key once the audio is in the cache. Concurrent requests for the
+    same key share one synthesis.
+    """
+
+    def __init__(self, cache, size=TTS_POOL_SIZE, max_queue=TTS_MAX_QUEUE, engine_factory=_default_engine):
+        self.cache = cache
+        self.size = size
+        self.engine_factory = engine_factory
+        self.synthesized = 0
+        self.failures = 0
+        self.shared = 0
+        self.rejected = 0
+        self._seconds = 0.0
+        self._jobs = queue.Queue(max_queue)
+        self._inflight = {}
+        self._workers = []
+        self._lock = threading.Lock()
+
+    def _start(self):
+        # threads start on first use, after gunicorn has forked the worker
+        if not self._workers:
+            self._workers = [_Worker(self, i) for i in range(self.size)]
+            for worker in self._workers:
+                worker.start()
+
+    def submit(self, key, ssml, settings):
+        with self._lock:
+            self._start()
+            future = self._inflight.get(key)
+            if future is not None:
+                self.shared += 1
+                return future
+            future = Future()
+            try:
+                self._jobs.put_nowait((key, ssml, settings, future))
+            except queue.Full:
+                self.rejected += 1
+                raise TtsBusy('Too many pending synthesis requests')
+            self._inflight[key] = future
+            return future
+
+    def _finish(self, key):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def _record(self, seconds, failed):
+        with self._lock:
+            if failed:
+                self.failures += 1
+            else:
+                self.synthesized += 1
+                self._seconds += seconds
+
+    def stats(self):
+        with self._lock:
+            return {
+                'engines': self.size,
+                'started': len(self._workers),
+                'queued': self._jobs.qsize(),
+                'in_flight': len(self._inflight),
+                'synthesized': self.synthesized,
+                'failures': self.failures,
+                'shared': self.shared,
+                'rejected': self.rejected,
+                'avg_synthesis_ms': (self._seconds / self.synthesized * 1000) if self.synthesized else 0.0,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for _ in workers:
+            try:
+                self._jobs.put(None, timeout=1)
+            except queue.Full:
+                # daemon threads; they go down with the process anyway
+                break
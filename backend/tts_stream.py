@@ -0,0 +1,201 @@
+"""Streaming synthesis of long SSML: split into sentences, synthesize ahead, stream frames.
+
+The client gets one WAV stream: a header whose sizes are left open (the
+usual convention for streamed WAV), then each segment's PCM frames as soon
+as that segment is ready. Only ``lookahead`` segments are in the pool at a
+time, and frames are read from the audio cache in fixed-size chunks, so
+memory does not grow with the length of the text.
+"""
+import os
+import re
+import wave
+import struct
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import Future
+
+from fastapi.concurrency import run_in_threadpool
+
+from audio_cache import audio_key
+
+logger = logging.getLogger("call-agent-api")
+
+# later segments are merged up to this size; the first one never waits
+TTS_SEGMENT_MIN_CHARS = int(os.getenv('TTS_SEGMENT_MIN_CHARS', '40'))
+# a sentence longer than this is split at word boundaries
+TTS_SEGMENT_MAX_CHARS = int(os.getenv('TTS_SEGMENT_MAX_CHARS', '400'))
+# segments queued for synthesis ahead of the one being streamed
+TTS_STREAM_LOOKAHEAD = int(os.getenv('TTS_STREAM_LOOKAHEAD', '2'))
+_FRAME_CHUNK_BYTES = 64 * 1024
+
+_TOKEN = re.compile(r'(<[^>]+>)')
+_SENTENCE = re.compile(r'[^.!?…]*[.!?…]+["\')\]]*\s*|[^.!?…]+$')
+_TAG_NAME = re.compile(r'</?\s*([\w:-]+)')
+# closing one of these ends a segment, as does a <break/>
+_BOUNDARY_TAGS = frozenset(['p', 's', 'paragraph', 'sentence', 'prosody'])
+_WRAPPER_TAGS = frozenset(['speak'])
+
+
+def _split_long(text, max_chars):
+    if len(text) <= max_chars:
+        return [text]
+    pieces, current = [], ''
+    for word in re.findall(r'\S+\s*', text):
+        if current and len(current) + len(word) > max_chars:
+            pieces.append(current)
+            current = ''
+        current += word
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_ssml(ssml, min_chars=TTS_SEGMENT_MIN_CHARS, max_chars=TTS_SEGMENT_MAX_CHARS):
+    """Split SSML into standalone ``<speak>`` documents at sentence and prosody boundaries.
+
+    Each segment reopens the elements (prosody, emphasis, ...) that were open
+    where it starts and closes them where it ends, so every segment keeps
+    the voice settings of the text it came from.
+    """
+    segments = []
+    stack = []        # opening tags currently open
+    prefix = []       # opening tags that were open when the current segment started
+    body = []
+    text_len = 0
+
+    def flush():
+        nonlocal prefix, body, text_len
+        if text_len and ''.join(body).strip():
+            closing = ''.join(f'</{_TAG_NAME.match(tag).group(1)}>' for tag in reversed(stack))
+            segments.append(f"<speak>{''.join(prefix)}{''.join(body)}{closing}</speak>")
+        prefix, body, text_len = list(stack), [], 0
+
+    def ready():
+        return text_len >= min_chars or (not segments and text_len)
+
+    for token in _TOKEN.split(ssml):
+        if not token:
+            continue
+        if token.startswith('<'):
+            name_match = _TAG_NAME.match(token)
+            if token.startswith('<?') or token.startswith('<!') or not name_match:
+                continue
+            name = name_match.group(1).lower()
+            if name in _WRAPPER_TAGS:
+                continue
+            if token.startswith('</'):
+                if stack:
+                    stack.pop()
+                if not body and prefix:
+                    # the element closed right after a flush: nothing of it is left to reopen
+                    prefix.pop()
+                    continue
+                body.append(token)
+                if name in _BOUNDARY_TAGS and ready():
+                    flush()
+            elif token.endswith('/>'):
+                body.append(token)
+                if name == 'break' and ready():
+                    flush()
+            else:
+                body.append(token)
+                stack.append(token)
+            continue
+        for sentence in _SENTENCE.findall(token):
+            for piece in _split_long(sentence, max_chars):
+                body.append(piece)
+                text_len += len(piece.strip())
+                if (piece.rstrip()[-1:] in '.!?…"\')]' or len(piece) >= max_chars) and ready():
+                    flush()
+    flush()
+    return segments
+
+
+def wav_stream_header(channels, sample_width, frame_rate):
+    """A PCM WAV header with the RIFF and data sizes left open (0xFFFFFFFF)."""
+    block_align = channels * sample_width
+    return struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 0xFFFFFFFF, b'WAVE', b'fmt ', 16, 1, channels,
+                       frame_rate, frame_rate * block_align, block_align, sample_width * 8, b'data', 0xFFFFFFFF)
+
+
+class SsmlAudioStream:
+    """Synthesizes ``segments`` through a ``TtsPool`` and yields one WAV stream.
+
+    Call ``start()`` first: it waits for the first segment, so a failure can
+    still be answered with a normal response before any audio is sent. Then
+    stream ``frames()``.
+    """
+
+    def __init__(self, pool, cache, segments, settings, timeout, lookahead=TTS_STREAM_LOOKAHEAD):
+        self.pool = pool
+        self.cache = cache
+        self.segments = segments
+        self.settings = settings
+        self.timeout = timeout
+        self.lookahead = max(1, lookahead)
+        self._next = 0
+        self._pending = deque()
+        self._first = None
+
+    def _fill(self):
+        while self._next < len(self.segments) and len(self._pending) < self.lookahead:
+            ssml = self.segments[self._next]
+            key = audio_key(ssml, self.settings)
+            self._next += 1
+            if key in self.cache:
+                # a sentence spoken before (greetings, menu items) skips the pool queue
+                future = Future()
+                future.set_result(key)
+            else:
+                future = self.pool.submit(key, ssml, self.settings)
+            self._pending.append((key, future))
+
+    async def _open_next(self):
+        """Open the next segment's audio; the pool is topped up before waiting."""
+        self._fill()
+        key, future = self._pending.popleft()
+        self._fill()
+        # shield: dropping this stream must not cancel a synthesis other requests share
+        await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+        opened = self.cache.open(key, record=False)
+        if opened is None:
+            raise RuntimeError('Synthesized segment was evicted before it was streamed')
+        return opened[0]
+
+    async def start(self):
+        self._first = await self._open_next()
+
+    async def frames(self):
+        """The WAV header, then every segment's PCM frames in order."""
+        f = self._first
+        params = None
+        try:
+            while f is not None:
+                try:
+                    reader = wave.open(f, 'rb')
+                    seg_params = (reader.getnchannels(), reader.getsampwidth(), reader.getframerate())
+                    if params is None:
+                        params = seg_params
+                        yield wav_stream_header(*params)
+                    if seg_params != params:
+                        logger.warning(f"Skipping TTS segment with format {seg_params}, stream is {params}")
+                    else:
+                        frames = max(1, _FRAME_CHUNK_BYTES // (params[0] * params[1]))
+                        while True:
+                            chunk = await run_in_threadpool(reader.readframes, frames)
+                            if not chunk:
+                                break
+                            yield chunk
+                finally:
+                    f.close()
+                f = None
+                if self._pending or self._next < len(self.segments):
+                    try:
+                        f = await self._open_next()
+                    except Exception as e:
+                        # headers are already sent; end the stream early
+                        logger.warning(f"Streaming synthesis stopped: {e or type(e).__name__}")
+        finally:
+            if f is not None:
+                f.close()
@@ -0,0 +1,166 @@
+"""Per-user preferences in SQLite, with an in-process read cache shared safely across workers."""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger("call-agent-api")
+
+USER_PREFS_CACHE_SIZE = int(os.getenv('USER_PREFS_CACHE_SIZE', '10000'))
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_BATCH = 500
+
+
+class UserPrefsStore:
+    """Preferences dict by user id, one row per user.
+
+    A save upserts only that user's row in its own transaction, so saves
+    from different workers never overwrite each other. Every save stamps
+    the row with the next value of a global sequence. Reads go through a
+    bounded LRU cache; before each read the worker asks SQLite for
+    ``PRAGMA data_version``, and only when another connection has committed
+    does it fetch the ids saved since the last sequence it saw and drop
+    those from its cache.
+    """
+
+    def __init__(self, path, cache_size=USER_PREFS_CACHE_SIZE):
+        self.path = path
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._cache = OrderedDict()   # user_id -> (prefs, seq)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS prefs ('
+            ' user_id TEXT PRIMARY KEY, prefs TEXT NOT NULL, seq INTEGER NOT NULL, updated REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+        self._conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS prefs_seq ON prefs(seq)')
+        self._conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('seq', 0)")
+        self._conn.commit()
+        self._data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+        self._seen_seq = self._conn.execute("SELECT value FROM meta WHERE name = 'seq'").fetchone()[0]
+
+    def _next_seq(self):
+        self._conn.execute("UPDATE meta SET value = value + 1 WHERE name = 'seq'")
+        return self._conn.execute("SELECT value FROM meta WHERE name = 'seq'").fetchone()[0]
+
+    def _refresh(self):
+        """Drop cached users that another connection saved since the last check."""
+        data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+        if data_version == self._data_version:
+            return
+        self._data_version = data_version
+        for user_id, seq in self._conn.execute(
+                'SELECT user_id, seq FROM prefs WHERE seq > ?', (self._seen_seq,)).fetchall():
+            self._seen_seq = max(self._seen_seq, seq)
+            cached = self._cache.get(user_id)
+            # our own saves are already cached at their sequence number
+            if cached is not None and cached[1] != seq:
+                del self._cache[user_id]
+                self.invalidations += 1
+
+    def _remember(self, user_id, prefs, seq):
+        self._cache[user_id] = (prefs, seq)
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def get_many(self, user_ids):
+        """Return {user_id: prefs} for ``user_ids``; users without saved prefs get {}."""
+        found = {}
+        with self._lock:
+            self._refresh()
+            missing = []
+            for user_id in dict.fromkeys(user_ids):
+                cached = self._cache.get(user_id)
+                if cached is None:
+                    missing.append(user_id)
+                    continue
+                self._cache.move_to_end(user_id)
+                found[user_id] = cached[0]
+            self.hits += len(found)
+            self.misses += len(missing)
+            for i in range(0, len(missing), _LOOKUP_BATCH):
+                batch = missing[i:i + _LOOKUP_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT user_id, prefs, seq FROM prefs WHERE user_id IN ({','.join('?' * len(batch))})",
+                    batch).fetchall()
+                for user_id, prefs, seq in rows:
+                    found[user_id] = json.loads(prefs)
+                    self._remember(user_id, found[user_id], seq)
+                for user_id in batch:
+                    if user_id not in found:
+                        # absent users are cached too; a later save invalidates them like any other
+                        found[user_id] = {}
+                        self._remember(user_id, {}, 0)
+        # prefs are handed out as copies so a caller cannot change the cached dict
+        return {user_id: dict(prefs) for user_id, prefs in found.items()}
+
+    def get(self, user_id):
+        return self.get_many([user_id])[user_id]
+
+    def set(self, user_id, prefs):
+        """Replace ``user_id``'s prefs (a JSON-serializable dict) and return the save's sequence number."""
+        prefs = dict(prefs)
+        encoded = json.dumps(prefs, ensure_ascii=False)
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock up front, so sequence
+            # numbers are handed out in commit order across workers
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                seq = self._next_seq()
+                self._conn.execute(
+                    'INSERT INTO prefs (user_id, prefs, seq, updated) VALUES (?, ?, ?, ?)'
+                    ' ON CONFLICT(user_id) DO UPDATE SET prefs = excluded.prefs, seq = excluded.seq,'
+                    ' updated = excluded.updated', (user_id, encoded, seq, time.time()))
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+            self._remember(user_id, prefs, seq)
+        return seq
+
+    def is_empty(self):
+        with self._lock:
+            return self._conn.execute('SELECT 1 FROM prefs LIMIT 1').fetchone() is None
+
+    def import_json(self, path):
+        """Load a ``{user_id: prefs}`` JSON file (the old user_prefs.json) in one transaction."""
+        if not os.path.exists(path):
+            return 0
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                for user_id, prefs in data.items():
+                    self._conn.execute(
+                        'INSERT OR IGNORE INTO prefs (user_id, prefs, seq, updated) VALUES (?, ?, ?, ?)',
+                        (user_id, json.dumps(prefs, ensure_ascii=False), self._next_seq(), time.time()))
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return len(data)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'users': self._conn.execute('SELECT COUNT(*) FROM prefs').fetchone()[0],
+                'cached': len(self._cache),
+                'cache_size': self.cache_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_ratio': (self.hits / lookups) if lookups else 0.0,
+            }
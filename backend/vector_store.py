@@ -0,0 +1,154 @@
+"""Binary, memory-mapped embedding store and vectorized top-k cosine scoring.
+
+A store is a directory holding:
+
+    header.json   format, model, dim, count, dtype, source hash, chunker and
+                  ANN index spec
+    vectors.bin   row-normalized vectors, float32 (or float16), row-major
+    texts.bin     all chunk texts, UTF-8, concatenated
+    offsets.bin   count + 1 little-endian uint64 byte offsets into texts.bin
+    chunks.bin    optional, per chunk: start and end offsets in the source text
+                  and first and last page, as little-endian int64
+
+Every file is opened read-only with mmap, so opening a store is near-instant
+and all worker processes share the same page-cache pages.
+"""
+import os
+import json
+from datetime import datetime
+import numpy as np
+
+STORE_FORMAT = 1
+HEADER_FILE = 'header.json'
+VECTORS_FILE = 'vectors.bin'
+TEXTS_FILE = 'texts.bin'
+OFFSETS_FILE = 'offsets.bin'
+CHUNKS_FILE = 'chunks.bin'
+CHUNK_FIELDS = ('start', 'end', 'page_start', 'page_end')
+SUPPORTED_DTYPES = ('float32', 'float16')
+
+
+def normalize_rows(arr):
+    """Return a float32 copy of ``arr`` with every row scaled to unit length."""
+    arr = np.array(arr, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(arr, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    arr /= norms
+    return arr
+
+
+def _memmap(path, dtype, shape):
+    # numpy cannot map an empty file
+    if int(np.prod(shape)) == 0:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+
+
+def write_store(directory, vectors, texts, model, source_hash=None, dtype='float32', chunks=None, chunker=None,
+                index_spec=None):
+    """Write a new store into ``directory``. The header is written last.
+
+    ``chunks`` optionally gives each text's position in the source document
+    (dicts with ``CHUNK_FIELDS``); ``chunker`` names the chunking settings and
+    ``index_spec`` the FAISS index built over the vectors, if any.
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f'Unsupported store dtype {dtype}')
+    if len(vectors) != len(texts):
+        raise ValueError(f'{len(vectors)} vectors for {len(texts)} texts')
+    os.makedirs(directory, exist_ok=True)
+
+    arr = normalize_rows(vectors).astype(dtype) if len(vectors) else np.zeros((0, 0), dtype=dtype)
+    arr.tofile(os.path.join(directory, VECTORS_FILE))
+
+    encoded = [t.encode('utf-8') for t in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype='<u8')
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    with open(os.path.join(directory, TEXTS_FILE), 'wb') as f:
+        f.write(b''.join(encoded))
+    offsets.tofile(os.path.join(directory, OFFSETS_FILE))
+    if chunks is not None:
+        if len(chunks) != len(texts):
+            raise ValueError(f'{len(chunks)} chunk positions for {len(texts)} texts')
+        positions = np.array([[c[f] for f in CHUNK_FIELDS] for c in chunks], dtype='<i8').reshape(-1, len(CHUNK_FIELDS))
+        positions.tofile(os.path.join(directory, CHUNKS_FILE))
+
+    header = {
+        'format': STORE_FORMAT,
+        'model': model,
+        'dim': int(arr.shape[1]),
+        'count': int(arr.shape[0]),
+        'dtype': dtype,
+        'source_hash': source_hash,
+        'chunk_positions': chunks is not None,
+        'chunker': chunker,
+        'index_spec': index_spec,
+        'created': datetime.now().isoformat(),
+    }
+    with open(os.path.join(directory, HEADER_FILE), 'w', encoding='utf-8') as f:
+        json.dump(header, f)
+    return header
+
+
+class EmbeddingStore:
+    """Read-only view of a store directory. Behaves as a sequence of chunk items."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, HEADER_FILE), 'r', encoding='utf-8') as f:
+            self.header = json.load(f)
+        if self.header.get('format') != STORE_FORMAT:
+            raise ValueError(f"Unsupported store format {self.header.get('format')}")
+        count = self.header['count']
+        self.vectors = _memmap(os.path.join(directory, VECTORS_FILE), self.header['dtype'], (count, self.header['dim']))
+        self.offsets = _memmap(os.path.join(directory, OFFSETS_FILE), '<u8', (count + 1,))
+        blob_size = int(self.offsets[-1]) if count else 0
+        self._texts = _memmap(os.path.join(directory, TEXTS_FILE), np.uint8, (blob_size,))
+        self.positions = None
+        if self.header.get('chunk_positions'):
+            self.positions = _memmap(os.path.join(directory, CHUNKS_FILE), '<i8', (count, len(CHUNK_FIELDS)))
+
+    def __len__(self):
+        return self.header['count']
+
+    def text(self, i):
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self._texts[start:end].tobytes().decode('utf-8')
+
+    def chunk(self, i):
+        """``CHUNK_FIELDS`` of chunk i as a dict, or None for stores without positions."""
+        if self.positions is None:
+            return None
+        return dict(zip(CHUNK_FIELDS, (int(v) for v in self.positions[i])))
+
+    def __getitem__(self, i):
+        if i < 0 or i >= len(self):
+            raise IndexError(i)
+        item = {'id': f'chunk_{i}', 'text': self.text(i)}
+        if self.positions is not None:
+            item.update(self.chunk(i))
+        return item
+
+
+def top_k(matrix, queries, k=3):
+    """Score queries against a row-normalized matrix by cosine similarity.
+
+    ``queries`` is a single vector or a 2-D batch. Returns, per query, a list
+    of ``(score, row)`` pairs sorted best first. All queries are scored with
+    one matrix product; top-k selection uses ``argpartition``.
+    """
+    q = normalize_rows(queries)
+    n = matrix.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return [[] for _ in range(q.shape[0])]
+    scores = q @ matrix.T
+    if k < n:
+        idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        idx = np.tile(np.arange(n), (q.shape[0], 1))
+    top = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-top, axis=1)
+    idx = np.take_along_axis(idx, order, axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+    return [list(zip(top[i].tolist(), idx[i].tolist())) for i in range(q.shape[0])]